@@ -1,11 +1,13 @@
 import os
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
+from app.database import RoutingSession
 
-# Inicializar extensiones
-db = SQLAlchemy()
+# Inicializar extensiones (la sesión lee de la réplica si está configurada)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
 
@@ -22,6 +24,15 @@ def create_app(config_name=None):
     from config import config
     app.config.from_object(config[config_name])
     
+    # Codificación JSON (orjson si está disponible) con fechas ISO 8601 en UTC
+    from app.json_provider import init_json
+    init_json(app)
+    
+    # Compresión gzip/brotli de las respuestas grandes (se registra primero para
+    # ejecutarse después del resto de after_request)
+    from app.compression import init_compression
+    init_compression(app)
+    
     # Asegurar que el directorio instance existe
     try:
         os.makedirs(app.instance_path)
@@ -33,21 +44,38 @@ def create_app(config_name=None):
     migrate.init_app(app, db)
     login_manager.init_app(app)
     
+    # Límite de tiempo por sentencia (PostgreSQL), por endpoint o blueprint
+    from app.database import init_statement_timeouts, init_replica_routing
+    init_statement_timeouts()
+    init_replica_routing(app)
+    
+    # Versiones de cambio por tabla (ETags de los endpoints de consulta)
+    from app.versioning import init_versioning
+    from app.cache import init_cache_invalidation
+    init_versioning()
+    init_cache_invalidation()
+    
+    # Resúmenes diarios mantenidos incrementalmente
+    from app.rollups import init_rollups
+    init_rollups()
+    
     # Configurar Flask-Login
+    from app.principal import init_principal_cache, load_principal
+    init_principal_cache(app)
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Por favor inicia sesión para acceder a esta página.'
     login_manager.login_message_category = 'warning'
     
     @login_manager.user_loader
     def load_user(user_id):
-        from app.models import Employee
-        return Employee.query.get(int(user_id))
+        # Instantánea en caché: autenticar no cuesta una consulta por petición
+        return load_principal(int(user_id))
     
     # Importar modelos
     from app.models import Employee, Task, TaskAssignment
     
     # Registrar blueprints
-    from app.routes import main, employees, tasks, assignments, auth, attendance
+    from app.routes import main, employees, tasks, assignments, auth, attendance, events, reports
     
     app.register_blueprint(auth.bp)
     app.register_blueprint(main.bp)
@@ -55,6 +83,8 @@ def create_app(config_name=None):
     app.register_blueprint(tasks.bp)
     app.register_blueprint(assignments.bp)
     app.register_blueprint(attendance.bp)
+    app.register_blueprint(events.bp)
+    app.register_blueprint(reports.bp)
     
     # Comando personalizado para inicializar la BD con datos de ejemplo
     @app.cli.command()
@@ -105,4 +135,34 @@ def create_app(config_name=None):
         else:
             print('La base de datos ya contiene datos')
     
+    @app.cli.command('backfill-rollups')
+    def backfill_rollups_command():
+        """Reconstruye los resúmenes diarios desde task_assignments"""
+        from app.rollups import backfill_rollups
+        days, employee_days = backfill_rollups()
+        print(f'Resúmenes reconstruidos: {days} días, {employee_days} filas empleado-día')
+    
+    @app.cli.command('ensure-partitions')
+    @click.option('--months', type=int, default=None, help='Meses por adelantado')
+    def ensure_partitions_command(months):
+        """Crea las particiones mensuales de los próximos meses (PostgreSQL)"""
+        from app.partitions import ensure_partitions
+        created = ensure_partitions(months)
+        if not created:
+            print('No hay tablas particionadas en esta base de datos')
+        for table, count in created.items():
+            print(f'{table}: {count} particiones nuevas')
+    
+    @app.cli.command('archive-history')
+    @click.option('--months', type=int, default=None,
+                  help='Archivar lo anterior a este número de meses')
+    @click.option('--dry-run', is_flag=True, help='Solo contar las filas a archivar')
+    def archive_history_command(months, dry_run):
+        """Mueve asignaciones y fichajes antiguos al archivo comprimido"""
+        from app.archive import archive_history
+        archived = archive_history(months, dry_run=dry_run)
+        for table, count in archived.items():
+            action = 'a archivar' if dry_run else 'archivadas'
+            print(f'{table}: {count} filas {action}')
+    
     return app
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""
+Gestión en bloque de `task_allowed_employees`.
+
+En lugar de cargar cada empleado y vaciar y rellenar la colección
+`Task.allowed_employees`, los cambios se aplican como diferencia de
+conjuntos: los ids se validan con una sola consulta `IN` y después solo se
+insertan las parejas nuevas y se borran las que sobran. Las sentencias son
+Core, así que se registran con `record_changes` para que ETags y cachés se
+invaliden al hacer commit, y se caducan las colecciones ya cargadas en la
+sesión.
+"""
+from sqlalchemy import select, insert, delete
+from app import db
+from app.models import Employee, Task, task_allowed_employees
+from app.versioning import record_changes
+
+_allowed = task_allowed_employees
+
+
+def parse_ids(values, name):
+    """Convierte una lista de ids a enteros sin repetir (ValueError si no es válida)"""
+    if not isinstance(values, (list, tuple)):
+        raise ValueError(f'{name} debe ser una lista de ids')
+    try:
+        return sorted({int(value) for value in values})
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} debe ser una lista de ids')
+
+
+def _split_existing(model, ids):
+    ids = set(ids)
+    if not ids:
+        return set(), []
+    found = set(db.session.execute(select(model.id).where(model.id.in_(ids))).scalars())
+    return found, sorted(ids - found)
+
+
+def resolve_employee_ids(employee_ids):
+    """Devuelve (ids existentes, ids desconocidos) con una sola consulta"""
+    return _split_existing(Employee, employee_ids)
+
+
+def resolve_task_ids(task_ids):
+    """Devuelve (ids existentes, ids desconocidos) con una sola consulta"""
+    return _split_existing(Task, task_ids)
+
+
+def _insert_pairs(pairs):
+    if pairs:
+        db.session.execute(insert(_allowed), [
+            {'task_id': task_id, 'employee_id': employee_id} for task_id, employee_id in pairs
+        ])
+
+
+def _changed():
+    """Registra el cambio y caduca las colecciones cargadas en la sesión"""
+    record_changes(['task_allowed_employees'])
+    for obj in list(db.session.identity_map.values()):
+        if isinstance(obj, Task):
+            db.session.expire(obj, ['allowed_employees'])
+        elif isinstance(obj, Employee):
+            db.session.expire(obj, ['allowed_tasks'])
+
+
+def set_allowed_employees(task_id, employee_ids):
+    """Deja exactamente `employee_ids` como empleados permitidos de la tarea.
+    
+    Solo inserta y borra la diferencia. Los ids deben existir (ver
+    `resolve_employee_ids`). Devuelve (añadidos, quitados) ordenados.
+    """
+    wanted = set(employee_ids)
+    current = set(db.session.execute(
+        select(_allowed.c.employee_id).where(_allowed.c.task_id == task_id)
+    ).scalars())
+    added = sorted(wanted - current)
+    removed = sorted(current - wanted)
+    
+    if removed:
+        db.session.execute(delete(_allowed).where(
+            _allowed.c.task_id == task_id,
+            _allowed.c.employee_id.in_(removed)
+        ))
+    _insert_pairs([(task_id, employee_id) for employee_id in added])
+    
+    if added or removed:
+        _changed()
+    return added, removed
+
+
+def grant(task_ids, employee_ids):
+    """Permite todas las tareas de `task_ids` a todos los empleados de `employee_ids`.
+    
+    Las parejas ya existentes se omiten. Devuelve el número de parejas añadidas.
+    """
+    if not task_ids or not employee_ids:
+        return 0
+    existing = set(db.session.execute(
+        select(_allowed.c.task_id, _allowed.c.employee_id).where(
+            _allowed.c.task_id.in_(task_ids),
+            _allowed.c.employee_id.in_(employee_ids)
+        )
+    ).tuples())
+    pairs = [(task_id, employee_id) for task_id in task_ids for employee_id in employee_ids
+             if (task_id, employee_id) not in existing]
+    _insert_pairs(pairs)
+    
+    if pairs:
+        _changed()
+    return len(pairs)
+
+
+def revoke(task_ids, employee_ids):
+    """Quita todas las parejas (tarea, empleado) indicadas. Devuelve cuántas se borraron"""
+    if not task_ids or not employee_ids:
+        return 0
+    removed = db.session.execute(delete(_allowed).where(
+        _allowed.c.task_id.in_(task_ids),
+        _allowed.c.employee_id.in_(employee_ids)
+    )).rowcount
+    
+    if removed:
+        _changed()
+    return removed
@@ -0,0 +1,356 @@
+"""
+Archivo frío del historial de asignaciones y fichajes.
+
+`archive_history` mueve las filas cerradas anteriores al corte (por defecto
+`ARCHIVE_AFTER_MONTHS` meses) de `task_assignments` y `attendance` a ficheros
+JSONL comprimidos con gzip, uno por mes:
+
+    <ARCHIVE_DIR>/<tabla>/<AAAA-MM>.v<N>.jsonl.gz
+    <ARCHIVE_DIR>/<tabla>/index.json
+
+El índice guarda el corte y, por cada mes, el fichero vigente, número de
+filas, rango de fechas y los empleados y tareas que aparecen, para leer solo
+los ficheros necesarios. Los lectores solo leen los ficheros del índice.
+
+Cada mes se escribe en un fichero nuevo (versión N + 1) que aún no está en
+el índice; después se borran las filas de la BD y, solo si el commit se
+completa, el índice pasa a apuntar al fichero nuevo. Así una fila nunca está
+a la vez en la BD y en el archivo publicado. Si el proceso se interrumpe entre
+el commit y el índice, la siguiente ejecución publica o descarta el fichero
+pendiente según sus filas sigan o no en la BD.
+
+Cada registro contiene las columnas de la fila y los nombres de empleado y tarea
+en el momento de archivar. Los resúmenes diarios no se tocan.
+"""
+import gzip
+import json
+import os
+import re
+from datetime import datetime, date
+from flask import current_app
+from sqlalchemy import delete
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models import TaskAssignment, Attendance, Employee, Task
+from app.versioning import record_changes
+
+# tabla -> (modelo, columna de fecha, condición de fila cerrada)
+ARCHIVED_TABLES = {
+    'task_assignments': (TaskAssignment, 'start_time', lambda: TaskAssignment.end_time.isnot(None)),
+    'attendance': (Attendance, 'check_in', lambda: Attendance.check_out.isnot(None)),
+}
+
+# Filas leídas de la BD en cada lote al archivar
+ARCHIVE_CHUNK_SIZE = 1000
+
+# <AAAA-MM>.v<N>.jsonl.gz (sin versión: ficheros anteriores, versión 0)
+_SHARD_NAME = re.compile(r'^(\d{4}-\d{2})(?:\.v(\d+))?\.jsonl\.gz$')
+
+
+def _table_dir(table):
+    return os.path.join(current_app.config['ARCHIVE_DIR'], table)
+
+
+def _shard_path(table, month, version):
+    return os.path.join(_table_dir(table), f'{month}.v{version}.jsonl.gz')
+
+
+def _shard_file(table, shard):
+    """Ruta del fichero publicado de una entrada del índice"""
+    return os.path.join(_table_dir(table), shard['file'])
+
+
+def _index_path(table):
+    return os.path.join(_table_dir(table), 'index.json')
+
+
+def read_index(table):
+    """Índice del archivo de una tabla ({'cutoff': None, 'shards': {}} si no hay archivo)"""
+    try:
+        with open(_index_path(table)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'cutoff': None, 'shards': {}}
+
+
+def _write_atomic(path, write):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _write_index(table, index):
+    data = json.dumps(index, indent=2, sort_keys=True).encode()
+    _write_atomic(_index_path(table), lambda f: f.write(data))
+
+
+def _discard(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def archive_generation(table):
+    """Identifica el contenido publicado del archivo (cambia con cada mes archivado)"""
+    index = read_index(table)
+    return index['cutoff'], tuple(sorted(shard['file'] for shard in index['shards'].values()))
+
+
+def archive_cutoff(table):
+    """Fecha (date) anterior a la cual las filas cerradas están archivadas, o None"""
+    cutoff = read_index(table)['cutoff']
+    return date.fromisoformat(cutoff) if cutoff else None
+
+
+def reaches_archive(table, date_from):
+    """Indica si un rango que empieza en `date_from` (None = sin límite) llega al archivo"""
+    cutoff = archive_cutoff(table)
+    if cutoff is None:
+        return False
+    if date_from is None:
+        return True
+    if isinstance(date_from, datetime):
+        date_from = date_from.date()
+    return date_from < cutoff
+
+
+# --- Escritura ---
+
+def _to_record(model, row):
+    record = {}
+    for column in model.__table__.columns:
+        value = getattr(row, column.key)
+        record[column.key] = value.isoformat() if isinstance(value, (datetime, date)) else value
+    record['employee_name'] = row.employee.name if row.employee else None
+    if model is TaskAssignment:
+        record['task_name'] = row.task.name if row.task else None
+    return record
+
+
+def _month_key(value):
+    return value.strftime('%Y-%m')
+
+
+def _shard_entry(table, path, version, records):
+    _, date_column, _ = ARCHIVED_TABLES[table]
+    return {
+        'file': os.path.basename(path),
+        'version': version,
+        'rows': len(records),
+        'min': records[0][date_column],
+        'max': records[-1][date_column],
+        'employee_ids': sorted({r['employee_id'] for r in records}),
+        'task_ids': sorted({r['task_id'] for r in records if r.get('task_id') is not None}),
+    }
+
+
+def _stage_shard(table, month, records, index):
+    """Escribe la nueva versión del fichero del mes (lo archivado más `records`).
+    
+    No la publica: devuelve (ruta, entrada del índice) para `_publish_shard`.
+    """
+    current = index['shards'].get(month)
+    version = (current.get('version', 0) if current else 0) + 1
+    by_id = {record['id']: record for record in
+             (_read_shard(_shard_file(table, current)) if current else [])}
+    for record in records:
+        by_id[record['id']] = record
+    _, date_column, _ = ARCHIVED_TABLES[table]
+    merged = sorted(by_id.values(), key=lambda r: (r[date_column], r['id']))
+    
+    path = _shard_path(table, month, version)
+    
+    def write(f):
+        with gzip.GzipFile(fileobj=f, mode='wb') as gz:
+            for record in merged:
+                gz.write(json.dumps(record, ensure_ascii=False).encode() + b'\n')
+    _write_atomic(path, write)
+    return path, _shard_entry(table, path, version, merged)
+
+
+def _publish_shard(table, month, entry, index):
+    """Apunta el índice a la nueva versión del mes y borra la anterior"""
+    previous = index['shards'].get(month)
+    index['shards'][month] = entry
+    _write_index(table, index)
+    if previous and previous['file'] != entry['file']:
+        _discard(_shard_file(table, previous))
+
+
+def _in_database(model, ids):
+    return any(
+        db.session.query(model.id).filter(model.id.in_(ids[start:start + ARCHIVE_CHUNK_SIZE])).first()
+        for start in range(0, len(ids), ARCHIVE_CHUNK_SIZE)
+    )
+
+
+def _recover_pending(table, model, index):
+    """Publica o descarta los ficheros que una ejecución interrumpida dejó sin publicar"""
+    published = {shard['file'] for shard in index['shards'].values()}
+    for name in sorted(os.listdir(_table_dir(table))):
+        path = os.path.join(_table_dir(table), name)
+        if name.endswith('.tmp'):
+            _discard(path)
+            continue
+        match = _SHARD_NAME.match(name)
+        if not match or name in published:
+            continue
+        
+        month, version = match.group(1), int(match.group(2) or 0)
+        current = index['shards'].get(month)
+        if current and version <= current.get('version', 0):
+            # Versión ya sustituida cuyo borrado no llegó a hacerse
+            _discard(path)
+            continue
+        
+        records = _read_shard(path)
+        # Si las filas nuevas siguen en la BD, el borrado no se confirmó
+        if not records or _in_database(model, [record['id'] for record in records]):
+            _discard(path)
+        else:
+            _publish_shard(table, month, _shard_entry(table, path, version, records), index)
+
+
+def archive_history(months=None, dry_run=False):
+    """Mueve al archivo las filas cerradas anteriores al corte.
+    
+    Devuelve {tabla: filas archivadas}.
+    """
+    if months is None:
+        months = current_app.config['ARCHIVE_AFTER_MONTHS']
+    today = date.today()
+    month_index = today.year * 12 + today.month - 1 - months
+    cutoff = date(month_index // 12, month_index % 12 + 1, 1)
+    cutoff_dt = datetime.combine(cutoff, datetime.min.time())
+    
+    archived = {}
+    for table, (model, date_column, is_closed) in ARCHIVED_TABLES.items():
+        column = getattr(model, date_column)
+        condition = (column < cutoff_dt, is_closed())
+        
+        if dry_run:
+            archived[table] = db.session.query(model).filter(*condition).count()
+            continue
+        
+        os.makedirs(_table_dir(table), exist_ok=True)
+        index = read_index(table)
+        _recover_pending(table, model, index)
+        total = 0
+        
+        # Un mes cada vez: se escribe el fichero, se borran esas filas y se publica
+        oldest = db.session.query(db.func.min(column)).filter(*condition).scalar()
+        month_start = datetime(oldest.year, oldest.month, 1) if oldest else cutoff_dt
+        while month_start < cutoff_dt:
+            next_month = datetime(month_start.year + month_start.month // 12,
+                                  month_start.month % 12 + 1, 1)
+            month = _month_key(month_start)
+            month_condition = condition + (column >= month_start, column < next_month)
+            month_start = next_month
+            
+            query = model.query.filter(*month_condition).options(
+                joinedload(model.employee).load_only(Employee.name))
+            if model is TaskAssignment:
+                query = query.options(joinedload(TaskAssignment.task).load_only(Task.name))
+            records = [_to_record(model, row) for row in
+                       query.order_by(model.id).yield_per(ARCHIVE_CHUNK_SIZE)]
+            if not records:
+                continue
+            
+            path, entry = _stage_shard(table, month, records, index)
+            
+            ids = [record['id'] for record in records]
+            try:
+                for start in range(0, len(ids), ARCHIVE_CHUNK_SIZE):
+                    db.session.execute(delete(model).where(
+                        model.id.in_(ids[start:start + ARCHIVE_CHUNK_SIZE])))
+                record_changes([table])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                _discard(path)
+                raise
+            
+            # Solo tras el commit: hasta entonces las filas siguen en la BD
+            _publish_shard(table, month, entry, index)
+            total += len(records)
+        
+        if index['cutoff'] is None or index['cutoff'] < cutoff.isoformat():
+            index['cutoff'] = cutoff.isoformat()
+            _write_index(table, index)
+        archived[table] = total
+    
+    return archived
+
+
+# --- Lectura ---
+
+def _read_shard(path):
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+    except FileNotFoundError:
+        return []
+
+
+def iter_archived(table, date_from=None, date_to=None, employee_id=None, task_id=None,
+                  descending=False):
+    """Registros archivados que cumplen los filtros, ordenados por fecha.
+    
+    `date_from` / `date_to` son datetimes (ambos incluidos). Solo se leen los
+    ficheros cuyo rango y empleados/tareas del índice pueden coincidir.
+    """
+    index = read_index(table)
+    _, date_column, _ = ARCHIVED_TABLES[table]
+    low = date_from.isoformat() if date_from else None
+    high = date_to.isoformat() if date_to else None
+    
+    for month in sorted(index['shards'], reverse=descending):
+        shard = index['shards'][month]
+        if low and shard['max'] < low or high and shard['min'] > high:
+            continue
+        if employee_id and employee_id not in shard['employee_ids']:
+            continue
+        if task_id and task_id not in shard['task_ids']:
+            continue
+        
+        records = _read_shard(_shard_file(table, shard))
+        if descending:
+            records.reverse()
+        for record in records:
+            value = record[date_column]
+            if low and value < low or high and value > high:
+                continue
+            if employee_id and record['employee_id'] != employee_id:
+                continue
+            if task_id and record.get('task_id') != task_id:
+                continue
+            yield record
+
+
+def to_model(table, record):
+    """Instancia transitoria (sin sesión) del modelo a partir de un registro archivado"""
+    model = ARCHIVED_TABLES[table][0]
+    values = {}
+    for column in model.__table__.columns:
+        value = record.get(column.key)
+        if value is not None and isinstance(column.type, db.DateTime):
+            value = datetime.fromisoformat(value)
+        values[column.key] = value
+    return model(**values)
+
+
+def archived_dict(table, record, serialize=None):
+    """Serializa un registro archivado igual que `to_dict` (o `serialize`) del modelo"""
+    instance = to_model(table, record)
+    data = serialize(instance) if serialize else instance.to_dict()
+    # Los nombres se guardaron al archivar
+    data['employee_name'] = record.get('employee_name')
+    if table == 'task_assignments' and not data.get('is_break'):
+        data['task_name'] = record.get('task_name')
+    data['archived'] = True
+    return data
+
@@ -0,0 +1,306 @@
+"""
+API asíncrona (ASGI) de solo lectura para los endpoints de sondeo.
+
+Los tableros abiertos consultan cada pocos segundos los mismos endpoints de
+`main`, `assignments` y `attendance`. Servidos por la app WSGI, cada petición
+ocupa un worker y una conexión mientras espera a la BD. Esta app los sirve
+con un driver asíncrono (asyncpg o aiosqlite) y `AsyncSession`, de modo que
+un solo proceso atiende muchos tableros a la vez con un pool pequeño.
+
+Cada vista llama a la misma función que la vista Flask equivalente
+(`dashboard_stats_data`, `day_attendances`...), que recibe una sesión síncrona:
+aquí se ejecuta con `AsyncSession.run_sync`. Comparte así también la caché de
+consultas, el registro en memoria (live_state), los ETags y la sesión de
+usuario (la cookie firmada de Flask-Login), de modo que las respuestas son las
+mismas y un cliente puede alternar entre ambas. Usa la réplica de lectura si
+está configurada, salvo durante la ventana de lectura propia tras una
+escritura del usuario.
+
+Las rutas que no están aquí se delegan en la app WSGI (a2wsgi), por lo que
+puede servir la aplicación completa (ver asgi.py) o desplegarse junto a
+gunicorn enrutando solo estas rutas desde el proxy.
+
+Dependencias opcionales: SQLAlchemy[asyncio], starlette, uvicorn, a2wsgi y
+asyncpg (PostgreSQL) o aiosqlite (SQLite).
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import date
+from functools import wraps
+from urllib.parse import quote
+from flask import current_app
+from itsdangerous import BadSignature
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import configure_mappers
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, RedirectResponse, Response
+from starlette.routing import Route, Mount
+from werkzeug.http import parse_etags
+from app.cache import MISSING
+from app.database import statement_timeout, STICKY_KEY, REPLICA_BIND
+from app.decorators import etag_for
+from app.live_state import live_state, snapshot_statements, WATCHED_TABLES
+from app.models import Employee
+from app.principal import principal_statement, cached_principal, remember_principal
+from app.routes import main as main_views, assignments as assignment_views, attendance as attendance_views
+from app.versioning import versions_statement, versions_from_rows
+
+# Driver asíncrono por tipo de base de datos
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_url(url):
+    """URL equivalente con el driver asíncrono (postgresql:// -> postgresql+asyncpg://)"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No hay driver asíncrono para {backend}')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class AsyncDatabase:
+    """Engines asíncronos de la BD principal y de la réplica (si existe)"""
+    
+    def __init__(self, flask_app):
+        from config.config import engine_options
+        
+        config = flask_app.config
+        urls = {None: config.get('ASYNC_DATABASE_URL') or config['SQLALCHEMY_DATABASE_URI']}
+        replica = config['SQLALCHEMY_BINDS'].get(REPLICA_BIND)
+        if replica:
+            urls[REPLICA_BIND] = replica['url'] if isinstance(replica, dict) else replica
+        
+        self.engines = {}
+        self.sessions = {}
+        for key, url in urls.items():
+            url = async_database_url(url)
+            options = engine_options(url.render_as_string(hide_password=False),
+                                     pgbouncer=config['DB_PGBOUNCER'])
+            self.engines[key] = create_async_engine(url, **options)
+            self.sessions[key] = async_sessionmaker(self.engines[key], expire_on_commit=False)
+    
+    def session(self, replica):
+        key = REPLICA_BIND if replica and REPLICA_BIND in self.sessions else None
+        return self.sessions[key]()
+    
+    async def dispose(self):
+        for engine in self.engines.values():
+            await engine.dispose()
+
+
+class AsyncRequest:
+    """Contexto de una petición: sesión de BD, usuario y sesión HTTP de Flask"""
+    
+    def __init__(self, request, db_session, principal, flask_session):
+        self.request = request
+        self.db = db_session
+        self.user = principal
+        self.flask_session = flask_session
+    
+    async def run_sync(self, fn, *args):
+        """Ejecuta `fn(sesión síncrona, *args)`: las funciones compartidas con las vistas Flask"""
+        return await self.db.run_sync(fn, *args)
+
+
+def _full_path(request):
+    # Igual que request.full_path de Flask (incluye '?' aunque no haya query string)
+    return f"{request.url.path}?{request.url.query}"
+
+
+class AppJSONResponse(JSONResponse):
+    """JSONResponse codificada con el proveedor JSON de la app Flask (orjson si está)"""
+    
+    def render(self, content):
+        return current_app.json.dumps_bytes(content)
+
+
+def _json_error(message, status):
+    return AppJSONResponse({'error': message}, status_code=status)
+
+
+async def _begin(db_session, name):
+    """Límite de tiempo por sentencia de la transacción (PostgreSQL)"""
+    if db_session.bind.dialect.name == 'postgresql':
+        timeout = statement_timeout(name)
+        if timeout:
+            await db_session.execute(text(f'SET LOCAL statement_timeout = {int(timeout)}'))
+
+
+def create_async_app(flask_app, mount_wsgi=True):
+    """App ASGI con los endpoints de sondeo; el resto se delega en `flask_app`"""
+    database = AsyncDatabase(flask_app)
+    # Las relaciones con backref (TaskAssignment.employee...) existen tras configurar los mappers
+    configure_mappers()
+    cookie_name = flask_app.config['SESSION_COOKIE_NAME']
+    live_lock = asyncio.Lock()
+    
+    def read_flask_session(request):
+        """Contenido de la cookie de sesión firmada de Flask ({} si no es válida)"""
+        cookie = request.cookies.get(cookie_name)
+        if not cookie:
+            return {}
+        serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+        max_age = int(flask_app.permanent_session_lifetime.total_seconds())
+        try:
+            return serializer.loads(cookie, max_age=max_age)
+        except BadSignature:
+            return {}
+    
+    async def refresh_live_state(name):
+        """Recarga el registro en memoria con la sesión asíncrona si toca (ver live_state)"""
+        if live_state.refresh_due() is None:
+            return
+        async with live_lock:
+            # Otra petición puede haberlo recargado mientras esperábamos
+            due = live_state.refresh_due()
+            if due is None:
+                return
+            # Siempre de la principal: las rutas de escritura aplican sus cambios sobre estas versiones
+            async with database.session(replica=False) as db_session, db_session.begin():
+                await _begin(db_session, name)
+                rows = (await db_session.execute(versions_statement(WATCHED_TABLES))).all()
+                versions = versions_from_rows(WATCHED_TABLES, rows)
+                if due == 'check' and live_state.mark_checked(versions):
+                    return
+                assignments, attendances = [
+                    [row.to_dict() for row in (await db_session.execute(statement)).scalars()]
+                    for statement in snapshot_statements()
+                ]
+                live_state.replace(versions, assignments, attendances)
+    
+    def endpoint(name, login=True, etag=(), hourly=False, live=False):
+        """Envuelve una vista asíncrona: sesión de BD, usuario, límite de tiempo y ETag.
+        
+        `name` es el endpoint equivalente de Flask ('blueprint.vista'), que se usa
+        para el límite de tiempo por sentencia (`DB_STATEMENT_TIMEOUTS`). `etag` y
+        `hourly` equivalen a los argumentos de `view_etag`: la vista devuelve
+        entonces `(versiones, cuerpo)`. Con `live` se refresca antes el registro en
+        memoria, sin tener aún una conexión del pool (la recarga usa otra y no debe
+        esperar por ella).
+        """
+        def decorator(view):
+            @wraps(view)
+            async def handler(request):
+                flask_session = read_flask_session(request)
+                user_id = flask_session.get('_user_id')
+                replica = flask_session.get(STICKY_KEY, 0) <= time.time()
+                
+                with flask_app.app_context():
+                    if live:
+                        await refresh_live_state(name)
+                    async with database.session(replica) as db_session, db_session.begin():
+                        await _begin(db_session, name)
+                        
+                        principal = None
+                        if user_id:
+                            principal = cached_principal(int(user_id))
+                            if principal is MISSING:
+                                result = await db_session.execute(principal_statement(int(user_id)))
+                                principal = remember_principal(result.first())
+                        if login and principal is None:
+                            return RedirectResponse(
+                                f"/auth/login?next={quote(request.url.path, safe='')}", 302)
+                        
+                        result = await view(AsyncRequest(request, db_session, principal,
+                                                         flask_session))
+                    
+                    # ETag con las versiones que refleja el cuerpo (ver view_etag)
+                    tag = None
+                    if etag and not isinstance(result, Response):
+                        versions, result = result
+                        tag = etag_for(_full_path(request), principal.get_id() if principal else '',
+                                       etag, versions, hourly)
+                        if parse_etags(request.headers.get('if-none-match')).contains_weak(tag):
+                            return Response(status_code=304, headers={
+                                'ETag': f'"{tag}"', 'Cache-Control': 'private, no-cache'})
+                    
+                    response = result if isinstance(result, Response) else AppJSONResponse(result)
+                if tag and response.status_code == 200:
+                    response.headers['ETag'] = f'"{tag}"'
+                    response.headers['Cache-Control'] = 'private, no-cache'
+                return response
+            return handler
+        return decorator
+    
+    # --- main ---
+    
+    @endpoint('main.dashboard_stats', etag=main_views.DASHBOARD_TABLES)
+    async def dashboard_stats(ctx):
+        return await ctx.run_sync(main_views.dashboard_stats_data)
+    
+    @endpoint('main.current_assignments', login=False,
+              etag=main_views.CURRENT_ASSIGNMENTS_TABLES, live=True)
+    async def current_assignments(ctx):
+        return main_views.current_assignments_data(refresh=False)
+    
+    # --- assignments ---
+    
+    @endpoint('assignments.get_current_assignments',
+              etag=assignment_views.CURRENT_ASSIGNMENTS_TABLES, live=True)
+    async def get_current_assignments(ctx):
+        return assignment_views.current_assignments_data(refresh=False)
+    
+    @endpoint('assignments.get_employee_current_assignment', live=True)
+    async def get_employee_current_assignment(ctx):
+        employee_id = ctx.request.path_params['employee_id']
+        if await ctx.db.get(Employee, employee_id) is None:
+            return _json_error('Empleado no encontrado', 404)
+        return assignment_views.employee_current_assignment_data(employee_id, refresh=False)
+    
+    # --- attendance ---
+    
+    @endpoint('attendance.get_current_attendance', live=True)
+    async def get_current_attendance(ctx):
+        try:
+            employee_id = int(ctx.request.query_params.get('employee_id') or 0)
+        except ValueError:
+            employee_id = None
+        return attendance_views.current_attendance_data(ctx.user, employee_id, refresh=False)
+    
+    @endpoint('attendance.get_today_attendances')
+    async def get_today_attendances(ctx):
+        return {'attendances': await ctx.run_sync(attendance_views.day_attendances, ctx.user,
+                                                  date.today())}
+    
+    @endpoint('attendance.get_attendances')
+    async def get_attendances(ctx):
+        try:
+            query_date = attendance_views.parse_query_date(ctx.request.query_params.get('date'))
+        except ValueError as e:
+            return _json_error(str(e), 400)
+        return {'attendance': await ctx.run_sync(attendance_views.day_attendances, ctx.user,
+                                                 query_date)}
+    
+    @endpoint('attendance.get_today_stats', etag=attendance_views.TODAY_STATS_TABLES, hourly=True)
+    async def get_today_stats(ctx):
+        return await ctx.run_sync(attendance_views.today_stats_data)
+    
+    routes = [
+        Route('/api/dashboard/stats', dashboard_stats),
+        Route('/api/current-assignments', current_assignments),
+        Route('/assignments/api/current', get_current_assignments),
+        Route('/assignments/api/employee/{employee_id:int}/current',
+              get_employee_current_assignment),
+        Route('/attendance/api/current', get_current_attendance),
+        Route('/attendance/api/today', get_today_attendances),
+        Route('/attendance/api', get_attendances),
+        Route('/attendance/api/stats/today', get_today_stats),
+    ]
+    if mount_wsgi:
+        from a2wsgi import WSGIMiddleware
+        routes.append(Mount('/', app=WSGIMiddleware(flask_app)))
+    
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        await database.dispose()
+    
+    asgi_app = Starlette(routes=routes, lifespan=lifespan)
+    asgi_app.state.database = database
+    return asgi_app
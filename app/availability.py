@@ -0,0 +1,83 @@
+"""
+Índice de disponibilidad de tareas por empleado.
+
+Una tarea activa está disponible para un empleado si es `assigned_to_all`
+o si el empleado aparece en `task_allowed_employees` (igual que
+`Task.is_available_for_employee`). Se resuelve con una sola consulta para
+cualquier número de empleados y se guarda en `query_cache` por empleado;
+los commits que modifican `tasks` o `task_allowed_employees` la invalidan.
+"""
+from flask import current_app
+from sqlalchemy import select, or_
+from app import db
+from app.cache import query_cache, MISSING
+from app.models import Task, task_allowed_employees
+
+CACHE_TAGS = ('tasks', 'task_allowed_employees')
+
+
+def _ttl():
+    return current_app.config['AVAILABILITY_CACHE_TTL']
+
+
+def active_task_catalog():
+    """{task_id: to_dict()} de las tareas activas (en caché)"""
+    return query_cache.get_or_set(
+        ('active_task_catalog',),
+        lambda: {task.id: task.to_dict()
+                 for task in Task.query.filter_by(is_active=True).order_by(Task.id)},
+        ttl=_ttl(), tags=CACHE_TAGS
+    )
+
+
+def _query_available(employee_ids):
+    """{employee_id: [task_id, ...]} con una consulta sobre task_allowed_employees"""
+    employee_ids = list(employee_ids)
+    result = {employee_id: [] for employee_id in employee_ids}
+    
+    # Tareas abiertas a todos (comunes a todos los empleados)
+    open_tasks = db.session.execute(
+        select(Task.id).where(Task.is_active.is_(True), Task.assigned_to_all.is_(True))
+    ).scalars().all()
+    
+    restricted = db.session.execute(
+        select(task_allowed_employees.c.employee_id, task_allowed_employees.c.task_id)
+        .join(Task, Task.id == task_allowed_employees.c.task_id)
+        .where(
+            task_allowed_employees.c.employee_id.in_(employee_ids),
+            Task.is_active.is_(True),
+            or_(Task.assigned_to_all.is_(False), Task.assigned_to_all.is_(None))
+        )
+    ).all()
+    
+    for employee_id in employee_ids:
+        result[employee_id].extend(open_tasks)
+    for employee_id, task_id in restricted:
+        result[employee_id].append(task_id)
+    for task_ids in result.values():
+        task_ids.sort()
+    return result
+
+
+def available_task_ids(employee_ids):
+    """{employee_id: [task_id, ...]} usando la caché; los que faltan, en una consulta"""
+    result, missing = {}, []
+    for employee_id in employee_ids:
+        cached = query_cache.get(('available_tasks', employee_id))
+        if cached is MISSING:
+            missing.append(employee_id)
+        else:
+            result[employee_id] = cached
+    
+    if missing:
+        for employee_id, task_ids in _query_available(missing).items():
+            query_cache.set(('available_tasks', employee_id), task_ids, _ttl(), CACHE_TAGS)
+            result[employee_id] = task_ids
+    return result
+
+
+def available_tasks_for(employee_id):
+    """Lista de tareas (to_dict) disponibles para un empleado"""
+    catalog = active_task_catalog()
+    task_ids = available_task_ids([employee_id])[employee_id]
+    return [catalog[task_id] for task_id in task_ids if task_id in catalog]
@@ -0,0 +1,82 @@
+"""
+Caché en memoria con caducidad (TTL) y etiquetas por tabla.
+
+Cada entrada declara de qué tablas depende; al hacer commit de una
+transacción que modifica alguna de ellas (según las versiones de cambio
+de `app.versioning`) las entradas afectadas se descartan en este proceso.
+En otros workers caducan por TTL, por lo que este debe ser corto.
+"""
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from app import db
+
+MISSING = object()
+
+
+class TaggedTTLCache:
+    """Caché LRU con TTL por entrada e invalidación por etiquetas"""
+    
+    def __init__(self, maxsize=1024):
+        self._maxsize = maxsize
+        self._entries = OrderedDict()  # clave -> (caduca_en, valor, etiquetas)
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Devuelve el valor guardado o MISSING si no existe o ha caducado"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value, _ = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key, value, ttl, tags=()):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value, frozenset(tags))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+    
+    def get_or_set(self, key, compute, ttl, tags=()):
+        """Devuelve el valor guardado o lo calcula con `compute()` y lo guarda"""
+        value = self.get(key)
+        if value is MISSING:
+            value = compute()
+            self.set(key, value, ttl, tags)
+        return value
+    
+    def invalidate(self, *tags):
+        """Descarta las entradas que dependen de alguna de las etiquetas"""
+        tags = set(tags)
+        with self._lock:
+            for key in [k for k, (_, _, t) in self._entries.items() if t & tags]:
+                del self._entries[key]
+    
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+query_cache = TaggedTTLCache()
+
+
+def _after_commit(session):
+    tables = session.info.get('committed_version_bumps')
+    if tables:
+        query_cache.invalidate(*tables)
+
+
+def init_cache_invalidation():
+    """Invalida la caché tras cada commit (registrar después de init_versioning)"""
+    if not event.contains(db.session, 'after_commit', _after_commit):
+        event.listen(db.session, 'after_commit', _after_commit)
@@ -0,0 +1,155 @@
+"""
+Compresión de respuestas (gzip y brotli) negociada con `Accept-Encoding`.
+
+Los historiales, listados y exportaciones repiten en cada fila las mismas
+claves y nombres, así que comprimen muy bien. Se comprimen las respuestas de
+los tipos de `COMPRESS_MIMETYPES` a partir de `COMPRESS_MIN_SIZE` bytes; brotli
+solo si está instalado el paquete `brotli` (opcional). Los eventos en vivo
+(`text/event-stream`) no se comprimen.
+
+- Respuestas en streaming (listados `?stream=`, exportaciones CSV): se
+  comprimen según se generan, enviando lo comprimido cada
+  `COMPRESS_STREAM_FLUSH_SIZE` bytes de entrada, sin cargar el cuerpo entero.
+- Catálogos (`COMPRESS_CACHED_ENDPOINTS`): el cuerpo comprimido, con nivel
+  alto, se guarda por ETag y codificación. Mientras el ETag no cambie,
+  `versioned_etag` sirve esos bytes sin ejecutar la vista (`cached_response`).
+
+Al comprimir, el ETag pasa a débil (`W/`), ya que la representación cambia;
+`versioned_etag` y `view_etag` comparan los ETag con la comparación débil de If-None-Match.
+"""
+import gzip
+import zlib
+from flask import current_app, request
+from app.cache import TaggedTTLCache, MISSING
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Nivel alto para los cuerpos que se comprimen una vez y se reutilizan (brotli 10-11
+# tarda cientos de ms en un catálogo grande sin reducir apreciablemente el tamaño)
+CACHED_LEVELS = {'gzip': 9, 'br': 9}
+
+_compressed = TaggedTTLCache()
+
+
+def _levels(config):
+    return {'gzip': config['COMPRESS_GZIP_LEVEL'], 'br': config['COMPRESS_BROTLI_QUALITY']}
+
+
+def compress(data, encoding, level):
+    """Comprime `data` (bytes) de una vez"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _stream_compressor(encoding, level):
+    """(comprimir, vaciar, terminar) de un compresor incremental"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: formato gzip
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _compress_stream(chunks, encoding, level, flush_size):
+    """Comprime un iterable de fragmentos según se generan"""
+    process, flush, finish = _stream_compressor(encoding, level)
+    pending = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = process(chunk)
+            pending += len(chunk)
+            # Vaciar de vez en cuando para que el cliente reciba datos sin esperar al final
+            if pending >= flush_size:
+                data += flush()
+                pending = 0
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def _cached_compress(response, encoding):
+    """Comprime con nivel alto y guarda el cuerpo por ETag para `cached_response`"""
+    body = compress(response.get_data(), encoding, CACHED_LEVELS[encoding])
+    etag, _ = response.get_etag()
+    if etag:
+        _compressed.set((etag, encoding), (body, response.mimetype),
+                        current_app.config['COMPRESS_CACHE_TTL'])
+    return body
+
+
+def negotiate_encoding():
+    """Mejor codificación aceptada por el cliente ('br', 'gzip' o None)"""
+    offers = ('gzip',) if brotli is None else ('br', 'gzip')
+    return request.accept_encodings.best_match(offers)
+
+
+def cached_response(etag):
+    """Respuesta comprimida guardada de un catálogo para `etag`, o None.
+    
+    El ETag ya identifica la URL, el usuario y las versiones de los datos.
+    """
+    if request.endpoint not in current_app.config['COMPRESS_CACHED_ENDPOINTS']:
+        return None
+    encoding = negotiate_encoding()
+    entry = _compressed.get((etag, encoding)) if encoding else MISSING
+    if entry is MISSING:
+        return None
+    body, mimetype = entry
+    response = current_app.response_class(body, mimetype=mimetype)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def compress_response(response):
+    """Comprime la respuesta si el tipo, el tamaño y el cliente lo permiten"""
+    config = current_app.config
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.mimetype not in config['COMPRESS_MIMETYPES']
+            or 'Content-Encoding' in response.headers
+            or 'no-transform' in response.headers.get('Cache-Control', '')):
+        return response
+    if not response.is_streamed and \
+            response.calculate_content_length() < config['COMPRESS_MIN_SIZE']:
+        return response
+    
+    # La representación depende de Accept-Encoding aunque esta vez no se comprima
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+    
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding,
+                                             _levels(config)[encoding],
+                                             config['COMPRESS_STREAM_FLUSH_SIZE'])
+        response.headers.pop('Content-Length', None)
+        response.headers.pop('Accept-Ranges', None)
+    elif request.endpoint in config['COMPRESS_CACHED_ENDPOINTS']:
+        response.set_data(_cached_compress(response, encoding))
+    else:
+        response.set_data(compress(response.get_data(), encoding, _levels(config)[encoding]))
+    
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """Registra la compresión de respuestas (`COMPRESS_ENABLED`)"""
+    global _compressed
+    _compressed = TaggedTTLCache(maxsize=app.config['COMPRESS_CACHE_SIZE'])
+    
+    if app.config['COMPRESS_ENABLED']:
+        app.after_request(compress_response)
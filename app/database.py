@@ -0,0 +1,126 @@
+"""
+Acceso a la base de datos: límites de tiempo y réplica de lectura.
+
+Límites por sentencia (PostgreSQL): al empezar cada transacción de la sesión
+se ejecuta `SET LOCAL statement_timeout` con el límite del endpoint o
+blueprint de la petición (`DB_STATEMENT_TIMEOUTS`) o, si no tiene, con
+`DB_STATEMENT_TIMEOUT`. Al ser `LOCAL` termina con la transacción, así que
+no deja estado en la conexión y funciona igual detrás de PgBouncer en modo
+transacción.
+
+Réplica de lectura: si existe el bind `replica` (`DATABASE_REPLICA_URL`),
+`RoutingSession` envía a la réplica las SELECT de las peticiones de solo
+lectura (GET/HEAD/OPTIONS). Las escrituras, los flush, las sentencias de
+texto y las SELECT ... FOR UPDATE van siempre a la principal. Tras un
+POST/PUT/PATCH/DELETE correcto el usuario lee de la principal durante
+`DB_REPLICA_STICKY_SECONDS` (marca en la cookie de sesión), para que vea sus
+propios cambios aunque la réplica vaya con retraso.
+"""
+import time
+from contextlib import contextmanager
+from flask import current_app, has_request_context, request, session as http_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, Select
+
+REPLICA_BIND = 'replica'
+
+# Métodos HTTP que no modifican datos
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Clave en la cookie de sesión: leer de la principal hasta este instante (epoch)
+STICKY_KEY = 'db_primary_until'
+
+
+def statement_timeout(endpoint=None):
+    """Límite (ms) de un endpoint ('blueprint.vista'); 0 = sin límite.
+    
+    Sin `endpoint` se usa el de la petición actual.
+    """
+    config = current_app.config
+    overrides = config['DB_STATEMENT_TIMEOUTS']
+    if endpoint is None and has_request_context():
+        endpoint = request.endpoint
+    if endpoint:
+        for key in (endpoint, endpoint.rsplit('.', 1)[0]):
+            if key in overrides:
+                return overrides[key]
+    return config['DB_STATEMENT_TIMEOUT']
+
+
+def _after_begin(session, transaction, connection):
+    if connection.dialect.name != 'postgresql':
+        return
+    timeout = statement_timeout()
+    if timeout:
+        connection.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout)}')
+
+
+def init_statement_timeouts():
+    """Registra el límite por transacción en la sesión de Flask-SQLAlchemy"""
+    from app import db
+    
+    if not event.contains(db.session, 'after_begin', _after_begin):
+        event.listen(db.session, 'after_begin', _after_begin)
+
+
+# --- Réplica de lectura ---
+
+def _reads_from_primary():
+    """Indica si la petición actual debe leer de la principal"""
+    if not has_request_context() or request.method not in READ_METHODS:
+        return True
+    return http_session.get(STICKY_KEY, 0) > time.time()
+
+
+class RoutingSession(Session):
+    """Sesión que lee de la réplica en peticiones de solo lectura"""
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica(clause):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+    
+    def _use_replica(self, clause):
+        if not isinstance(clause, Select) or clause._for_update_arg is not None:
+            return False
+        # Con cambios pendientes o ya escritos en esta transacción se lee de la principal
+        if self._flushing or not self._is_clean() or self.info.get('pending_version_bumps'):
+            return False
+        if self.info.get('force_primary'):
+            return False
+        if REPLICA_BIND not in self._db.engines:
+            return False
+        return not _reads_from_primary()
+
+
+def read_engine():
+    """Engine del que lee la petición actual: la réplica salvo si debe leer de la principal"""
+    from app import db
+    
+    if REPLICA_BIND in db.engines and not _reads_from_primary():
+        return db.engines[REPLICA_BIND]
+    return db.engine
+
+
+@contextmanager
+def use_primary():
+    """Fuerza las lecturas de la sesión a la BD principal dentro del bloque"""
+    from app import db
+    
+    info = db.session.info
+    info['force_primary'] = info.get('force_primary', 0) + 1
+    try:
+        yield
+    finally:
+        info['force_primary'] -= 1
+
+
+def init_replica_routing(app):
+    """Marca al usuario para leer de la principal tras sus propias escrituras"""
+    
+    @app.after_request
+    def _stick_to_primary(response):
+        if (REPLICA_BIND in current_app.config['SQLALCHEMY_BINDS']
+                and request.method not in READ_METHODS and response.status_code < 400):
+            http_session[STICKY_KEY] = time.time() + current_app.config['DB_REPLICA_STICKY_SECONDS']
+        return response
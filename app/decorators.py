@@ -1,5 +1,7 @@
+import hashlib
+from datetime import datetime
 from functools import wraps
-from flask import flash, redirect, url_for
+from flask import flash, redirect, url_for, request, make_response
 from flask_login import current_user
 
 
@@ -16,4 +18,81 @@ def admin_required(f):
             return redirect(url_for('main.index'))
         
         return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+    return decorated_function
+
+
+def etag_for(full_path, user_id, tables, versions, hourly=False):
+    """ETag de una respuesta a partir de la URL, el usuario, la fecha y las versiones.
+    
+    Con `hourly` se incluye también la hora (UTC), para respuestas que cambian
+    con el reloj aunque no cambien los datos.
+    """
+    now = datetime.utcnow()
+    key = '|'.join([
+        full_path,
+        user_id or '',
+        now.strftime('%Y-%m-%dT%H') if hourly else now.date().isoformat(),
+        ','.join(f'{table}:{versions[table]}' for table in tables)
+    ])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def _etag_response(etag, make_body):
+    from app.compression import cached_response
+    
+    # Comparación débil: las respuestas comprimidas llevan el ETag como W/"..."
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+    else:
+        # Catálogos con el cuerpo comprimido ya guardado para este ETag: sin ejecutar la vista
+        response = cached_response(etag)
+        if response is None:
+            response = make_response(make_body())
+            if response.status_code != 200:
+                return response
+    
+    response.set_etag(etag, weak='Content-Encoding' in response.headers)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _request_etag(tables, versions, hourly):
+    user_id = current_user.get_id() if current_user.is_authenticated else ''
+    return etag_for(request.full_path, user_id, tables, versions, hourly)
+
+
+def versioned_etag(*tables, hourly=False):
+    """Decorador que responde 304 si no ha cambiado ninguna de las tablas.
+    
+    El ETag se calcula a partir de las versiones de cambio de las tablas,
+    la URL, el usuario y la fecha (UTC), sin consultar los datos en sí.
+    Con `hourly=True` el ETag cambia además cada hora (ver `etag_for`).
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            from app.versioning import get_versions
+            
+            # Leer las versiones ANTES de ejecutar la vista: si hay una escritura
+            # concurrente, el ETag queda por detrás del cuerpo y no al revés
+            etag = _request_etag(tables, get_versions(tables), hourly)
+            return _etag_response(etag, lambda: f(*args, **kwargs))
+        return decorated_function
+    return decorator
+
+
+def view_etag(*tables, hourly=False):
+    """Como `versioned_etag`, para vistas que sirven datos de una caché o del
+    registro en memoria.
+    
+    La vista devuelve `(versiones, cuerpo)`, con las versiones que refleja el
+    cuerpo, y el ETag se calcula con ellas: nunca va por delante de los datos
+    aunque la caché o el registro vayan por detrás de la BD.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            versions, body = f(*args, **kwargs)
+            return _etag_response(_request_etag(tables, versions, hourly), lambda: body)
+        return decorated_function
+    return decorator
@@ -0,0 +1,138 @@
+"""
+Bus de eventos en memoria para notificar cambios en vivo (Server-Sent Events).
+
+Las rutas publican un evento después de cada commit relevante y cada conexión
+SSE abierta recibe una copia en su propia cola. Como en la API REST, un
+empleado solo recibe los eventos de sus propias asignaciones y fichajes; los
+administradores los reciben todos. El bus vive en el proceso, así
+que los cambios hechos en otros workers se detectan con las versiones de
+`change_versions`: cada `EVENTS_VERSION_CHECK_INTERVAL` segundos (una consulta
+por proceso) se comparan con las ya notificadas aquí y, si avanzaron, se envía
+`resync` a los clientes para que recarguen. Debe desplegarse con workers que
+admitan conexiones largas (hilos o gevent).
+"""
+import itertools
+import queue
+import threading
+import time
+from app.versioning import committed_version_bumps
+
+# Eventos pendientes por cliente antes de considerarlo lento
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Tablas cuyos cambios se notifican por el bus
+WATCHED_TABLES = ('task_assignments', 'attendance')
+
+
+class EventBus:
+    """Distribuye eventos a todos los suscriptores conectados"""
+    
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self._queue_size = queue_size
+        # Cola de cada suscriptor -> empleado cuyos eventos recibe (None: todos)
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        # Versiones de WATCHED_TABLES ya notificadas a los clientes (None: sin leer)
+        self._versions = None
+        self._next_check = 0.0
+    
+    def subscribe(self, employee_id=None):
+        """Registra un nuevo suscriptor y devuelve su cola.
+        
+        Con `employee_id` solo recibe los eventos de ese empleado (y los `resync`).
+        """
+        subscriber = queue.Queue(maxsize=self._queue_size)
+        with self._lock:
+            self._subscribers[subscriber] = employee_id
+        return subscriber
+    
+    def unsubscribe(self, subscriber):
+        """Elimina un suscriptor (al cerrarse la conexión)"""
+        with self._lock:
+            self._subscribers.pop(subscriber, None)
+            if not self._subscribers:
+                # Sin clientes no se comprueba nada: se vuelve a leer la base al conectar otro
+                self._versions = None
+    
+    def publish(self, event_type, data, employee_id=None):
+        """Envía un evento a los suscriptores de `employee_id` (None: a todos)"""
+        event = {'id': next(self._ids), 'type': event_type, 'data': data}
+        with self._lock:
+            subscribers = [subscriber for subscriber, only in self._subscribers.items()
+                           if employee_id is None or only is None or only == employee_id]
+        
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Cliente lento: se descartan sus eventos y se le pide recargar todo
+                self._reset(subscriber)
+    
+    def _reset(self, subscriber):
+        try:
+            while True:
+                subscriber.get_nowait()
+        except queue.Empty:
+            pass
+        subscriber.put_nowait({'id': next(self._ids), 'type': 'resync', 'data': {}})
+    
+    def note_versions(self, versions):
+        """Registra versiones cuyos cambios ya se publicaron en este proceso"""
+        with self._lock:
+            if self._versions is None:
+                return
+            for table, version in versions.items():
+                if table in self._versions:
+                    self._versions[table] = max(self._versions[table], version)
+    
+    def check_versions(self, fetch, interval):
+        """Detecta cambios confirmados en otros procesos.
+        
+        Como mucho una vez cada `interval` segundos, `fetch()` lee las versiones
+        de WATCHED_TABLES; si alguna avanzó más allá de las notificadas aquí se
+        pide a todos los clientes que recarguen (`resync`).
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + interval
+        
+        versions = fetch()
+        with self._lock:
+            previous = self._versions
+            self._versions = dict(versions)
+            if previous is not None:
+                # Las versiones publicadas aquí mientras se consultaba no retroceden
+                for table, version in previous.items():
+                    self._versions[table] = max(self._versions.get(table, 0), version)
+        
+        if previous is not None and any(version > previous.get(table, 0)
+                                        for table, version in versions.items()):
+            self.publish('resync', {})
+    
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+event_bus = EventBus()
+
+
+def _event_employee(data):
+    # Los eventos llevan el registro afectado: {'assignment': {...}} o {'attendance': {...}}
+    for record in data.values():
+        if isinstance(record, dict) and 'employee_id' in record:
+            return record['employee_id']
+    raise ValueError('El evento no indica a qué empleado pertenece')
+
+
+def publish(event_type, data):
+    """Atajo para publicar en el bus global (tras el commit que causó el cambio).
+    
+    Solo lo reciben los administradores y el empleado del registro afectado.
+    """
+    event_bus.note_versions({table: last for table, (_, last) in committed_version_bumps().items()})
+    event_bus.publish(event_type, data, _event_employee(data))
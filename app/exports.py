@@ -0,0 +1,132 @@
+"""
+Exportación de historiales a CSV y XLSX sin cargar todas las filas en memoria.
+
+Las filas se leen de un cursor del servidor por lotes (`iter_query`) y se
+escriben según llegan. El CSV se envía en streaming; el XLSX se genera con
+XlsxWriter en modo `constant_memory` sobre un fichero temporal que después se
+envía por bloques. XlsxWriter es opcional: si no está instalado solo se
+ofrece CSV.
+"""
+import csv
+import itertools
+import os
+import tempfile
+from datetime import datetime
+from flask import Response, stream_with_context
+from app.streaming import iter_query
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+# Tamaño de los bloques al enviar el fichero XLSX
+FILE_CHUNK_SIZE = 64 * 1024
+
+# Columnas exportadas (mismas claves que to_dict más los campos derivados)
+ASSIGNMENT_EXPORT_FIELDS = (
+    'id', 'employee_id', 'employee_name', 'task_id', 'task_name', 'is_break',
+    'status', 'start_time', 'end_time', 'pause_time', 'total_paused_duration',
+    'duration_minutes', 'notes', 'created_at', 'updated_at'
+)
+
+ATTENDANCE_EXPORT_FIELDS = (
+    'id', 'employee_id', 'employee_name', 'location', 'location_display',
+    'check_in', 'check_out', 'duration_minutes', 'duration_formatted',
+    'is_active', 'notes', 'created_at', 'updated_at'
+)
+
+
+def assignment_export_row(assignment):
+    """Fila de exportación de una asignación: to_dict más la duración neta"""
+    row = assignment.to_dict()
+    if assignment.end_time:
+        row['duration_minutes'] = assignment.get_duration_minutes()
+    else:
+        row['duration_minutes'] = assignment.get_elapsed_minutes()
+    return row
+
+
+def attendance_export_row(attendance):
+    """Fila de exportación de un fichaje (to_dict ya incluye la duración)"""
+    return attendance.to_dict()
+
+
+def xlsx_available():
+    """Indica si está instalado XlsxWriter"""
+    try:
+        import xlsxwriter  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _Echo:
+    """Pseudo-fichero para csv.writer: devuelve la línea en lugar de guardarla"""
+    
+    def write(self, value):
+        return value
+
+
+def _iter_csv(rows, fields):
+    writer = csv.writer(_Echo())
+    # BOM para que Excel detecte UTF-8
+    yield '\ufeff' + writer.writerow(fields)
+    for data in rows:
+        yield writer.writerow([_csv_value(data.get(field)) for field in fields])
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value
+
+
+def _write_xlsx(path, rows, fields):
+    import xlsxwriter
+    
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    worksheet = workbook.add_worksheet()
+    worksheet.write_row(0, 0, fields, workbook.add_format({'bold': True}))
+    for row_number, data in enumerate(rows, start=1):
+        worksheet.write_row(row_number, 0, [data.get(field) for field in fields])
+    workbook.close()
+
+
+def _iter_file(path):
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(FILE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def export_response(query, fields, serialize, fmt, name, archived=()):
+    """Respuesta de descarga con las filas de `query` en CSV o XLSX.
+    
+    `archived` son filas ya serializadas (del archivo frío) que van delante.
+    """
+    filename = f"{name}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+    rows = itertools.chain(archived, (serialize(row) for row in iter_query(query)))
+    
+    if fmt == 'xlsx':
+        fd, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        try:
+            _write_xlsx(path, rows, fields)
+        except Exception:
+            os.remove(path)
+            raise
+        headers['Content-Length'] = str(os.path.getsize(path))
+        return Response(
+            _iter_file(path),
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            headers=headers
+        )
+    
+    return Response(stream_with_context(_iter_csv(rows, fields)),
+                    mimetype='text/csv; charset=utf-8', headers=headers)
@@ -0,0 +1,242 @@
+"""
+Historial de asignaciones de un empleado o una tarea.
+
+Admite ventana temporal (`from` / `to`, YYYY-MM-DD), paginación por cursor
+(`limit` / `cursor`, orden `start_time`, `id` descendente) e incluye un
+resumen calculado en SQL: tiempo total, número de asignaciones, media y
+mediana de duración y comparación con `estimated_duration`. Si la ventana
+llega más atrás del corte del archivo frío, se incluyen también las
+asignaciones archivadas.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import request, current_app
+from sqlalchemy import select, func, case, and_
+from app import db
+from app.models import TaskAssignment, Task
+from app.archive import reaches_archive, iter_archived, archived_dict, archive_generation
+from app.cache import query_cache
+from app.pagination import encode_cursor, decode_cursor, apply_keyset, get_page_size
+from app.rollups import minutes_expression
+from app.serializers import serialize_assignments, with_assignment_relations
+
+
+def _window():
+    """Lee `from` y `to` (YYYY-MM-DD, ambos incluidos) como datetimes o None.
+    
+    Lanza ValueError si alguna fecha no es válida.
+    """
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    try:
+        date_from = datetime.strptime(date_from, '%Y-%m-%d') if date_from else None
+        date_to = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1) if date_to else None
+    except ValueError as e:
+        raise ValueError('Formato de fecha inválido. Use YYYY-MM-DD') from e
+    return date_from, date_to
+
+
+def _window_conditions(date_from, date_to):
+    conditions = []
+    if date_from:
+        conditions.append(TaskAssignment.start_time >= date_from)
+    if date_to:
+        conditions.append(TaskAssignment.start_time < date_to)
+    return conditions
+
+
+def _net_minutes(dialect_name):
+    return (minutes_expression(dialect_name)
+            - func.coalesce(TaskAssignment.total_paused_duration, 0))
+
+
+def _archived_durations(date_from, date_to, archive_filters):
+    """Duraciones agregadas de las asignaciones archivadas de la ventana.
+    
+    Devuelve {'tasks': {task_id: [número, minutos]}, 'minutes': Counter de minutos
+    trabajados, 'break_count', 'break_minutes'}. Se guarda en caché por versión del
+    archivo, para no releer los ficheros en cada página del mismo historial.
+    """
+    def compute():
+        durations = {'tasks': {}, 'minutes': Counter(), 'break_count': 0, 'break_minutes': 0}
+        for record in iter_archived('task_assignments', date_from, date_to, **archive_filters):
+            start = datetime.fromisoformat(record['start_time'])
+            end = datetime.fromisoformat(record['end_time'])
+            minutes = int((end - start).total_seconds() // 60) - (record.get('total_paused_duration') or 0)
+            if record.get('task_id') is None:
+                durations['break_count'] += 1
+                durations['break_minutes'] += minutes
+                continue
+            task = durations['tasks'].setdefault(record['task_id'], [0, 0])
+            task[0] += 1
+            task[1] += minutes
+            durations['minutes'][minutes] += 1
+        return durations
+    
+    key = ('archived_durations', archive_generation('task_assignments'), date_from, date_to,
+           tuple(sorted(archive_filters.items())))
+    return query_cache.get_or_set(key, compute, ttl=current_app.config['ARCHIVE_SUMMARY_TTL'])
+
+
+def _counter_median(values, count):
+    """Mediana de `count` valores dados como Counter {valor: repeticiones}"""
+    middle = {(count - 1) // 2, count // 2}
+    found = []
+    seen = 0
+    for value in sorted(values):
+        repeats = values[value]
+        found += [value] * len({position for position in middle
+                                if seen <= position < seen + repeats})
+        seen += repeats
+        if seen > count // 2:
+            break
+    return sum(found) / len(found)
+
+
+def _summary(conditions, archived):
+    """Resumen de la ventana: agregados en SQL más los de `_archived_durations` (o None)"""
+    dialect_name = db.session.get_bind().dialect.name
+    net = _net_minutes(dialect_name)
+    is_break = TaskAssignment.task_id.is_(None)
+    closed = TaskAssignment.end_time.isnot(None)
+    worked = and_(closed, ~is_break)
+    estimated = and_(worked, Task.estimated_duration.isnot(None))
+    
+    columns = [
+        func.count(case((worked, 1))),
+        func.count(case((~closed, 1))),
+        func.coalesce(func.sum(case((worked, net))), 0),
+        func.coalesce(func.sum(case((estimated, net))), 0),
+        func.coalesce(func.sum(case((estimated, Task.estimated_duration))), 0),
+        func.count(case((estimated, 1))),
+        func.count(case((and_(closed, is_break), 1))),
+        func.coalesce(func.sum(case((and_(closed, is_break), net))), 0),
+    ]
+    if dialect_name == 'postgresql':
+        columns.append(func.percentile_cont(0.5).within_group(case((worked, net))))
+    
+    base = select(*columns).select_from(TaskAssignment).outerjoin(
+        Task, Task.id == TaskAssignment.task_id).where(*conditions)
+    row = db.session.execute(base).one()
+    (count, open_count, total, estimated_actual, estimated_total, estimated_count,
+     break_count, break_minutes) = row[:8]
+    
+    # Asignaciones archivadas (mismo cálculo que en SQL, con la estimación actual)
+    archived_count = 0
+    if archived:
+        estimates = dict(db.session.query(Task.id, Task.estimated_duration).all())
+        for task_id, (task_count, minutes) in archived['tasks'].items():
+            archived_count += task_count
+            total += minutes
+            estimate = estimates.get(task_id)
+            if estimate is not None:
+                estimated_actual += minutes
+                estimated_total += estimate * task_count
+                estimated_count += task_count
+        count += archived_count
+        break_count += archived['break_count']
+        break_minutes += archived['break_minutes']
+    
+    if not count:
+        median = None
+    elif dialect_name == 'postgresql' and not archived_count:
+        median = row[8]
+    elif not archived_count:
+        # SQLite no tiene percentile_cont: los uno o dos valores centrales por OFFSET
+        values = select(net).select_from(TaskAssignment).where(
+            *conditions, closed, ~is_break).order_by(net)
+        middle = db.session.execute(
+            values.limit(2 - count % 2).offset((count - 1) // 2)).scalars().all()
+        median = sum(middle) / len(middle)
+    else:
+        # Duraciones distintas de la BD y del archivo, con sus repeticiones
+        values = Counter(dict(db.session.execute(
+            select(net, func.count()).select_from(TaskAssignment)
+            .where(*conditions, closed, ~is_break).group_by(net)).all()))
+        values.update(archived['minutes'])
+        median = _counter_median(values, count)
+    
+    return {
+        'count': count,
+        'open_count': open_count,
+        'total_minutes': total,
+        'mean_minutes': round(total / count, 2) if count else None,
+        'median_minutes': float(median) if median is not None else None,
+        'estimated_minutes': estimated_total,
+        'mean_estimated_minutes': round(estimated_total / estimated_count, 2)
+        if estimated_count else None,
+        'actual_vs_estimated': round(estimated_actual / estimated_total, 3)
+        if estimated_total else None,
+        'break_count': break_count,
+        'break_minutes': break_minutes,
+    }
+
+
+def assignment_history(condition, **archive_filters):
+    """Respuesta de historial para las asignaciones que cumplen `condition`.
+    
+    `archive_filters` (employee_id / task_id) se aplican al archivo frío.
+    Lanza ValueError si `from`, `to` o `cursor` no son válidos.
+    """
+    date_from, date_to = _window()
+    conditions = [condition] + _window_conditions(date_from, date_to)
+    
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    position = decode_cursor(cursor) if cursor else None
+    
+    # El archivo solo se lee entero para el resumen (en caché); las filas, por páginas
+    reaches = reaches_archive('task_assignments', date_from)
+    archive_to = date_to - timedelta(microseconds=1) if date_to else None
+    
+    query = TaskAssignment.query.filter(*conditions)
+    result = {
+        'from': date_from.date().isoformat() if date_from else None,
+        'to': (date_to - timedelta(days=1)).date().isoformat() if date_to else None,
+        'summary': _summary(conditions, _archived_durations(date_from, archive_to, archive_filters)
+                            if reaches else None),
+    }
+    
+    # Sin limit ni cursor se devuelve la ventana completa (compatibilidad)
+    if not limit and not cursor:
+        rows = serialize_assignments(query.order_by(TaskAssignment.start_time.desc(),
+                                                    TaskAssignment.id.desc()))
+        if reaches:
+            rows += [archived_dict('task_assignments', record) for record in
+                     iter_archived('task_assignments', date_from, archive_to, **archive_filters)]
+        rows.sort(key=lambda row: (row['start_time'], row['id']), reverse=True)
+        result['assignments'] = rows
+        return result
+    
+    page_size = get_page_size(limit, current_app.config['ITEMS_PER_PAGE'],
+                              current_app.config['MAX_ITEMS_PER_PAGE'])
+    if position:
+        query = apply_keyset(query, TaskAssignment.start_time, TaskAssignment.id, position)
+    query = query.order_by(TaskAssignment.start_time.desc(), TaskAssignment.id.desc())
+    
+    # Página: las filas de la BD y del archivo posteriores al cursor, mezcladas en orden
+    rows = [(a.start_time, a.id, a.to_dict()) for a in
+            with_assignment_relations(query).limit(page_size + 1)]
+    if reaches:
+        # Del archivo se leen, de más reciente a más antiguo, solo los ficheros
+        # desde el cursor y hasta completar la página
+        if position and (archive_to is None or position[0] < archive_to):
+            archive_to = position[0]
+        taken = 0
+        for record in iter_archived('task_assignments', date_from, archive_to,
+                                   descending=True, **archive_filters):
+            key = (datetime.fromisoformat(record['start_time']), record['id'])
+            if position and key >= position:
+                continue
+            rows.append(key + (archived_dict('task_assignments', record),))
+            taken += 1
+            if taken > page_size:
+                break
+    rows.sort(key=lambda row: (row[0], row[1]), reverse=True)
+    
+    page = rows[:page_size]
+    result['assignments'] = [row[2] for row in page]
+    result['limit'] = page_size
+    result['next_cursor'] = encode_cursor(page[-1][0], page[-1][1]) \
+        if len(rows) > page_size else None
+    return result
@@ -0,0 +1,100 @@
+"""
+Proveedor JSON de la aplicación (`app.json`).
+
+En las listas grandes (historiales, fichajes, exportaciones en streaming) la
+mayor parte del tiempo de CPU se va en codificar JSON. Si está instalado
+orjson (opcional) se usa como codificador; si no, el módulo `json` estándar
+con el mismo formato de fechas. `JSON_PROVIDER` lo elige: 'auto' (orjson si
+está instalado), 'orjson' o 'stdlib'.
+
+Fechas: los `datetime` sin zona horaria se guardan en UTC y se escriben en
+ISO 8601 con sufijo 'Z' (`2024-01-31T09:15:00Z`), y los `date` en ISO
+(`2024-01-31`). Los `to_dict` de los modelos usan `iso_utc`, que aplica la
+misma regla, así que la salida es igual tanto si la fecha se convierte en
+el modelo como en el proveedor.
+"""
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def iso_utc(value):
+    """datetime -> ISO 8601; sin zona horaria se asume UTC y se añade 'Z'"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.isoformat() + 'Z'
+    return value.isoformat()
+
+
+def _default(o):
+    """Tipos sin codificación nativa (el resto como Flask: Decimal, UUID, dataclasses...)"""
+    if isinstance(o, datetime):
+        return iso_utc(o)
+    if isinstance(o, date):
+        return o.isoformat()
+    if isinstance(o, tuple):
+        return list(o)
+    return DefaultJSONProvider.default(o)
+
+
+class UTCJSONProvider(DefaultJSONProvider):
+    """Proveedor con el módulo json estándar y fechas ISO 8601 en UTC"""
+    
+    default = staticmethod(_default)
+    
+    def dumps_bytes(self, obj):
+        """JSON compacto en bytes (cuerpos de respuesta)"""
+        return self.dumps(obj, separators=(',', ':')).encode()
+
+
+class OrjsonProvider(UTCJSONProvider):
+    """Proveedor con orjson: mismo formato de salida y varias veces más rápido.
+    
+    Las llamadas con opciones propias del módulo json (`object_hook` de la cookie
+    de sesión, `indent`, `cls`...) se delegan en el proveedor estándar.
+    """
+    
+    def _options(self, indent=False):
+        options = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+    
+    def dumps_bytes(self, obj, indent=False):
+        """JSON compacto en bytes (cuerpos de respuesta)"""
+        return orjson.dumps(obj, default=_default, option=self._options(indent))
+    
+    def dumps(self, obj, **kwargs):
+        if set(kwargs) - {'separators'}:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Con indentación en modo debug, como el proveedor por defecto de Flask
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.dumps_bytes(obj, indent), mimetype=self.mimetype)
+
+
+def init_json(app):
+    """Instala el proveedor JSON según `JSON_PROVIDER`"""
+    choice = app.config['JSON_PROVIDER']
+    if choice == 'auto':
+        choice = 'stdlib' if orjson is None else 'orjson'
+    if choice not in ('orjson', 'stdlib'):
+        raise ValueError(f'JSON_PROVIDER no válido: {choice}')
+    if choice == 'orjson' and orjson is None:
+        raise ValueError('JSON_PROVIDER=orjson requiere instalar orjson')
+    app.json = (OrjsonProvider if choice == 'orjson' else UTCJSONProvider)(app)
@@ -0,0 +1,237 @@
+"""
+Registro en memoria de quién está haciendo qué en este momento.
+
+Mantiene las asignaciones activas (como máximo una por empleado) y los
+fichajes abiertos, para que los endpoints "actuales" no consulten
+`task_assignments` en cada sondeo. Es coherente con la BD así:
+
+- Se carga de la BD en el primer uso y guarda las versiones de cambio
+  (`change_versions`) que refleja.
+- Las rutas de escritura aplican sus cambios tras el commit; solo se aplican
+  si la versión de la tabla avanzó justo desde la que tiene el registro.
+  Si no (otro worker escribió en medio), el registro se marca obsoleto.
+- Cada `LIVE_STATE_CHECK_INTERVAL` segundos compara sus versiones con las de
+  la BD (una consulta por clave primaria) y se recarga si difieren; cada
+  `LIVE_STATE_RESYNC_INTERVAL` segundos se recarga entera igualmente.
+
+La app asíncrona (app/async_api.py) comparte el registro: decide con
+`refresh_due()` y lo recarga con su propia sesión mediante `replace()`.
+"""
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select
+from app.models import Attendance, TaskAssignment, ACTIVE_ASSIGNMENT_STATUSES, format_minutes
+from app.versioning import get_versions, committed_version_bumps
+from app.database import use_primary
+
+# Tablas de las que dependen los datos guardados (incluye nombres de empleado y tarea)
+WATCHED_TABLES = ('task_assignments', 'attendance', 'employees', 'tasks')
+
+
+def _sort_key(assignment):
+    return (assignment['start_time'], assignment['id'])
+
+
+def snapshot_statements():
+    """Sentencias de las asignaciones activas y los fichajes abiertos (con relaciones)"""
+    from app.serializers import with_assignment_relations, with_attendance_relations
+    
+    return (
+        with_assignment_relations(select(TaskAssignment)).where(
+            TaskAssignment.status.in_(ACTIVE_ASSIGNMENT_STATUSES)
+        ),
+        with_attendance_relations(select(Attendance)).where(
+            Attendance.check_out.is_(None)
+        )
+    )
+
+
+def _with_live_duration(attendance):
+    """Copia del fichaje con la duración recalculada hasta ahora"""
+    record = dict(attendance)
+    check_in = datetime.fromisoformat(record['check_in'].rstrip('Z'))
+    minutes = int((datetime.utcnow() - check_in).total_seconds() / 60)
+    record['duration_minutes'] = minutes
+    record['duration_formatted'] = format_minutes(minutes)
+    return record
+
+
+class LiveStateRegistry:
+    """Asignaciones activas y fichajes abiertos, indexados por empleado"""
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._assignments = {}
+        self._attendances = {}
+        self._versions = None
+        self._stale = True
+        self._checked_at = 0.0
+        self._loaded_at = 0.0
+    
+    # Carga y comprobación ---------------------------------------------------
+    
+    def _read_from_db(self):
+        from app import db
+        
+        # Las versiones se leen ANTES que los datos (ver versioned_etag). Siempre de la
+        # principal: las rutas de escritura aplican sus cambios sobre estas versiones
+        with use_primary():
+            versions = get_versions(WATCHED_TABLES)
+            assignments, attendances = (
+                [row.to_dict() for row in db.session.scalars(statement)]
+                for statement in snapshot_statements()
+            )
+        return (
+            versions,
+            {a['employee_id']: a for a in assignments},
+            {a['employee_id']: a for a in attendances}
+        )
+    
+    def replace(self, versions, assignments, attendances):
+        """Sustituye el estado por el leído de la BD (listas serializadas)"""
+        with self._lock:
+            self._versions = versions
+            self._assignments = {a['employee_id']: a for a in assignments}
+            self._attendances = {a['employee_id']: a for a in attendances}
+            self._stale = False
+            self._checked_at = self._loaded_at = time.monotonic()
+    
+    def load(self):
+        """Recarga todo el estado desde la BD"""
+        versions, assignments, attendances = self._read_from_db()
+        self.replace(versions, assignments.values(), attendances.values())
+    
+    def refresh_due(self):
+        """'load' si hay que recargar, 'check' si toca comparar versiones o None"""
+        config = current_app.config
+        now = time.monotonic()
+        with self._lock:
+            if self._stale or now - self._loaded_at >= config['LIVE_STATE_RESYNC_INTERVAL']:
+                return 'load'
+            if now - self._checked_at < config['LIVE_STATE_CHECK_INTERVAL']:
+                return None
+            return 'check'
+    
+    def mark_checked(self, versions):
+        """Anota una comprobación; False si las versiones de la BD no coinciden"""
+        with self._lock:
+            if versions != self._versions:
+                return False
+            self._checked_at = time.monotonic()
+            return True
+    
+    def _ensure_fresh(self):
+        with self._lock:
+            due = self.refresh_due()
+            if due == 'check':
+                with use_primary():
+                    versions = get_versions(WATCHED_TABLES)
+                if self.mark_checked(versions):
+                    return
+            if due is not None:
+                self.load()
+    
+    def verify(self):
+        """Compara el registro con la BD, lo corrige y devuelve las diferencias"""
+        _, db_assignments, db_attendances = self._read_from_db()
+        differences = []
+        
+        with self._lock:
+            for name, mine, theirs in (('assignments', self._assignments, db_assignments),
+                                       ('attendances', self._attendances, db_attendances)):
+                for employee_id in sorted(set(mine) | set(theirs)):
+                    cached = mine.get(employee_id)
+                    stored = theirs.get(employee_id)
+                    if (cached or {}).get('id') != (stored or {}).get('id') or \
+                            (cached or {}).get('status') != (stored or {}).get('status'):
+                        differences.append({
+                            'kind': name,
+                            'employee_id': employee_id,
+                            'registry_id': cached['id'] if cached else None,
+                            'database_id': stored['id'] if stored else None
+                        })
+        
+        self.load()
+        return differences
+    
+    # Actualizaciones desde las rutas de escritura ------------------------------
+    
+    def _apply(self, table, mutate):
+        bump = committed_version_bumps().get(table)
+        with self._lock:
+            if self._stale or self._versions is None:
+                return
+            # Solo si nadie más cambió la tabla entre la carga y este commit
+            if bump is None or self._versions.get(table) != bump[0] - 1:
+                self._stale = True
+                return
+            mutate()
+            self._versions[table] = bump[1]
+    
+    def assignment_changed(self, *assignments):
+        """Aplica las asignaciones guardadas en un mismo commit (creadas, detenidas...)"""
+        def mutate():
+            for assignment in assignments:
+                current = self._assignments.get(assignment['employee_id'])
+                if assignment['status'] in ACTIVE_ASSIGNMENT_STATUSES:
+                    self._assignments[assignment['employee_id']] = assignment
+                elif current and current['id'] == assignment['id']:
+                    del self._assignments[assignment['employee_id']]
+        self._apply('task_assignments', mutate)
+    
+    def assignment_deleted(self, assignment_id, employee_id):
+        def mutate():
+            current = self._assignments.get(employee_id)
+            if current and current['id'] == assignment_id:
+                del self._assignments[employee_id]
+        self._apply('task_assignments', mutate)
+    
+    def attendance_changed(self, attendance):
+        """Aplica un fichaje recién guardado (entrada o salida)"""
+        def mutate():
+            if attendance['check_out'] is None:
+                self._attendances[attendance['employee_id']] = attendance
+            else:
+                self._attendances.pop(attendance['employee_id'], None)
+        self._apply('attendance', mutate)
+    
+    # Lecturas ----------------------------------------------------------------
+    
+    # Con refresh=False no se consulta la BD (la app asíncrona refresca por su cuenta)
+    
+    def versions(self, tables=WATCHED_TABLES, refresh=True):
+        """Versiones de cambio que reflejan los datos del registro (para el ETag).
+        
+        Pueden ir por detrás de la BD hasta la siguiente comprobación; un ETag
+        calculado con ellas corresponde siempre a lo que sirve el registro.
+        """
+        if refresh:
+            self._ensure_fresh()
+        with self._lock:
+            return {table: self._versions[table] for table in tables}
+    
+    def active_assignments(self, statuses=ACTIVE_ASSIGNMENT_STATUSES, refresh=True):
+        """Asignaciones activas con los estados dados, más recientes primero"""
+        if refresh:
+            self._ensure_fresh()
+        with self._lock:
+            assignments = [a for a in self._assignments.values() if a['status'] in statuses]
+        return sorted(assignments, key=_sort_key, reverse=True)
+    
+    def employee_assignment(self, employee_id, refresh=True):
+        if refresh:
+            self._ensure_fresh()
+        with self._lock:
+            return self._assignments.get(employee_id)
+    
+    def open_attendance(self, employee_id, refresh=True):
+        if refresh:
+            self._ensure_fresh()
+        with self._lock:
+            attendance = self._attendances.get(employee_id)
+        return _with_live_duration(attendance) if attendance else None
+
+
+live_state = LiveStateRegistry()
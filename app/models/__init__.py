@@ -1,6 +1,16 @@
 from datetime import datetime
 from app import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.json_provider import iso_utc
+from app.passwords import hash_password, verify_password
+
+
+# Estados de una asignación activa (como máximo una por empleado)
+ACTIVE_ASSIGNMENT_STATUSES = ('en_progreso', 'descanso')
+
+
+def format_minutes(minutes):
+    """Minutos -> 'HH:MM'"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
 
 
 # Tabla intermedia para tareas asignables a empleados específicos
@@ -33,6 +43,14 @@ class Attendance(db.Model):
     # Relación con empleado
     employee = db.relationship('Employee', backref=db.backref('attendances', lazy='dynamic'))
     
+    # Como máximo un fichaje abierto por empleado (garantizado por la BD; con la tabla
+    # particionada en PostgreSQL lo garantiza un trigger, ver migración e6a1c4b83f90)
+    __table_args__ = (
+        db.Index('uq_attendance_open_per_employee', 'employee_id', unique=True,
+                 postgresql_where=db.text('check_out IS NULL'),
+                 sqlite_where=db.text('check_out IS NULL')),
+    )
+    
     def __repr__(self):
         return f'<Attendance {self.employee.name if self.employee else "Unknown"} - {self.check_in}>'
     
@@ -47,10 +65,7 @@ class Attendance(db.Model):
     
     def get_duration_formatted(self):
         """Retorna duración formateada como HH:MM"""
-        minutes = self.get_duration_minutes()
-        hours = minutes // 60
-        mins = minutes % 60
-        return f"{hours:02d}:{mins:02d}"
+        return format_minutes(self.get_duration_minutes())
     
     def is_active(self):
         """Verifica si el fichaje está activo (sin salida)"""
@@ -58,27 +73,22 @@ class Attendance(db.Model):
     
     def to_dict(self):
         """Convierte el objeto a diccionario"""
-        def to_iso_utc(dt):
-            if dt is None:
-                return None
-            if dt.tzinfo is None:
-                return dt.isoformat() + 'Z'
-            return dt.isoformat()
-        
+        employee = self.employee
+        minutes = self.get_duration_minutes()
         return {
             'id': self.id,
             'employee_id': self.employee_id,
-            'employee_name': self.employee.name if self.employee else None,
-            'check_in': to_iso_utc(self.check_in),
-            'check_out': to_iso_utc(self.check_out),
+            'employee_name': employee.name if employee else None,
+            'check_in': iso_utc(self.check_in),
+            'check_out': iso_utc(self.check_out),
             'location': self.location,
             'location_display': 'Oficina' if self.location == 'office' else 'Casa (Teletrabajo)',
             'notes': self.notes,
-            'duration_minutes': self.get_duration_minutes(),
-            'duration_formatted': self.get_duration_formatted(),
-            'is_active': self.is_active(),
-            'created_at': to_iso_utc(self.created_at),
-            'updated_at': to_iso_utc(self.updated_at)
+            'duration_minutes': minutes,
+            'duration_formatted': format_minutes(minutes),
+            'is_active': self.check_out is None,
+            'created_at': iso_utc(self.created_at),
+            'updated_at': iso_utc(self.updated_at)
         }
 
 
@@ -113,15 +123,18 @@ class Employee(db.Model):
     def __repr__(self):
         return f'<Employee {self.name}>'
     
-    def set_password(self, password):
-        """Establece la contraseña hasheada"""
-        self.password_hash = generate_password_hash(password)
+    def set_password(self, password, offload=False):
+        """Establece la contraseña hasheada (política de `PASSWORD_HASH_METHOD`)"""
+        self.password_hash = hash_password(password, offload=offload)
+        if self.id is not None:
+            from app.principal import invalidate_principal
+            invalidate_principal(self.id)
     
     def check_password(self, password):
         """Verifica la contraseña"""
         if not self.password_hash:
             return False
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
     
     def is_admin(self):
         """Verifica si el usuario es administrador"""
@@ -141,13 +154,6 @@ class Employee(db.Model):
     
     def to_dict(self, include_sensitive=False):
         """Convierte el objeto a diccionario"""
-        def to_iso_utc(dt):
-            if dt is None:
-                return None
-            if dt.tzinfo is None:
-                return dt.isoformat() + 'Z'
-            return dt.isoformat()
-        
         data = {
             'id': self.id,
             'name': self.name,
@@ -155,12 +161,12 @@ class Employee(db.Model):
             'position': self.position,
             'is_active': self.is_active,
             'role': self.role,
-            'created_at': to_iso_utc(self.created_at)
+            'created_at': iso_utc(self.created_at)
         }
         
         if include_sensitive:
             data['birth_date'] = self.birth_date.isoformat() if self.birth_date else None
-            data['last_login'] = to_iso_utc(self.last_login)
+            data['last_login'] = iso_utc(self.last_login)
             data['has_password'] = bool(self.password_hash)
         
         return data
@@ -192,13 +198,6 @@ class Task(db.Model):
     
     def to_dict(self, include_employees=False):
         """Convierte el objeto a diccionario"""
-        def to_iso_utc(dt):
-            if dt is None:
-                return None
-            if dt.tzinfo is None:
-                return dt.isoformat() + 'Z'
-            return dt.isoformat()
-        
         data = {
             'id': self.id,
             'name': self.name,
@@ -207,7 +206,7 @@ class Task(db.Model):
             'category': self.category,
             'is_active': self.is_active,
             'assigned_to_all': self.assigned_to_all,
-            'created_at': to_iso_utc(self.created_at)
+            'created_at': iso_utc(self.created_at)
         }
         
         if include_employees:
@@ -247,6 +246,11 @@ class TaskAssignment(db.Model):
     __table_args__ = (
         db.Index('idx_employee_status', 'employee_id', 'status'),
         db.Index('idx_task_dates', 'task_id', 'start_time'),
+        # Como máximo una asignación activa (tarea o descanso) por empleado
+        # (con la tabla particionada en PostgreSQL lo garantiza un trigger)
+        db.Index('uq_assignment_active_per_employee', 'employee_id', unique=True,
+                 postgresql_where=db.text("status IN ('en_progreso', 'descanso')"),
+                 sqlite_where=db.text("status IN ('en_progreso', 'descanso')")),
     )
     
     def __repr__(self):
@@ -254,33 +258,26 @@ class TaskAssignment(db.Model):
     
     def to_dict(self):
         """Convierte el objeto a diccionario"""
-        # Función auxiliar para convertir datetime a ISO con 'Z' (UTC)
-        def to_iso_utc(dt):
-            if dt is None:
-                return None
-            # Si no tiene timezone, asumimos que es UTC
-            if dt.tzinfo is None:
-                return dt.isoformat() + 'Z'
-            return dt.isoformat()
-        
         # Determinar si es un descanso
         is_break = self.status == 'descanso' or self.task_id is None
+        employee = self.employee
+        task = None if is_break else self.task
         
         return {
             'id': self.id,
             'employee_id': self.employee_id,
-            'employee_name': self.employee.name if self.employee else None,
+            'employee_name': employee.name if employee else None,
             'task_id': self.task_id,
-            'task_name': '☕ Descanso' if is_break else (self.task.name if self.task else None),
+            'task_name': '☕ Descanso' if is_break else (task.name if task else None),
             'is_break': is_break,
-            'start_time': to_iso_utc(self.start_time),
-            'end_time': to_iso_utc(self.end_time),
-            'pause_time': to_iso_utc(self.pause_time),
+            'start_time': iso_utc(self.start_time),
+            'end_time': iso_utc(self.end_time),
+            'pause_time': iso_utc(self.pause_time),
             'total_paused_duration': self.total_paused_duration or 0,
             'status': self.status,
             'notes': self.notes,
-            'created_at': to_iso_utc(self.created_at),
-            'updated_at': to_iso_utc(self.updated_at)
+            'created_at': iso_utc(self.created_at),
+            'updated_at': iso_utc(self.updated_at)
         }
     
     def get_duration_minutes(self):
@@ -302,4 +299,79 @@ class TaskAssignment(db.Model):
             duration = datetime.utcnow() - self.start_time
         
         total_minutes = int(duration.total_seconds() / 60)
-        return total_minutes - (self.total_paused_duration or 0)
\ No newline at end of file
+        return total_minutes - (self.total_paused_duration or 0)
+
+class ChangeVersion(db.Model):
+    """Versión de cambios por tabla (se incrementa en cada commit que la modifica)"""
+    __tablename__ = 'change_versions'
+    
+    entity = db.Column(db.String(50), primary_key=True)  # Nombre de la tabla
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ChangeVersion {self.entity}={self.version}>'
+
+
+class DailyStats(db.Model):
+    """Resumen diario de asignaciones cerradas (mantenido incrementalmente)"""
+    __tablename__ = 'daily_stats'
+    
+    date = db.Column(db.Date, primary_key=True)  # Día de inicio de la asignación
+    closed_assignments = db.Column(db.Integer, nullable=False, default=0)  # Detenidas o completadas
+    completed_tasks = db.Column(db.Integer, nullable=False, default=0)
+    total_minutes = db.Column(db.Integer, nullable=False, default=0)  # Minutos netos (sin pausas)
+    break_count = db.Column(db.Integer, nullable=False, default=0)
+    break_minutes = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DailyStats {self.date}>'
+    
+    def to_dict(self):
+        """Convierte el objeto a diccionario"""
+        return {
+            'date': self.date.isoformat(),
+            'closed_assignments': self.closed_assignments,
+            'completed_tasks': self.completed_tasks,
+            'total_minutes': self.total_minutes,
+            'avg_duration_minutes': (self.total_minutes / self.closed_assignments
+                                     if self.closed_assignments else None),
+            'break_count': self.break_count,
+            'break_minutes': self.break_minutes
+        }
+
+
+class EmployeeDailyStats(db.Model):
+    """Resumen diario por empleado de asignaciones cerradas (mantenido incrementalmente)"""
+    __tablename__ = 'employee_daily_stats'
+    
+    employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    closed_assignments = db.Column(db.Integer, nullable=False, default=0)
+    completed_tasks = db.Column(db.Integer, nullable=False, default=0)
+    total_minutes = db.Column(db.Integer, nullable=False, default=0)
+    break_count = db.Column(db.Integer, nullable=False, default=0)
+    break_minutes = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_employee_daily_stats_date', 'date'),
+    )
+    
+    def __repr__(self):
+        return f'<EmployeeDailyStats {self.employee_id} - {self.date}>'
+    
+    def to_dict(self):
+        """Convierte el objeto a diccionario"""
+        return {
+            'employee_id': self.employee_id,
+            'date': self.date.isoformat(),
+            'closed_assignments': self.closed_assignments,
+            'completed_tasks': self.completed_tasks,
+            'total_minutes': self.total_minutes,
+            'avg_duration_minutes': (self.total_minutes / self.closed_assignments
+                                     if self.closed_assignments else None),
+            'break_count': self.break_count,
+            'break_minutes': self.break_minutes
+        }
@@ -0,0 +1,39 @@
+import base64
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(sort_value, row_id):
+    """Codifica la posición (valor de orden, id) como cursor opaco"""
+    raw = f'{sort_value.isoformat()}|{row_id}'
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decodifica un cursor generado por encode_cursor.
+
+    Lanza ValueError si el cursor no es válido.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+        sort_value, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError('Cursor inválido') from e
+
+
+def apply_keyset(query, sort_column, id_column, position):
+    """Filtra la consulta para continuar después de `position` en orden descendente"""
+    sort_value, row_id = position
+    return query.filter(or_(
+        sort_column < sort_value,
+        and_(sort_column == sort_value, id_column < row_id)
+    ))
+
+
+def get_page_size(limit, default, maximum):
+    """Normaliza el parámetro `limit` dentro de [1, maximum]"""
+    if not limit or limit < 1:
+        return default
+    return min(limit, maximum)
@@ -0,0 +1,66 @@
+"""
+Mantenimiento de las particiones mensuales de task_assignments y attendance.
+
+Solo aplica a PostgreSQL después de la migración e6a1c4b83f90, que crea la
+función `create_monthly_partitions`. Las particiones de los próximos meses se
+crean por adelantado (`ensure_partitions`) con `flask ensure-partitions`, desde
+cron: no se hace desde las peticiones, porque ejecuta DDL y mueve filas fuera de
+la partición por defecto. La partición `<tabla>_default` recoge cualquier fila
+fuera de rango mientras tanto.
+"""
+from datetime import date
+from flask import current_app
+from sqlalchemy import text
+from app import db
+
+# tabla -> columna de partición
+PARTITIONED_TABLES = {
+    'task_assignments': 'start_time',
+    'attendance': 'check_in',
+}
+
+# Clave del bloqueo consultivo que serializa ejecuciones simultáneas (varios hosts en cron)
+PARTITION_LOCK_KEY = 7340001
+
+
+def _add_months(day, months):
+    month_index = day.month - 1 + months
+    return date(day.year + month_index // 12, month_index % 12 + 1, 1)
+
+
+def partitioned_tables(connection):
+    """Tablas de PARTITIONED_TABLES que están particionadas en esta BD"""
+    if connection.dialect.name != 'postgresql':
+        return []
+    rows = connection.execute(text("""
+        SELECT c.relname FROM pg_partitioned_table p
+        JOIN pg_class c ON c.oid = p.partrelid
+        WHERE c.relname = ANY(:tables)
+    """), {'tables': list(PARTITIONED_TABLES)}).scalars().all()
+    return [table for table in PARTITIONED_TABLES if table in rows]
+
+
+def ensure_partitions(months_ahead=None):
+    """Crea las particiones que falten hasta `months_ahead` meses vista.
+    
+    Devuelve {tabla: particiones creadas}.
+    """
+    if months_ahead is None:
+        months_ahead = current_app.config['PARTITION_MONTHS_AHEAD']
+    today = date.today()
+    until = _add_months(today, months_ahead)
+    
+    created = {}
+    with db.engine.begin() as connection:
+        tables = partitioned_tables(connection)
+        if tables:
+            # Se libera con la transacción; la segunda ejecución ya no crea nada
+            connection.execute(text('SELECT pg_advisory_xact_lock(:key)'),
+                               {'key': PARTITION_LOCK_KEY})
+        for table in tables:
+            created[table] = connection.execute(
+                text('SELECT create_monthly_partitions(:parent, :column, :from_date, :to_date)'),
+                {'parent': table, 'column': PARTITIONED_TABLES[table],
+                 'from_date': today, 'to_date': until}
+            ).scalar()
+    return created
@@ -0,0 +1,121 @@
+"""
+Política de hash de contraseñas y verificación fuera de los workers web.
+
+El método y la longitud de sal salen de la configuración
+(`PASSWORD_HASH_METHOD`, `PASSWORD_SALT_LENGTH`). Un hash creado con otros
+parámetros sigue siendo válido, pero `needs_rehash` lo detecta para volver a
+calcularlo en el siguiente login.
+
+scrypt/pbkdf2 son deliberadamente costosos en CPU. `verify_password` los
+ejecuta en un pool de procesos de tamaño fijo (`PASSWORD_VERIFY_WORKERS`), así
+que un pico de logins usa como mucho esos procesos de CPU y el resto de
+peticiones siguen respondiendo. Lo que no evita es que el worker (o hilo) que
+atiende el login espere al resultado: con workers síncronos un pico de logins
+puede seguir ocupándolos todos. Para acotar esa espera cada proceso admite
+como mucho `PASSWORD_VERIFY_MAX_PENDING` verificaciones en curso; el resto
+espera hasta `PASSWORD_VERIFY_QUEUE_TIMEOUT` segundos y después recibe
+`PasswordVerifierBusy` (un 503 para reintentar).
+
+Quien verifica debe terminar antes la transacción de la sesión de BD (ver el
+login en app/routes/auth.py) para no retener una conexión del pool mientras espera.
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordVerifierBusy(Exception):
+    """Hay demasiadas verificaciones de contraseña en curso"""
+
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+_slots = None
+
+
+def hash_password(password, offload=False):
+    """Hash de la contraseña con la política configurada.
+    
+    Con `offload=True` se calcula en el pool de procesos (puede lanzar
+    `PasswordVerifierBusy`).
+    """
+    args = (password, current_app.config['PASSWORD_HASH_METHOD'],
+            current_app.config['PASSWORD_SALT_LENGTH'])
+    if offload:
+        return _run(generate_password_hash, *args)
+    return generate_password_hash(*args)
+
+
+@lru_cache(maxsize=None)
+def _method_prefix(method):
+    # Werkzeug guarda el método con sus parámetros ('scrypt' -> 'scrypt:32768:8:1')
+    return generate_password_hash('', method=method, salt_length=1).split('$', 1)[0]
+
+
+def needs_rehash(password_hash):
+    """Indica si el hash se creó con un método o sal distintos a los configurados"""
+    if not password_hash or password_hash.count('$') < 2:
+        return False
+    method, salt, _ = password_hash.split('$', 2)
+    return (method != _method_prefix(current_app.config['PASSWORD_HASH_METHOD'])
+            or len(salt) != current_app.config['PASSWORD_SALT_LENGTH'])
+
+
+def _get_pool():
+    """Pool de procesos de este worker (se crea de nuevo tras un fork)"""
+    global _pool, _pool_pid, _slots
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            workers = current_app.config['PASSWORD_VERIFY_WORKERS']
+            # spawn: los procesos hijos no heredan conexiones ni hilos del worker web
+            _pool = ProcessPoolExecutor(max_workers=workers,
+                                        mp_context=multiprocessing.get_context('spawn'))
+            _pool_pid = os.getpid()
+            _slots = threading.BoundedSemaphore(current_app.config['PASSWORD_VERIFY_MAX_PENDING'])
+        return _pool, _slots
+
+
+def _discard_pool(pool):
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(fn, *args):
+    """Ejecuta `fn(*args)` en el pool respetando el límite de operaciones en curso"""
+    if not current_app.config['PASSWORD_VERIFY_WORKERS']:
+        return fn(*args)
+    
+    pool, slots = _get_pool()
+    if not slots.acquire(timeout=current_app.config['PASSWORD_VERIFY_QUEUE_TIMEOUT']):
+        raise PasswordVerifierBusy()
+    try:
+        return pool.submit(fn, *args).result()
+    except BrokenProcessPool:
+        # Un proceso hijo murió: se descarta el pool y se ejecuta en línea
+        _discard_pool(pool)
+        return fn(*args)
+    finally:
+        slots.release()
+
+
+def verify_password(password_hash, password):
+    """Comprueba la contraseña en el pool de procesos (en línea si está desactivado)"""
+    if not password_hash:
+        return False
+    return _run(check_password_hash, password_hash, password)
+
+
+@atexit.register
+def _shutdown_pool():
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,82 @@
+"""
+Caché del usuario autenticado (principal) para Flask-Login.
+
+`load_user` se ejecuta en cada petición autenticada, incluidas las de
+sondeo. En lugar de cargar el `Employee` completo, se guarda una instantánea
+inmutable con los campos que usan las vistas y las plantillas (id, nombre,
+email, rol y estado) en una caché LRU con TTL. Las rutas que modifican esos
+campos o la contraseña la invalidan con `invalidate_principal`; en otros
+workers la entrada caduca por TTL (`PRINCIPAL_CACHE_TTL`).
+"""
+from typing import NamedTuple
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from app.cache import TaggedTTLCache, MISSING
+from app.models import Employee
+
+_principals = TaggedTTLCache()
+
+
+class Principal(NamedTuple):
+    """Instantánea de solo lectura de un empleado autenticado"""
+    id: int
+    name: str
+    email: str
+    role: str
+    is_active: bool
+    
+    # Interfaz de Flask-Login
+    is_authenticated = True
+    is_anonymous = False
+    
+    def get_id(self):
+        return str(self.id)
+    
+    def is_admin(self):
+        """Verifica si el usuario es administrador"""
+        return self.role == 'admin'
+    
+    @classmethod
+    def from_employee(cls, employee):
+        return cls(employee.id, employee.name, employee.email, employee.role,
+                   bool(employee.is_active))
+
+
+def principal_statement(employee_id):
+    """Consulta ligera con las columnas del principal"""
+    return select(Employee.id, Employee.name, Employee.email, Employee.role,
+                  Employee.is_active).where(Employee.id == employee_id)
+
+
+def cached_principal(employee_id):
+    """Principal guardado en la caché o MISSING"""
+    return _principals.get(employee_id)
+
+
+def remember_principal(row):
+    """Crea el principal a partir de una fila de `principal_statement` y lo guarda"""
+    if row is None:
+        return None
+    principal = Principal(row.id, row.name, row.email, row.role, bool(row.is_active))
+    _principals.set(row.id, principal, current_app.config['PRINCIPAL_CACHE_TTL'])
+    return principal
+
+
+def load_principal(employee_id):
+    """Principal del empleado (de la caché o con una consulta ligera), o None"""
+    principal = cached_principal(employee_id)
+    if principal is not MISSING:
+        return principal
+    return remember_principal(db.session.execute(principal_statement(employee_id)).first())
+
+
+def invalidate_principal(employee_id):
+    """Descarta el principal de un empleado en este proceso"""
+    _principals.delete(employee_id)
+
+
+def init_principal_cache(app):
+    """Crea la caché con el tamaño configurado"""
+    global _principals
+    _principals = TaggedTTLCache(maxsize=app.config['PRINCIPAL_CACHE_SIZE'])
@@ -0,0 +1,256 @@
+"""
+Motor de informes de reparto de tiempo sobre task_assignments.
+
+Carga los intervalos de las asignaciones en bloque en arrays de NumPy
+(`load_intervals`) y calcula sumas, medias y percentiles por grupo con
+operaciones vectorizadas (`aggregate`). La agregación no depende de la BD,
+por lo que puede medirse aparte (ver scripts/benchmark_report_engine.py).
+"""
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from sqlalchemy import select, func, cast, case, Integer, BigInteger
+from app import db
+from app.archive import reaches_archive, iter_archived
+from app.models import TaskAssignment, Task
+
+# Dimensiones por las que se puede agrupar
+GROUP_DIMENSIONS = ('employee', 'task', 'category', 'week', 'day')
+
+# Filas que se piden a la BD en cada lote al cargar
+LOAD_CHUNK_SIZE = 50000
+
+SECONDS_PER_DAY = 86400
+
+
+class AssignmentIntervals:
+    """Intervalos de asignaciones en arrays paralelos (una posición por asignación)"""
+    
+    def __init__(self, employee_id, task_id, category, start, minutes, categories=()):
+        self.employee_id = employee_id  # int32
+        self.task_id = task_id          # int32, -1 para descansos
+        self.category = category        # int32, índice en `categories` (-1 sin categoría)
+        self.start = start              # int64, segundos desde epoch (UTC)
+        self.minutes = minutes          # float64, minutos netos (sin pausas)
+        self.categories = list(categories)
+    
+    def __len__(self):
+        return len(self.minutes)
+
+
+def _epoch_expression(column, dialect_name):
+    """Segundos desde epoch de una columna DateTime en SQL"""
+    if dialect_name == 'postgresql':
+        return cast(func.extract('epoch', column), BigInteger)
+    # SQLite
+    return cast(func.strftime('%s', column), Integer)
+
+
+def load_intervals(date_from, date_to, employee_ids=None, categories=None,
+                   include_breaks=False, session=None):
+    """Carga las asignaciones que empiezan en [date_from, date_to] como arrays.
+    
+    Las asignaciones abiertas cuentan hasta ahora y las pausadas hasta su pausa,
+    igual que `TaskAssignment.get_elapsed_minutes`.
+    """
+    session = session or db.session
+    dialect_name = session.get_bind().dialect.name
+    
+    # Tabla de tareas (pequeña): id -> categoría
+    task_rows = session.execute(select(Task.id, Task.category)).all()
+    category_names = sorted({c for _, c in task_rows if c is not None})
+    
+    end = case(
+        (TaskAssignment.end_time.isnot(None), TaskAssignment.end_time),
+        (TaskAssignment.status == 'pausada', TaskAssignment.pause_time),
+        else_=None
+    )
+    stmt = select(
+        TaskAssignment.employee_id,
+        func.coalesce(TaskAssignment.task_id, -1),
+        _epoch_expression(TaskAssignment.start_time, dialect_name),
+        _epoch_expression(end, dialect_name),
+        func.coalesce(TaskAssignment.total_paused_duration, 0)
+    ).where(
+        TaskAssignment.start_time >= datetime.combine(date_from, datetime.min.time()),
+        TaskAssignment.start_time < datetime.combine(date_to + timedelta(days=1),
+                                                     datetime.min.time())
+    )
+    if employee_ids:
+        stmt = stmt.where(TaskAssignment.employee_id.in_(employee_ids))
+    if categories:
+        stmt = stmt.join(Task, Task.id == TaskAssignment.task_id).where(
+            Task.category.in_(categories))
+    elif not include_breaks:
+        stmt = stmt.where(TaskAssignment.task_id.isnot(None))
+    
+    # Se convierte cada lote a arrays y se concatenan al final
+    chunks = []
+    result = session.execute(stmt.execution_options(stream_results=True,
+                                                    yield_per=LOAD_CHUNK_SIZE))
+    for partition in result.partitions():
+        # Tuplas simples: con objetos Row NumPy busca en cada fila atributos del
+        # protocolo de arrays (__array__...) y la conversión es varias veces más lenta
+        chunk = np.array([tuple(row) for row in partition], dtype=np.float64).reshape(-1, 5)
+        chunks.append(chunk)
+    
+    # Si el rango llega más atrás del corte, se añaden las asignaciones archivadas
+    if reaches_archive('task_assignments', date_from):
+        archived = _archived_rows(date_from, date_to, employee_ids, categories,
+                                  include_breaks, task_rows)
+        if len(archived):
+            chunks.append(archived)
+    data = np.concatenate(chunks) if chunks else np.empty((0, 5))
+    
+    now = time.time()
+    ends = np.where(np.isnan(data[:, 3]), now, data[:, 3])
+    minutes = np.maximum(np.floor((ends - data[:, 2]) / 60) - data[:, 4], 0)
+    task_id = data[:, 1].astype(np.int32)
+    
+    # id -> índice de categoría, con tamaño para todos los id cargados: una tarea
+    # creada después de leer `tasks` queda sin categoría en lugar de salirse del array
+    max_task_id = max((row_id for row_id, _ in task_rows), default=0)
+    if len(task_id):
+        max_task_id = max(max_task_id, int(task_id.max()))
+    category_index = {name: i for i, name in enumerate(category_names)}
+    task_category = np.full(max_task_id + 1, -1, dtype=np.int32)
+    for row_id, category in task_rows:
+        task_category[row_id] = category_index.get(category, -1)
+    
+    return AssignmentIntervals(
+        employee_id=data[:, 0].astype(np.int32),
+        task_id=task_id,
+        category=np.where(task_id >= 0, task_category[task_id], -1).astype(np.int32),
+        start=data[:, 2].astype(np.int64),
+        minutes=minutes,
+        categories=category_names
+    )
+
+
+def _epoch(value):
+    """Segundos desde epoch de una fecha ISO archivada (UTC sin zona)"""
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+
+
+def _archived_rows(date_from, date_to, employee_ids, categories, include_breaks, task_rows):
+    """Filas del archivo frío con las mismas columnas que la consulta a la BD"""
+    task_categories = dict(task_rows)
+    employee_ids = set(employee_ids or ())
+    categories = set(categories or ())
+    rows = []
+    for record in iter_archived('task_assignments',
+                                datetime.combine(date_from, datetime.min.time()),
+                                datetime.combine(date_to, datetime.max.time())):
+        task_id = record.get('task_id')
+        if employee_ids and record['employee_id'] not in employee_ids:
+            continue
+        if categories and task_categories.get(task_id) not in categories:
+            continue
+        if task_id is None and (categories or not include_breaks):
+            continue
+        rows.append((
+            record['employee_id'],
+            -1 if task_id is None else task_id,
+            _epoch(record['start_time']),
+            _epoch(record['end_time']) if record.get('end_time') else np.nan,
+            record.get('total_paused_duration') or 0
+        ))
+    return np.array(rows, dtype=np.float64).reshape(-1, 5)
+
+
+def _dimension_values(intervals, dimension):
+    """Valor entero de cada asignación para una dimensión de agrupación"""
+    if dimension == 'employee':
+        return intervals.employee_id.astype(np.int64)
+    if dimension == 'task':
+        return intervals.task_id.astype(np.int64)
+    if dimension == 'category':
+        return intervals.category.astype(np.int64)
+    days = intervals.start // SECONDS_PER_DAY
+    if dimension == 'day':
+        return days
+    # Semana ISO: días hasta el lunes anterior (el 1970-01-01 fue jueves)
+    return days - (days + 3) % 7
+
+
+def _factorize(values, max_span_ratio=4):
+    """Devuelve (valores únicos ordenados, código de cada elemento).
+    
+    Si el rango de valores no supera `max_span_ratio` veces el número de elementos
+    usa una tabla densa (O(n), memoria proporcional a la entrada); si no, np.unique.
+    """
+    if len(values) == 0:
+        return values[:0], np.zeros(0, dtype=np.int64)
+    low, high = int(values.min()), int(values.max())
+    if high - low >= max_span_ratio * len(values):
+        uniques, codes = np.unique(values, return_inverse=True)
+        return uniques, codes.astype(np.int64)
+    offsets = values - low
+    present = np.bincount(offsets, minlength=high - low + 1) > 0
+    lookup = np.cumsum(present, dtype=np.int64) - 1
+    return np.flatnonzero(present) + low, lookup[offsets]
+
+
+def aggregate(intervals, group_by=('employee', 'task', 'week'), percentiles=(50, 90)):
+    """Agrupa los intervalos y calcula total, número, media y percentiles de minutos.
+    
+    Devuelve un diccionario de arrays: una columna por dimensión (`group_by`),
+    `count`, `total_minutes`, `mean_minutes` y `p<N>` por cada percentil.
+    """
+    for dimension in group_by:
+        if dimension not in GROUP_DIMENSIONS:
+            raise ValueError(f'Dimensión no válida: {dimension}')
+    
+    minutes = intervals.minutes
+    if not group_by:
+        inverse = np.zeros(len(minutes), dtype=np.int64)
+        keys = []
+    else:
+        # Clave mixta: se factoriza cada dimensión y se combinan en un solo int64
+        codes, uniques = [], []
+        for dimension in group_by:
+            values, code = _factorize(_dimension_values(intervals, dimension))
+            uniques.append(values)
+            codes.append(code)
+        combined = np.zeros(len(minutes), dtype=np.int64)
+        for code, values in zip(codes, uniques):
+            combined = combined * len(values) + code
+        group_keys, inverse = _factorize(combined)
+        
+        # Deshacer la clave mixta para obtener el valor de cada dimensión
+        keys = []
+        remainder = group_keys
+        for values in reversed(uniques):
+            keys.append(values[remainder % len(values)])
+            remainder = remainder // len(values)
+        keys.reverse()
+    
+    group_count = int(inverse.max()) + 1 if len(minutes) else 0
+    counts = np.bincount(inverse, minlength=group_count)
+    totals = np.bincount(inverse, weights=minutes, minlength=group_count)
+    
+    result = {dimension: values for dimension, values in zip(group_by, keys)}
+    result['count'] = counts
+    result['total_minutes'] = totals
+    result['mean_minutes'] = totals / np.maximum(counts, 1)
+    
+    if percentiles and group_count:
+        # Ordenar por (grupo, minutos) con una sola clave entera (los minutos son enteros)
+        whole_minutes = minutes.astype(np.int64)
+        scale = int(whole_minutes.max()) + 1
+        sorted_keys = np.sort(inverse * scale + whole_minutes)
+        sorted_minutes = sorted_keys % scale
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        for p in percentiles:
+            # Interpolación lineal, igual que np.percentile
+            position = (counts - 1) * (p / 100.0)
+            lower = np.floor(position).astype(np.int64)
+            upper = np.minimum(lower + 1, counts - 1)
+            fraction = position - lower
+            result[f'p{p:g}'] = (sorted_minutes[offsets + lower] * (1 - fraction)
+                                 + sorted_minutes[offsets + upper] * fraction)
+    elif percentiles:
+        for p in percentiles:
+            result[f'p{p:g}'] = np.empty(0)
+    
+    return result
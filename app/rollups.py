@@ -0,0 +1,229 @@
+"""
+Resúmenes diarios (daily_stats y employee_daily_stats).
+
+Alternativa a las vistas `daily_stats_view` y `employee_productivity_view`
+(que se conservan), que agrupan todo `task_assignments` en cada lectura. Cada asignación
+cerrada (detenida o completada) aporta a la fila de su día de inicio;
+un hook de la sesión calcula, en cada flush, la diferencia entre la
+aportación anterior y la nueva de cada asignación modificada y la aplica
+en la misma transacción. Así cualquier ruta de escritura (stop, complete,
+switch, delete...) mantiene los resúmenes sin código adicional.
+"""
+from collections import defaultdict
+from sqlalchemy import (event, inspect, select, insert, delete, update, func, case, cast, and_,
+                        text, Integer)
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models import TaskAssignment, DailyStats, EmployeeDailyStats, ACTIVE_ASSIGNMENT_STATUSES
+
+COUNTERS = ('closed_assignments', 'completed_tasks', 'total_minutes', 'break_count', 'break_minutes')
+
+# Atributos de la asignación que afectan a los resúmenes
+_TRACKED_ATTRS = ('employee_id', 'task_id', 'status', 'start_time', 'end_time', 'total_paused_duration')
+
+
+def contribution(values):
+    """Aportación de una asignación a los resúmenes: (empleado, día, contadores) o None"""
+    if values is None or values['end_time'] is None or values['start_time'] is None:
+        return None
+    if values['status'] in ACTIVE_ASSIGNMENT_STATUSES:
+        return None
+    
+    minutes = int((values['end_time'] - values['start_time']).total_seconds() / 60)
+    minutes -= values['total_paused_duration'] or 0
+    
+    if values['task_id'] is None:
+        counters = {'break_count': 1, 'break_minutes': minutes}
+    else:
+        counters = {
+            'closed_assignments': 1,
+            'completed_tasks': 1 if values['status'] == 'completada' else 0,
+            'total_minutes': minutes
+        }
+    return values['employee_id'], values['start_time'].date(), counters
+
+
+def _current_values(obj):
+    return {attr: getattr(obj, attr) for attr in _TRACKED_ATTRS}
+
+
+def _previous_values(obj):
+    state = inspect(obj)
+    values = {}
+    for attr in _TRACKED_ATTRS:
+        history = state.attrs[attr].load_history()
+        if history.deleted:
+            values[attr] = history.deleted[0]
+        elif history.unchanged:
+            values[attr] = history.unchanged[0]
+        else:
+            values[attr] = None
+    return values
+
+
+def _add(deltas, item, sign):
+    if item is None:
+        return
+    employee_id, day, counters = item
+    for name, value in counters.items():
+        deltas[(employee_id, day)][name] += sign * value
+
+
+def _before_flush(session, flush_context, instances):
+    deltas = session.info.setdefault('rollup_deltas', defaultdict(lambda: defaultdict(int)))
+    
+    for obj in session.new:
+        if isinstance(obj, TaskAssignment):
+            _add(deltas, contribution(_current_values(obj)), 1)
+    
+    for obj in session.dirty:
+        if isinstance(obj, TaskAssignment) and session.is_modified(obj):
+            _add(deltas, contribution(_previous_values(obj)), -1)
+            _add(deltas, contribution(_current_values(obj)), 1)
+    
+    for obj in session.deleted:
+        if isinstance(obj, TaskAssignment):
+            _add(deltas, contribution(_previous_values(obj)), -1)
+
+
+# INSERT ... ON CONFLICT DO UPDATE de cada dialecto
+_UPSERT_INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def _upsert(connection, table, keys, counters):
+    """Suma `counters` a la fila identificada por `keys` (creándola si no existe).
+    
+    En PostgreSQL y SQLite es una sola sentencia atómica: dos transacciones que
+    cierran a la vez la primera asignación de un día no chocan en la clave primaria.
+    """
+    row = {name: 0 for name in COUNTERS}
+    row.update(counters)
+    increments = {name: table.c[name] + value for name, value in counters.items()}
+    
+    dialect_insert = _UPSERT_INSERTS.get(connection.dialect.name)
+    if dialect_insert is not None:
+        connection.execute(
+            dialect_insert(table)
+            .values(**keys, **row, updated_at=func.now())
+            .on_conflict_do_update(index_elements=list(keys),
+                                   set_={**increments, 'updated_at': func.now()})
+        )
+        return
+    
+    conditions = [table.c[name] == value for name, value in keys.items()]
+    result = connection.execute(
+        update(table).where(and_(*conditions)).values(**increments, updated_at=func.now())
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(**keys, **row, updated_at=func.now()))
+
+
+def _after_flush(session, flush_context):
+    deltas = session.info.pop('rollup_deltas', None)
+    if not deltas:
+        return
+    
+    connection = session.connection()
+    daily = defaultdict(lambda: defaultdict(int))
+    
+    for (employee_id, day), counters in deltas.items():
+        counters = {name: value for name, value in counters.items() if value}
+        if not counters:
+            continue
+        _upsert(connection, EmployeeDailyStats.__table__,
+                {'employee_id': employee_id, 'date': day}, counters)
+        for name, value in counters.items():
+            daily[day][name] += value
+    
+    for day, counters in daily.items():
+        _upsert(connection, DailyStats.__table__, {'date': day}, dict(counters))
+
+
+def _after_rollback(session):
+    session.info.pop('rollup_deltas', None)
+
+
+def _keep_previous_value(target, value, oldvalue, initiator):
+    pass
+
+
+def init_rollups():
+    """Registra el mantenimiento incremental de los resúmenes en la sesión"""
+    # Con active_history SQLAlchemy carga el valor anterior aunque el atributo
+    # estuviera expirado, para poder restar la aportación previa
+    for attr in _TRACKED_ATTRS:
+        column = getattr(TaskAssignment, attr)
+        if not event.contains(column, 'set', _keep_previous_value):
+            event.listen(column, 'set', _keep_previous_value, active_history=True)
+    
+    for name, listener in (('before_flush', _before_flush),
+                           ('after_flush', _after_flush),
+                           ('after_rollback', _after_rollback)):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
+
+
+def minutes_expression(dialect_name):
+    """Minutos enteros entre start_time y end_time en SQL"""
+    start, end = TaskAssignment.start_time, TaskAssignment.end_time
+    if dialect_name == 'postgresql':
+        return func.floor(func.extract('epoch', end - start) / 60)
+    # SQLite
+    return (cast(func.strftime('%s', end), Integer) - cast(func.strftime('%s', start), Integer)) // 60
+
+
+def backfill_rollups():
+    """Reconstruye por completo ambos resúmenes a partir de task_assignments.
+    
+    Devuelve el número de filas (días, empleado-días) generadas.
+    """
+    connection = db.session.connection()
+    is_break = TaskAssignment.task_id.is_(None)
+    net_minutes = (minutes_expression(connection.dialect.name)
+                   - func.coalesce(TaskAssignment.total_paused_duration, 0))
+    day = func.date(TaskAssignment.start_time)
+    
+    aggregates = [
+        func.sum(case((is_break, 0), else_=1)),
+        func.sum(case((and_(~is_break, TaskAssignment.status == 'completada'), 1), else_=0)),
+        func.sum(case((is_break, 0), else_=net_minutes)),
+        func.sum(case((is_break, 1), else_=0)),
+        func.sum(case((is_break, net_minutes), else_=0)),
+    ]
+    closed = and_(
+        TaskAssignment.end_time.isnot(None),
+        TaskAssignment.status.notin_(ACTIVE_ASSIGNMENT_STATUSES)
+    )
+    
+    daily_table = DailyStats.__table__
+    employee_table = EmployeeDailyStats.__table__
+    
+    # Bloquear las escrituras en los resúmenes hasta el commit, ANTES de leer
+    # task_assignments: el upsert de una transacción concurrente (after_flush)
+    # espera y suma su diferencia sobre lo reconstruido, en lugar de perderse o
+    # chocar con las filas insertadas aquí. En SQLite el DELETE ya toma el
+    # bloqueo de escritura de toda la BD
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(
+            f'LOCK TABLE {employee_table.name}, {daily_table.name} IN EXCLUSIVE MODE'))
+    
+    connection.execute(delete(employee_table))
+    connection.execute(delete(daily_table))
+    
+    connection.execute(insert(employee_table).from_select(
+        ['employee_id', 'date', *COUNTERS],
+        select(TaskAssignment.employee_id, day, *aggregates)
+        .where(closed)
+        .group_by(TaskAssignment.employee_id, day)
+    ))
+    connection.execute(insert(daily_table).from_select(
+        ['date', *COUNTERS],
+        select(employee_table.c.date, *[func.sum(employee_table.c[name]) for name in COUNTERS])
+        .group_by(employee_table.c.date)
+    ))
+    db.session.commit()
+    
+    return (
+        db.session.query(func.count()).select_from(daily_table).scalar(),
+        db.session.query(func.count()).select_from(employee_table).scalar()
+    )
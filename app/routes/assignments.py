@@ -1,12 +1,27 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_login import login_required, current_user
 from app import db
-from app.models import TaskAssignment, Employee, Task
-from datetime import datetime
+from app.models import TaskAssignment, Employee, Task, Attendance, ACTIVE_ASSIGNMENT_STATUSES
+from app.pagination import encode_cursor, decode_cursor, apply_keyset, get_page_size
+from app.streaming import STREAM_FORMATS, iter_query, stream_response
+from app.archive import reaches_archive, iter_archived, archived_dict
+from app.exports import (EXPORT_FORMATS, ASSIGNMENT_EXPORT_FIELDS, assignment_export_row,
+                         export_response, xlsx_available)
+from app.serializers import with_assignment_relations, serialize_assignments, serialize_attendances
+from app.event_bus import publish
+from app.live_state import live_state
+from app.snapshot import read_snapshot
+from app.decorators import view_etag
+from datetime import datetime, date
 from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
 
 bp = Blueprint('assignments', __name__, url_prefix='/assignments')
 
+# Secciones disponibles en /api/board
+BOARD_SECTIONS = ('employees', 'tasks', 'current', 'in_progress', 'breaks',
+                  'completed_today', 'attendance_today')
+
 
 @bp.route('/')
 @login_required
@@ -15,16 +30,16 @@ def index():
     return render_template('assignments/index.html')
 
 
-@bp.route('/api')
-@login_required
-def get_assignments():
-    """API para obtener asignaciones con filtros opcionales"""
-    employee_id = request.args.get('employee_id', type=int)
-    task_id = request.args.get('task_id', type=int)
-    status = request.args.get('status')
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    
+def _parse_datetime(value):
+    """Fecha ISO de la query string o None si falta o no es válida"""
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def _filtered_assignments(employee_id, task_id, status, start_date, end_date):
+    """Consulta de asignaciones con los filtros de la query string"""
     query = TaskAssignment.query
     
     # Aplicar filtros
@@ -51,13 +66,118 @@ def get_assignments():
         except ValueError:
             pass
     
-    assignments = query.order_by(TaskAssignment.start_time.desc()).all()
+    return query
+
+
+@bp.route('/api')
+@login_required
+def get_assignments():
+    """API para obtener asignaciones con filtros opcionales"""
+    employee_id = request.args.get('employee_id', type=int)
+    task_id = request.args.get('task_id', type=int)
+    status = request.args.get('status')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    
+    # Las asignaciones activas se sirven desde el registro en memoria
+    is_plain_listing = not any(request.args.get(name) for name in
+                               ('start_date', 'end_date', 'limit', 'cursor', 'stream'))
+    if status in ACTIVE_ASSIGNMENT_STATUSES and is_plain_listing:
+        assignments = [
+            a for a in live_state.active_assignments((status,))
+            if (not employee_id or a['employee_id'] == employee_id)
+            and (not task_id or a['task_id'] == task_id)
+        ]
+        return jsonify({'assignments': assignments})
+    
+    query = _filtered_assignments(employee_id, task_id, status, start_date, end_date)
+    
+    # Paginación por cursor sobre (start_time, id)
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    stream_format = request.args.get('stream')
+    
+    if cursor:
+        try:
+            query = apply_keyset(query, TaskAssignment.start_time, TaskAssignment.id,
+                                 decode_cursor(cursor))
+        except ValueError:
+            return jsonify({'error': 'Cursor inválido'}), 400
+    
+    query = query.order_by(TaskAssignment.start_time.desc(), TaskAssignment.id.desc())
+    
+    # Modo streaming: se serializa fila a fila desde un cursor del servidor
+    if stream_format:
+        if stream_format not in STREAM_FORMATS:
+            return jsonify({'error': 'Formato de streaming inválido. Use json o ndjson'}), 400
+        if limit:
+            query = query.limit(limit)
+        return stream_response(iter_query(with_assignment_relations(query)), 'assignments',
+                               lambda assignment: assignment.to_dict(), stream_format)
+    
+    # Sin limit ni cursor se mantiene la respuesta completa (compatibilidad)
+    if not limit and not cursor:
+        return jsonify({
+            'assignments': serialize_assignments(query)
+        })
+    
+    page_size = get_page_size(limit, current_app.config['ITEMS_PER_PAGE'],
+                              current_app.config['MAX_ITEMS_PER_PAGE'])
+    assignments = with_assignment_relations(query).limit(page_size + 1).all()
+    has_more = len(assignments) > page_size
+    assignments = assignments[:page_size]
+    
+    next_cursor = None
+    if has_more:
+        last = assignments[-1]
+        next_cursor = encode_cursor(last.start_time, last.id)
     
     return jsonify({
-        'assignments': [assignment.to_dict() for assignment in assignments]
+        'assignments': [assignment.to_dict() for assignment in assignments],
+        'limit': page_size,
+        'next_cursor': next_cursor
     })
 
 
+@bp.route('/api/export')
+@login_required
+def export_assignments():
+    """Exportar asignaciones filtradas a CSV o XLSX"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'Formato inválido. Use csv o xlsx'}), 400
+    if fmt == 'xlsx' and not xlsx_available():
+        return jsonify({'error': 'Exportación XLSX no disponible (instala XlsxWriter)'}), 501
+    
+    employee_id = request.args.get('employee_id', type=int)
+    
+    # Si no es admin, solo puede exportar las suyas
+    if not current_user.is_admin():
+        employee_id = current_user.id
+    
+    task_id = request.args.get('task_id', type=int)
+    status = request.args.get('status')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    
+    query = _filtered_assignments(employee_id, task_id, status, start_date, end_date)
+    query = query.order_by(TaskAssignment.start_time, TaskAssignment.id)
+    
+    # Si el rango llega más atrás del corte, se leen también las asignaciones archivadas
+    archived = ()
+    date_from, date_to = _parse_datetime(start_date), _parse_datetime(end_date)
+    if reaches_archive('task_assignments', date_from):
+        archived = (
+            archived_dict('task_assignments', record, assignment_export_row)
+            for record in iter_archived('task_assignments', date_from, date_to,
+                                        employee_id=employee_id, task_id=task_id)
+            if not status or record['status'] == status
+        )
+    
+    return export_response(with_assignment_relations(query), ASSIGNMENT_EXPORT_FIELDS,
+                           assignment_export_row, fmt, 'asignaciones', archived)
+
+
 @bp.route('/api/<int:assignment_id>')
 @login_required
 def get_assignment(assignment_id):
@@ -87,65 +207,85 @@ def create_assignment():
     if not employee or not employee.is_active:
         return jsonify({'error': 'Empleado no encontrado o inactivo'}), 404
     
-    # Verificar si el empleado ya tiene una tarea en progreso o descanso
-    active_assignment = TaskAssignment.query.filter_by(
-        employee_id=data['employee_id'],
-        status='en_progreso'
-    ).first()
+    # Crear asignación. No se comprueba antes si ya tiene una tarea o descanso
+    # activo ni se bloquea la fila del empleado (FOR UPDATE, como en switch): lo
+    # garantiza el índice único uq_assignment_active_per_employee. Si una creación
+    # y un cambio compiten, la segunda en confirmar falla con IntegrityError
+    assignment, message = _build_assignment(data['employee_id'], data)
+    if assignment is None:
+        return jsonify({'error': message}), 404
     
-    active_break = TaskAssignment.query.filter_by(
-        employee_id=data['employee_id'],
-        status='descanso'
+    try:
+        db.session.add(assignment)
+        db.session.commit()
+        assignment_data = assignment.to_dict()
+        live_state.assignment_changed(assignment_data)
+        publish('assignment_created', {'assignment': assignment_data})
+        return jsonify({
+            'message': message,
+            'assignment': assignment_data
+        }), 201
+    except IntegrityError as e:
+        db.session.rollback()
+        conflict = _active_conflict_response(data['employee_id'])
+        if conflict:
+            return conflict
+        return jsonify({'error': str(e)}), 500
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+def _active_conflict_response(employee_id):
+    """Respuesta de error con la asignación activa que impide iniciar otra"""
+    active = TaskAssignment.query.filter(
+        TaskAssignment.employee_id == employee_id,
+        TaskAssignment.status.in_(ACTIVE_ASSIGNMENT_STATUSES)
     ).first()
     
-    if active_assignment:
-        return jsonify({
-            'error': 'El empleado ya tiene una tarea en progreso',
-            'active_assignment': active_assignment.to_dict()
-        }), 400
+    if active is None:
+        return None
     
-    if active_break:
-        return jsonify({
-            'error': 'El empleado ya está en descanso',
-            'active_assignment': active_break.to_dict()
-        }), 400
+    if active.status == 'descanso':
+        error = 'El empleado ya está en descanso'
+    else:
+        error = 'El empleado ya tiene una tarea en progreso'
     
-    # Crear asignación
-    if is_break:
+    return jsonify({
+        'error': error,
+        'active_assignment': active.to_dict()
+    }), 400
+
+
+def _build_assignment(employee_id, data):
+    """Crea (sin guardar) la asignación de tarea o descanso pedida en `data`.
+    
+    Devuelve (asignación, mensaje) o (None, error) si la tarea no es válida.
+    """
+    if data.get('is_break', False):
         # Crear registro de descanso (sin task_id)
         assignment = TaskAssignment(
-            employee_id=data['employee_id'],
+            employee_id=employee_id,
             task_id=None,
             start_time=datetime.utcnow(),
             status='descanso',
             notes=data.get('notes', '☕ Descanso')
         )
-        message = '☕ Descanso iniciado'
-    else:
-        # Verificar que la tarea existe y está activa
-        task = Task.query.get(data['task_id'])
-        if not task or not task.is_active:
-            return jsonify({'error': 'Tarea no encontrada o inactiva'}), 404
-        
-        assignment = TaskAssignment(
-            employee_id=data['employee_id'],
-            task_id=data['task_id'],
-            start_time=datetime.utcnow(),
-            status='en_progreso',
-            notes=data.get('notes', '')
-        )
-        message = f'Tarea iniciada: {task.name}'
+        return assignment, '☕ Descanso iniciado'
     
-    try:
-        db.session.add(assignment)
-        db.session.commit()
-        return jsonify({
-            'message': message,
-            'assignment': assignment.to_dict()
-        }), 201
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    # Verificar que la tarea existe y está activa
+    task = Task.query.get(data['task_id'])
+    if not task or not task.is_active:
+        return None, 'Tarea no encontrada o inactiva'
+    
+    assignment = TaskAssignment(
+        employee_id=employee_id,
+        task_id=data['task_id'],
+        start_time=datetime.utcnow(),
+        status='en_progreso',
+        notes=data.get('notes', '')
+    )
+    return assignment, f'Tarea iniciada: {task.name}'
 
 
 @bp.route('/api/<int:assignment_id>/complete', methods=['PUT'])
@@ -175,9 +315,12 @@ def complete_assignment(assignment_id):
     
     try:
         db.session.commit()
+        assignment_data = assignment.to_dict()
+        live_state.assignment_changed(assignment_data)
+        publish('assignment_completed', {'assignment': assignment_data})
         return jsonify({
             'message': '¡Tarea completada exitosamente!',
-            'assignment': assignment.to_dict(),
+            'assignment': assignment_data,
             'duration_minutes': assignment.get_duration_minutes()
         })
     except Exception as e:
@@ -206,9 +349,12 @@ def stop_assignment(assignment_id):
     
     try:
         db.session.commit()
+        assignment_data = assignment.to_dict()
+        live_state.assignment_changed(assignment_data)
+        publish('assignment_stopped', {'assignment': assignment_data})
         return jsonify({
             'message': 'Tarea/descanso detenido. Puedes iniciar otra tarea.',
-            'assignment': assignment.to_dict()
+            'assignment': assignment_data
         })
     except Exception as e:
         db.session.rollback()
@@ -216,6 +362,97 @@ def stop_assignment(assignment_id):
 
 
 
+@bp.route('/api/switch', methods=['POST'])
+@login_required
+def switch_assignment():
+    """API para cerrar la asignación activa y abrir la siguiente en una sola transacción"""
+    data = request.get_json() or {}
+    
+    # Validaciones
+    employee_id = data.get('employee_id')
+    if not employee_id:
+        return jsonify({'error': 'El ID del empleado es obligatorio'}), 400
+    
+    if not data.get('is_break', False) and not data.get('task_id'):
+        return jsonify({'error': 'El ID de la tarea es obligatorio'}), 400
+    
+    close_as = data.get('close_as', 'pausada')
+    if close_as not in ('pausada', 'completada'):
+        return jsonify({'error': 'close_as debe ser pausada o completada'}), 400
+    
+    # Solo el propio empleado o un admin pueden cambiar su tarea
+    if not current_user.is_admin() and employee_id != current_user.id:
+        return jsonify({'error': 'No tienes permiso para cambiar la tarea de este empleado'}), 403
+    
+    try:
+        # Bloquear la fila del empleado: los cambios concurrentes sobre el mismo
+        # empleado se ejecutan en serie y nunca quedan cero o dos activas
+        employee = db.session.query(Employee).filter_by(id=employee_id) \
+            .with_for_update().populate_existing().first()
+        if not employee or not employee.is_active:
+            db.session.rollback()
+            return jsonify({'error': 'Empleado no encontrado o inactivo'}), 404
+        
+        current = TaskAssignment.query.filter(
+            TaskAssignment.employee_id == employee_id,
+            TaskAssignment.status.in_(ACTIVE_ASSIGNMENT_STATUSES)
+        ).first()
+        
+        # Si el cliente indica qué asignación cree activa, comprobar que sigue siéndolo
+        expected_id = data.get('expected_assignment_id')
+        if expected_id is not None and (current is None or current.id != expected_id):
+            db.session.rollback()
+            return jsonify({
+                'error': 'La asignación activa ha cambiado',
+                'active_assignment': current.to_dict() if current else None
+            }), 409
+        
+        assignment, message = _build_assignment(employee_id, data)
+        if assignment is None:
+            db.session.rollback()
+            return jsonify({'error': message}), 404
+        
+        now = datetime.utcnow()
+        if current:
+            current.end_time = now
+            # Un descanso no se completa: solo se cierra
+            current.status = 'pausada' if current.status == 'descanso' else close_as
+            if 'close_notes' in data:
+                current.notes = data['close_notes']
+        assignment.start_time = now
+        
+        db.session.add(assignment)
+        db.session.commit()
+    except IntegrityError:
+        # Otra petición abrió una asignación a la vez que esta
+        db.session.rollback()
+        active = TaskAssignment.query.filter(
+            TaskAssignment.employee_id == employee_id,
+            TaskAssignment.status.in_(ACTIVE_ASSIGNMENT_STATUSES)
+        ).first()
+        return jsonify({
+            'error': 'La asignación activa ha cambiado',
+            'active_assignment': active.to_dict() if active else None
+        }), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    closed_data = current.to_dict() if current else None
+    assignment_data = assignment.to_dict()
+    live_state.assignment_changed(*[a for a in (closed_data, assignment_data) if a])
+    if closed_data:
+        event_type = 'assignment_completed' if closed_data['status'] == 'completada' else 'assignment_stopped'
+        publish(event_type, {'assignment': closed_data})
+    publish('assignment_created', {'assignment': assignment_data})
+    
+    return jsonify({
+        'message': message,
+        'closed_assignment': closed_data,
+        'assignment': assignment_data
+    })
+
+
 @bp.route('/api/<int:assignment_id>', methods=['PUT'])
 @login_required
 def update_assignment(assignment_id):
@@ -228,9 +465,12 @@ def update_assignment(assignment_id):
     
     try:
         db.session.commit()
+        assignment_data = assignment.to_dict()
+        live_state.assignment_changed(assignment_data)
+        publish('assignment_updated', {'assignment': assignment_data})
         return jsonify({
             'message': 'Asignación actualizada exitosamente',
-            'assignment': assignment.to_dict()
+            'assignment': assignment_data
         })
     except Exception as e:
         db.session.rollback()
@@ -246,24 +486,53 @@ def delete_assignment(assignment_id):
     try:
         db.session.delete(assignment)
         db.session.commit()
+        live_state.assignment_deleted(assignment_id, assignment.employee_id)
+        publish('assignment_deleted', {
+            'assignment': {'id': assignment_id, 'employee_id': assignment.employee_id}
+        })
         return jsonify({'message': 'Asignación eliminada exitosamente'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
+CURRENT_ASSIGNMENTS_TABLES = ('task_assignments', 'employees', 'tasks')
+
+
+def current_assignments_data(refresh=True):
+    """(versiones, cuerpo) de /assignments/api/current, desde el registro en memoria.
+    
+    La usan la app Flask y la asíncrona; con refresh=False no se consulta la BD.
+    """
+    versions = live_state.versions(CURRENT_ASSIGNMENTS_TABLES, refresh=refresh)
+    assignments = live_state.active_assignments(refresh=False)
+    return versions, {
+        'assignments': assignments,
+        'count': len(assignments)
+    }
+
+
 @bp.route('/api/current')
 @login_required
+@view_etag(*CURRENT_ASSIGNMENTS_TABLES)
 def get_current_assignments():
     """API para obtener todas las asignaciones actuales (en progreso y descansos)"""
-    assignments = TaskAssignment.query.filter(
-        TaskAssignment.status.in_(['en_progreso', 'descanso'])
-    ).all()
-    
-    return jsonify({
-        'assignments': [assignment.to_dict() for assignment in assignments],
-        'count': len(assignments)
-    })
+    return current_assignments_data()
+
+
+def employee_current_assignment_data(employee_id, refresh=True):
+    """Cuerpo de /assignments/api/employee/<id>/current (para ambas apps)"""
+    assignment = live_state.employee_assignment(employee_id, refresh=refresh)
+    
+    if assignment and assignment['status'] == 'en_progreso':
+        return {
+            'assignment': assignment
+        }
+    else:
+        return {
+            'assignment': None,
+            'message': 'El empleado no tiene tareas en progreso'
+        }
 
 
 @bp.route('/api/employee/<int:employee_id>/current')
@@ -272,17 +541,96 @@ def get_employee_current_assignment(employee_id):
     """API para obtener la asignación actual de un empleado"""
     employee = Employee.query.get_or_404(employee_id)
     
-    assignment = TaskAssignment.query.filter_by(
-        employee_id=employee_id,
-        status='en_progreso'
-    ).first()
-    
-    if assignment:
-        return jsonify({
-            'assignment': assignment.to_dict()
-        })
+    return jsonify(employee_current_assignment_data(employee_id))
+
+@bp.route('/api/board')
+@login_required
+def get_board():
+    """API con todo lo necesario para el tablero de asignaciones en una sola llamada"""
+    requested = request.args.get('sections')
+    
+    if requested:
+        sections = {name.strip() for name in requested.split(',') if name.strip()}
+        invalid = sections - set(BOARD_SECTIONS)
+        if invalid:
+            return jsonify({
+                'error': f'Secciones inválidas: {", ".join(sorted(invalid))}',
+                'available_sections': list(BOARD_SECTIONS)
+            }), 400
     else:
-        return jsonify({
-            'assignment': None,
-            'message': 'El empleado no tiene tareas en progreso'
-        })
\ No newline at end of file
+        sections = set(BOARD_SECTIONS)
+    
+    is_admin = current_user.is_admin()
+    user_id = current_user.id
+    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    board = {}
+    
+    # Todas las secciones se leen de la misma instantánea
+    with read_snapshot() as session:
+        if 'employees' in sections:
+            employees = session.query(Employee).filter_by(is_active=True).order_by(Employee.name)
+            board['employees'] = [employee.to_dict() for employee in employees]
+        
+        if 'tasks' in sections:
+            tasks = session.query(Task).filter_by(is_active=True).order_by(Task.name)
+            board['tasks'] = [task.to_dict() for task in tasks]
+        
+        # Activas y completadas hoy salen de una única consulta
+        wants_active = bool(sections & {'current', 'in_progress', 'breaks'})
+        wants_completed = 'completed_today' in sections
+        
+        if wants_active or wants_completed:
+            conditions = []
+            if wants_active:
+                conditions.append(TaskAssignment.status.in_(ACTIVE_ASSIGNMENT_STATUSES))
+            if wants_completed:
+                conditions.append(and_(
+                    TaskAssignment.status == 'completada',
+                    TaskAssignment.start_time >= today_start
+                ))
+            
+            assignments = serialize_assignments(
+                session.query(TaskAssignment)
+                .filter(or_(*conditions))
+                .order_by(TaskAssignment.start_time.desc())
+            )
+            
+            if 'current' in sections:
+                board['current'] = [a for a in assignments if a['status'] in ACTIVE_ASSIGNMENT_STATUSES]
+            if 'in_progress' in sections:
+                board['in_progress'] = [a for a in assignments if a['status'] == 'en_progreso']
+            if 'breaks' in sections:
+                board['breaks'] = [a for a in assignments if a['status'] == 'descanso']
+            if wants_completed:
+                board['completed_today'] = [a for a in assignments if a['status'] == 'completada']
+        
+        if 'attendance_today' in sections:
+            start_of_day = datetime.combine(date.today(), datetime.min.time())
+            end_of_day = datetime.combine(date.today(), datetime.max.time())
+            attendances = session.query(Attendance).filter(
+                Attendance.check_in >= start_of_day,
+                Attendance.check_in <= end_of_day
+            )
+            # Si no es admin, solo ver los suyos
+            if not is_admin:
+                attendances = attendances.filter(Attendance.employee_id == user_id)
+            board['attendance_today'] = serialize_attendances(
+                attendances.order_by(Attendance.check_in.desc())
+            )
+    
+    board['generated_at'] = datetime.utcnow().isoformat() + 'Z'
+    return jsonify(board)
+
+
+@bp.route('/api/live-state/check')
+@login_required
+def check_live_state():
+    """API (solo admin) para comparar el registro en memoria con la BD"""
+    if not current_user.is_admin():
+        return jsonify({'error': 'No tienes permisos para esta operación'}), 403
+    
+    differences = live_state.verify()
+    return jsonify({
+        'consistent': not differences,
+        'differences': differences
+    })
@@ -1,9 +1,19 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_login import login_required, current_user
 from app import db
 from app.models import Attendance, Employee
-from app.decorators import admin_required
+from app.decorators import admin_required, view_etag
+from app.serializers import serialize_attendances, with_attendance_relations
+from app.archive import reaches_archive, iter_archived, archived_dict
+from app.exports import (EXPORT_FORMATS, ATTENDANCE_EXPORT_FIELDS, attendance_export_row,
+                         export_response, xlsx_available)
+from app.event_bus import publish
+from app.live_state import live_state
+from app.cache import query_cache
+from app.versioning import get_versions, versions_key
 from datetime import datetime, date, timedelta
+from sqlalchemy import func, case, and_, select, distinct
+from sqlalchemy.exc import IntegrityError
 
 bp = Blueprint('attendance', __name__, url_prefix='/attendance')
 
@@ -35,23 +45,13 @@ def check_in():
     # Verificar que el empleado existe
     employee = Employee.query.get_or_404(employee_id)
     
-    # Verificar si ya tiene un fichaje activo hoy
-    active_attendance = Attendance.query.filter_by(
-        employee_id=employee_id,
-        check_out=None
-    ).first()
-    
-    if active_attendance:
-        return jsonify({
-            'error': f'{employee.name} ya tiene un fichaje activo desde las {active_attendance.check_in.strftime("%H:%M")}'
-        }), 400
-    
     # Validar ubicación
     location = data.get('location', 'office')
     if location not in ['office', 'home']:
         return jsonify({'error': 'Ubicación inválida'}), 400
     
-    # Crear nuevo fichaje
+    # Crear nuevo fichaje. Si ya tiene uno abierto, el índice único
+    # uq_attendance_open_per_employee rechaza la inserción
     attendance = Attendance(
         employee_id=employee_id,
         check_in=datetime.utcnow(),
@@ -63,10 +63,24 @@ def check_in():
         db.session.add(attendance)
         db.session.commit()
         
+        attendance_data = attendance.to_dict()
+        live_state.attendance_changed(attendance_data)
+        publish('attendance_check_in', {'attendance': attendance_data})
         return jsonify({
             'message': f'Entrada registrada para {employee.name}',
-            'attendance': attendance.to_dict()
+            'attendance': attendance_data
         }), 201
+    except IntegrityError as e:
+        db.session.rollback()
+        active_attendance = Attendance.query.filter_by(
+            employee_id=employee_id,
+            check_out=None
+        ).first()
+        if active_attendance:
+            return jsonify({
+                'error': f'{employee.name} ya tiene un fichaje activo desde las {active_attendance.check_in.strftime("%H:%M")}'
+            }), 400
+        return jsonify({'error': str(e)}), 500
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -103,61 +117,73 @@ def check_out():
     try:
         db.session.commit()
         
+        attendance_data = attendance.to_dict()
+        live_state.attendance_changed(attendance_data)
+        publish('attendance_check_out', {'attendance': attendance_data})
         return jsonify({
             'message': 'Salida registrada correctamente',
-            'attendance': attendance.to_dict()
+            'attendance': attendance_data
         }), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
+def current_attendance_data(user, employee_id=None, refresh=True):
+    """Cuerpo de /attendance/api/current para `user` (para ambas apps)"""
+    # Si no es admin, solo puede ver el suyo
+    if not user.is_admin():
+        employee_id = user.id
+    else:
+        if not employee_id:
+            employee_id = user.id
+    
+    return {
+        'attendance': live_state.open_attendance(employee_id, refresh=refresh)
+    }
+
+
 @bp.route('/api/current')
 @login_required
 def get_current_attendance():
     """Obtener fichaje activo del usuario actual"""
     employee_id = request.args.get('employee_id', type=int)
+    return jsonify(current_attendance_data(current_user, employee_id))
+
+
+def day_attendances(session, user, day):
+    """Fichajes del día visibles para `user`, más recientes primero (para ambas apps)"""
+    start_of_day = datetime.combine(day, datetime.min.time())
+    end_of_day = datetime.combine(day, datetime.max.time())
     
-    # Si no es admin, solo puede ver el suyo
-    if not current_user.is_admin():
-        employee_id = current_user.id
-    else:
-        if not employee_id:
-            employee_id = current_user.id
+    statement = with_attendance_relations(select(Attendance)).where(
+        Attendance.check_in >= start_of_day,
+        Attendance.check_in <= end_of_day
+    ).order_by(Attendance.check_in.desc())
     
-    attendance = Attendance.query.filter_by(
-        employee_id=employee_id,
-        check_out=None
-    ).first()
+    # Si no es admin, solo ver los suyos
+    if not user.is_admin():
+        statement = statement.where(Attendance.employee_id == user.id)
     
-    return jsonify({
-        'attendance': attendance.to_dict() if attendance else None
-    })
+    return [attendance.to_dict() for attendance in session.scalars(statement)]
+
+
+def parse_query_date(date_str):
+    """Fecha del parámetro `date` (YYYY-MM-DD) u hoy si no se indica; ValueError si no es válida"""
+    if not date_str:
+        return date.today()
+    try:
+        return datetime.strptime(date_str, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('Formato de fecha inválido. Use YYYY-MM-DD')
 
 
 @bp.route('/api/today')
 @login_required
 def get_today_attendances():
     """Obtener todos los fichajes de hoy"""
-    today = date.today()
-    start_of_day = datetime.combine(today, datetime.min.time())
-    end_of_day = datetime.combine(today, datetime.max.time())
-    
-    # Si no es admin, solo ver los suyos
-    if current_user.is_admin():
-        attendances = Attendance.query.filter(
-            Attendance.check_in >= start_of_day,
-            Attendance.check_in <= end_of_day
-        ).order_by(Attendance.check_in.desc()).all()
-    else:
-        attendances = Attendance.query.filter(
-            Attendance.employee_id == current_user.id,
-            Attendance.check_in >= start_of_day,
-            Attendance.check_in <= end_of_day
-        ).order_by(Attendance.check_in.desc()).all()
-    
     return jsonify({
-        'attendances': [a.to_dict() for a in attendances]
+        'attendances': day_attendances(db.session, current_user, date.today())
     })
 
 
@@ -166,35 +192,13 @@ def get_today_attendances():
 def get_attendances():
     """Obtener fichajes filtrados por fecha"""
     # Obtener parámetro de fecha (formato: YYYY-MM-DD)
-    date_str = request.args.get('date')
-    
-    if date_str:
-        try:
-            query_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-        except ValueError:
-            return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
-    else:
-        # Si no se proporciona fecha, usar hoy
-        query_date = date.today()
-    
-    start_of_day = datetime.combine(query_date, datetime.min.time())
-    end_of_day = datetime.combine(query_date, datetime.max.time())
-    
-    # Si no es admin, solo ver los suyos
-    if current_user.is_admin():
-        attendances = Attendance.query.filter(
-            Attendance.check_in >= start_of_day,
-            Attendance.check_in <= end_of_day
-        ).order_by(Attendance.check_in.desc()).all()
-    else:
-        attendances = Attendance.query.filter(
-            Attendance.employee_id == current_user.id,
-            Attendance.check_in >= start_of_day,
-            Attendance.check_in <= end_of_day
-        ).order_by(Attendance.check_in.desc()).all()
+    try:
+        query_date = parse_query_date(request.args.get('date'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
-        'attendance': [a.to_dict() for a in attendances]
+        'attendance': day_attendances(db.session, current_user, query_date)
     })
 
 
@@ -219,52 +223,143 @@ def get_attendance_history():
     if employee_id:
         query = query.filter_by(employee_id=employee_id)
     
-    attendances = query.order_by(Attendance.check_in.desc()).all()
+    attendances = query.order_by(Attendance.check_in.desc())
     
     return jsonify({
-        'attendances': [a.to_dict() for a in attendances]
+        'attendances': serialize_attendances(attendances)
     })
 
 
-@bp.route('/api/stats/today')
+@bp.route('/api/export')
 @login_required
-def get_today_stats():
-    """Obtener estadísticas de fichajes de hoy"""
-    today = date.today()
-    start_of_day = datetime.combine(today, datetime.min.time())
+def export_attendances():
+    """Exportar fichajes a CSV o XLSX (filtros: employee_id, start_date, end_date)"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'Formato inválido. Use csv o xlsx'}), 400
+    if fmt == 'xlsx' and not xlsx_available():
+        return jsonify({'error': 'Exportación XLSX no disponible (instala XlsxWriter)'}), 501
     
-    # Total de empleados activos
-    total_employees = Employee.query.filter_by(is_active=True).count()
-    
-    # Empleados que han fichado hoy
-    checked_in_today = db.session.query(Attendance.employee_id).filter(
-        Attendance.check_in >= start_of_day
-    ).distinct().count()
+    employee_id = request.args.get('employee_id', type=int)
     
-    # Empleados actualmente en el trabajo
-    currently_working = Attendance.query.filter(
-        Attendance.check_in >= start_of_day,
-        Attendance.check_out.is_(None)
-    ).count()
+    # Si no es admin, solo puede exportar los suyos
+    if not current_user.is_admin():
+        employee_id = current_user.id
     
-    # Empleados en oficina vs casa
-    in_office = Attendance.query.filter(
-        Attendance.check_in >= start_of_day,
-        Attendance.check_out.is_(None),
-        Attendance.location == 'office'
-    ).count()
+    query = Attendance.query
+    if employee_id:
+        query = query.filter(Attendance.employee_id == employee_id)
     
-    in_home = Attendance.query.filter(
-        Attendance.check_in >= start_of_day,
-        Attendance.check_out.is_(None),
-        Attendance.location == 'home'
-    ).count()
+    start_date = end_date = None
+    try:
+        if request.args.get('start_date'):
+            start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d')
+            query = query.filter(Attendance.check_in >= start_date)
+        if request.args.get('end_date'):
+            end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d') + timedelta(days=1)
+            query = query.filter(Attendance.check_in < end_date)
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
+    
+    query = query.order_by(Attendance.check_in, Attendance.id)
+    
+    # Si el rango llega más atrás del corte, se leen también los fichajes archivados
+    archived = ()
+    if reaches_archive('attendance', start_date):
+        archived = (
+            archived_dict('attendance', record, attendance_export_row)
+            for record in iter_archived('attendance', start_date,
+                                        end_date - timedelta(microseconds=1) if end_date else None,
+                                        employee_id=employee_id)
+        )
+    
+    return export_response(with_attendance_relations(query), ATTENDANCE_EXPORT_FIELDS,
+                           attendance_export_row, fmt, 'fichajes', archived)
+
+
+def today_stats_statement(start_of_day, now):
+    """Contadores de hoy y ocupación por hora en una sola pasada sobre attendance"""
+    is_open = Attendance.check_out.is_(None)
+    # Una sesión abierta ocupa hasta ahora, no hasta el final del día
+    session_end = func.coalesce(Attendance.check_out, now)
+    
+    hours = []
+    for hour in range(24):
+        hour_start = start_of_day + timedelta(hours=hour)
+        present = and_(Attendance.check_in < hour_start + timedelta(hours=1),
+                       session_end >= hour_start)
+        hours.append(func.count(distinct(case((present, Attendance.employee_id)))))
+    
+    total_employees = select(func.count()).select_from(Employee).where(
+        Employee.is_active.is_(True)
+    ).scalar_subquery()
+    
+    return select(
+        total_employees,
+        func.count(distinct(Attendance.employee_id)),
+        func.count(case((is_open, 1))),
+        func.count(case((and_(is_open, Attendance.location == 'office'), 1))),
+        func.count(case((and_(is_open, Attendance.location == 'home'), 1))),
+        *hours
+    ).where(Attendance.check_in >= start_of_day)
+
+
+def today_stats_from_row(row):
+    """Respuesta de /attendance/api/stats/today a partir de la fila de today_stats_statement"""
+    total_employees, checked_in_today, currently_working, in_office, in_home = row[:5]
     
-    return jsonify({
+    return {
         'total_employees': total_employees,
         'checked_in_today': checked_in_today,
         'currently_working': currently_working,
         'in_office': in_office,
         'in_home': in_home,
-        'not_checked_in': total_employees - checked_in_today
-    })
\ No newline at end of file
+        'not_checked_in': total_employees - checked_in_today,
+        'hourly_occupancy': [
+            {'hour': hour, 'employees': count}
+            for hour, count in enumerate(row[5:])
+        ]
+    }
+
+
+TODAY_STATS_TABLES = ('employees', 'attendance')
+
+
+def today_stats_cache_key(today, versions):
+    """Clave de caché de las estadísticas de hoy (una entrada por hora UTC).
+    
+    Incluye las versiones del ETag: la caché solo se invalida con las escrituras
+    de este proceso y no debe servir un cuerpo anterior a un cambio de otro worker.
+    """
+    return ('attendance_stats', today, datetime.utcnow().hour, versions_key(versions))
+
+
+def today_stats_data(session):
+    """(versiones, cuerpo) de /attendance/api/stats/today; la usan ambas apps"""
+    today = date.today()
+    start_of_day = datetime.combine(today, datetime.min.time())
+    
+    # Versiones ANTES que los datos (ver versioned_etag)
+    versions = get_versions(TODAY_STATS_TABLES, session)
+    
+    def compute():
+        row = session.execute(today_stats_statement(start_of_day, datetime.utcnow())).one()
+        return today_stats_from_row(row)
+    
+    # La ocupación por hora cuenta las sesiones abiertas hasta ahora: cambia al
+    # empezar cada hora aunque no haya fichajes nuevos
+    stats = query_cache.get_or_set(
+        today_stats_cache_key(today, versions),
+        compute,
+        ttl=current_app.config['ATTENDANCE_STATS_TTL'],
+        tags=TODAY_STATS_TABLES
+    )
+    return versions, stats
+
+
+@bp.route('/api/stats/today')
+@login_required
+@view_etag(*TODAY_STATS_TABLES, hourly=True)
+def get_today_stats():
+    """Obtener estadísticas de fichajes de hoy"""
+    return today_stats_data(db.session)
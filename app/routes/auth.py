@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, request, jsonify, redirect, url_fo
 from flask_login import login_user, logout_user, login_required, current_user
 from app import db
 from app.models import Employee
+from app.passwords import needs_rehash, hash_password, verify_password, PasswordVerifierBusy
 from datetime import datetime
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
@@ -25,18 +26,41 @@ def login():
         
         # Buscar empleado por email
         employee = Employee.query.filter_by(email=email).first()
+        password_hash = employee.password_hash if employee else None
+        is_active = employee is not None and employee.is_active
         
-        # Verificar credenciales
-        if employee and employee.check_password(password):
-            if not employee.is_active:
+        # Terminar la transacción antes de verificar: la espera por el pool de
+        # contraseñas no debe retener una conexión a la BD
+        db.session.rollback()
+        
+        # Verificar credenciales (en el pool de procesos de contraseñas)
+        try:
+            valid = employee is not None and verify_password(password_hash, password)
+        except PasswordVerifierBusy:
+            flash('Hay muchos inicios de sesión en curso. Inténtalo de nuevo en unos segundos.', 'warning')
+            return render_template('auth/login.html'), 503
+        
+        if valid:
+            if not is_active:
                 flash('Tu cuenta está desactivada. Contacta al administrador.', 'warning')
                 return render_template('auth/login.html')
             
+            # Recalcular el hash si la política de contraseñas ha cambiado (también
+            # antes de volver a usar la BD)
+            new_hash = None
+            if needs_rehash(password_hash):
+                try:
+                    new_hash = hash_password(password, offload=True)
+                except PasswordVerifierBusy:
+                    pass  # Se intentará en el próximo login
+            
             # Login exitoso
             login_user(employee, remember=remember)
             
             # Actualizar último login
             employee.last_login = datetime.utcnow()
+            if new_hash:
+                employee.password_hash = new_hash
             db.session.commit()
             
             # Redirigir a la página solicitada o al dashboard
@@ -65,6 +89,8 @@ def logout():
 @login_required
 def current_user_info():
     """API para obtener información del usuario actual"""
+    # current_user es una instantánea; los datos completos se leen de la BD
+    employee = Employee.query.get_or_404(current_user.id)
     return jsonify({
-        'user': current_user.to_dict(include_sensitive=True)
+        'user': employee.to_dict(include_sensitive=True)
     })
\ No newline at end of file
@@ -3,6 +3,8 @@ from flask_login import login_required, current_user
 from app import db
 from app.models import Employee, TaskAssignment
 from app.decorators import admin_required
+from app.history import assignment_history
+from app.principal import invalidate_principal
 from datetime import datetime
 
 bp = Blueprint('employees', __name__, url_prefix='/employees')
@@ -172,6 +174,7 @@ def update_employee(employee_id):
     
     try:
         db.session.commit()
+        invalidate_principal(employee.id)
         return jsonify({
             'message': 'Empleado actualizado exitosamente',
             'employee': employee.to_dict()
@@ -191,6 +194,7 @@ def delete_employee(employee_id):
     
     try:
         db.session.commit()
+        invalidate_principal(employee.id)
         return jsonify({'message': 'Empleado desactivado exitosamente'})
     except Exception as e:
         db.session.rollback()
@@ -202,12 +206,14 @@ def employee_history(employee_id):
     """API para obtener el historial de tareas de un empleado"""
     employee = Employee.query.get_or_404(employee_id)
     
-    # Obtener todas las asignaciones del empleado
-    assignments = employee.task_assignments.order_by(
-        TaskAssignment.start_time.desc()
-    ).all()
+    # Ventana from/to, paginación por cursor y resumen calculado en SQL
+    try:
+        history = assignment_history(TaskAssignment.employee_id == employee_id,
+                                     employee_id=employee_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
         'employee': employee.to_dict(),
-        'assignments': [assignment.to_dict() for assignment in assignments]
-    })
\ No newline at end of file
+        **history
+    })
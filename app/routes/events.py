@@ -0,0 +1,69 @@
+import json
+import queue
+import time
+from flask import Blueprint, Response, current_app
+from flask_login import login_required, current_user
+from sqlalchemy.exc import SQLAlchemyError
+from app.event_bus import event_bus, WATCHED_TABLES
+from app.versioning import get_versions
+from app.database import use_primary
+
+bp = Blueprint('events', __name__, url_prefix='/events')
+
+# Segundos sin eventos antes de enviar un comentario keep-alive
+KEEPALIVE_INTERVAL = 15
+
+
+def format_sse(event):
+    """Formatea un evento según el protocolo text/event-stream"""
+    payload = json.dumps(event['data'], ensure_ascii=False)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+
+
+def _version_fetcher(app):
+    """Lee las versiones de las tablas del bus en la BD principal"""
+    def fetch():
+        with app.app_context(), use_primary():
+            return get_versions(WATCHED_TABLES)
+    return fetch
+
+
+@bp.route('/api/stream')
+@login_required
+def stream():
+    """Stream SSE con los cambios de asignaciones y fichajes"""
+    app = current_app._get_current_object()
+    check_interval = app.config['EVENTS_VERSION_CHECK_INTERVAL']
+    fetch_versions = _version_fetcher(app)
+    
+    # Si no es admin, solo recibe sus propios eventos (igual que en la API REST)
+    subscriber = event_bus.subscribe(None if current_user.is_admin() else current_user.id)
+    
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            last_sent = time.monotonic()
+            while True:
+                # Cambios hechos en otros workers (no pasan por el bus de este proceso)
+                try:
+                    event_bus.check_versions(fetch_versions, check_interval)
+                except SQLAlchemyError:
+                    app.logger.exception('No se pudieron comprobar las versiones de cambio')
+                
+                try:
+                    event = subscriber.get(timeout=min(check_interval, KEEPALIVE_INTERVAL))
+                except queue.Empty:
+                    if time.monotonic() - last_sent >= KEEPALIVE_INTERVAL:
+                        yield ': keep-alive\n\n'
+                        last_sent = time.monotonic()
+                    continue
+                yield format_sse(event)
+                last_sent = time.monotonic()
+        finally:
+            event_bus.unsubscribe(subscriber)
+    
+    # No se usa stream_with_context: la conexión no retiene la sesión de BD entre lecturas
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
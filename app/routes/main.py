@@ -1,7 +1,12 @@
-from flask import Blueprint, render_template, jsonify
+from flask import Blueprint, render_template, current_app
 from flask_login import login_required
-from app.models import Employee, Task, TaskAssignment
-from sqlalchemy import func
+from app import db
+from app.models import Employee, Task, TaskAssignment, Attendance
+from app.live_state import live_state
+from app.cache import query_cache
+from app.decorators import view_etag
+from app.versioning import get_versions, versions_key
+from sqlalchemy import func, case, and_, or_, select, literal, distinct, union_all, String
 from datetime import datetime, timedelta
 
 bp = Blueprint('main', __name__)
@@ -28,41 +33,143 @@ def test_api():
     return render_template('test_api.html')
 
 
-@bp.route('/api/dashboard/stats')
-def dashboard_stats():
-    """API para obtener estadísticas del dashboard"""
+def _count_if(condition, dialect):
+    """COUNT condicional: FILTER en PostgreSQL, CASE en el resto"""
+    if dialect == 'postgresql':
+        return func.count().filter(condition)
+    return func.count(case((condition, 1)))
+
+
+def dashboard_stats_statement(dialect, today_start):
+    """Una sola sentencia con los contadores por categoría, ubicación y empleados"""
+    completed_today = and_(TaskAssignment.status == 'completada',
+                           TaskAssignment.end_time >= today_start)
+    in_progress = TaskAssignment.status == 'en_progreso'
+    
+    # Tareas y asignaciones por categoría (solo se unen las asignaciones relevantes)
+    by_category = select(
+        literal('category').label('dimension'),
+        Task.category.label('key'),
+        func.count(distinct(case((Task.is_active.is_(True), Task.id)))).label('available_tasks'),
+        _count_if(in_progress, dialect).label('active_assignments'),
+        _count_if(completed_today, dialect).label('completed_today')
+    ).select_from(Task).outerjoin(
+        TaskAssignment,
+        and_(TaskAssignment.task_id == Task.id, or_(in_progress, completed_today))
+    ).group_by(Task.category)
     
-    # Contar empleados activos
-    active_employees = Employee.query.filter_by(is_active=True).count()
+    # Totales sobre todas las asignaciones: incluyen los descansos (sin tarea ni categoría)
+    assignments = select(
+        literal('assignments'),
+        literal(None, String),
+        literal(0),
+        _count_if(in_progress, dialect),
+        _count_if(completed_today, dialect)
+    ).where(or_(in_progress, completed_today))
     
-    # Contar tareas disponibles
-    available_tasks = Task.query.filter_by(is_active=True).count()
+    # Personas trabajando ahora por ubicación
+    by_location = select(
+        literal('location'),
+        Attendance.location,
+        func.count(),
+        literal(0),
+        literal(0)
+    ).where(Attendance.check_out.is_(None)).group_by(Attendance.location)
     
-    # Contar asignaciones en progreso
-    active_assignments = TaskAssignment.query.filter_by(status='en_progreso').count()
+    employees = select(
+        literal('employees'),
+        literal(None, String),
+        _count_if(Employee.is_active.is_(True), dialect),
+        literal(0),
+        literal(0)
+    ).select_from(Employee)
     
-    # Asignaciones completadas hoy
+    return union_all(by_category, assignments, by_location, employees)
+
+
+def dashboard_stats_from_rows(rows):
+    """Respuesta de /api/dashboard/stats a partir de las filas de dashboard_stats_statement"""
+    stats = {
+        'active_employees': 0,
+        'available_tasks': 0,
+        'active_assignments': 0,
+        'completed_today': 0,
+        'by_category': [],
+        'by_location': {'office': 0, 'home': 0}
+    }
+    for dimension, key, first, second, third in rows:
+        if dimension == 'employees':
+            stats['active_employees'] = first
+        elif dimension == 'location':
+            stats['by_location'][key] = first
+        elif dimension == 'assignments':
+            stats['active_assignments'] = second
+            stats['completed_today'] = third
+        else:
+            stats['available_tasks'] += first
+            stats['by_category'].append({
+                'category': key,
+                'available_tasks': first,
+                'active_assignments': second,
+                'completed_today': third
+            })
+    stats['by_category'].sort(key=lambda c: (c['category'] is None, c['category'] or ''))
+    return stats
+
+
+DASHBOARD_TABLES = ('employees', 'tasks', 'task_assignments', 'attendance')
+CURRENT_ASSIGNMENTS_TABLES = ('task_assignments', 'employees', 'tasks')
+
+
+def dashboard_stats_cache_key(today_start, versions):
+    """Clave de caché de las estadísticas: el cuerpo guardado corresponde a esas versiones"""
+    return ('dashboard_stats', today_start.date(), versions_key(versions))
+
+
+def dashboard_stats_data(session):
+    """(versiones, cuerpo) de /api/dashboard/stats; la usan la app Flask y la asíncrona"""
     today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    completed_today = TaskAssignment.query.filter(
-        TaskAssignment.status == 'completada',
-        TaskAssignment.end_time >= today_start
-    ).count()
     
-    return jsonify({
-        'active_employees': active_employees,
-        'available_tasks': available_tasks,
-        'active_assignments': active_assignments,
-        'completed_today': completed_today
-    })
+    # Versiones ANTES que los datos. La caché solo invalida las escrituras de este
+    # proceso: con las versiones en la clave, un cambio de otro worker no reutiliza
+    # el cuerpo anterior
+    versions = get_versions(DASHBOARD_TABLES, session)
+    
+    def compute():
+        dialect = session.get_bind().dialect.name
+        rows = session.execute(dashboard_stats_statement(dialect, today_start)).all()
+        return dashboard_stats_from_rows(rows)
+    
+    stats = query_cache.get_or_set(
+        dashboard_stats_cache_key(today_start, versions),
+        compute,
+        ttl=current_app.config['DASHBOARD_STATS_TTL'],
+        tags=DASHBOARD_TABLES
+    )
+    return versions, stats
+
+
+@bp.route('/api/dashboard/stats')
+@login_required
+@view_etag(*DASHBOARD_TABLES)
+def dashboard_stats():
+    """API para obtener estadísticas del dashboard"""
+    return dashboard_stats_data(db.session)
+
+
+def current_assignments_data(refresh=True):
+    """(versiones, cuerpo) de /api/current-assignments, desde el registro en memoria.
+    
+    Con refresh=False no se consulta la BD (la app asíncrona refresca por su cuenta).
+    """
+    versions = live_state.versions(CURRENT_ASSIGNMENTS_TABLES, refresh=refresh)
+    return versions, {
+        'assignments': live_state.active_assignments(('en_progreso',), refresh=False)
+    }
 
 
 @bp.route('/api/current-assignments')
+@view_etag(*CURRENT_ASSIGNMENTS_TABLES)
 def current_assignments():
     """API para obtener las asignaciones actuales de todos los empleados"""
-    
-    # Obtener asignaciones en progreso
-    assignments = TaskAssignment.query.filter_by(status='en_progreso').all()
-    
-    return jsonify({
-        'assignments': [assignment.to_dict() for assignment in assignments]
-    })
\ No newline at end of file
+    return current_assignments_data()
\ No newline at end of file
@@ -0,0 +1,224 @@
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from app import db
+from app import report_engine
+from app.models import DailyStats, EmployeeDailyStats, Employee, Task
+from sqlalchemy import func
+from datetime import datetime, date, timedelta
+
+bp = Blueprint('reports', __name__, url_prefix='/reports')
+
+
+def _date_range():
+    """Lee `from` y `to` (YYYY-MM-DD). Por defecto, los últimos 30 días.
+    
+    Lanza ValueError si alguna fecha no es válida.
+    """
+    date_to = request.args.get('to')
+    date_from = request.args.get('from')
+    
+    date_to = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else date.today()
+    date_from = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from \
+        else date_to - timedelta(days=30)
+    return date_from, date_to
+
+
+@bp.route('/api/daily')
+@login_required
+def daily_stats():
+    """API con el resumen diario de asignaciones cerradas"""
+    try:
+        date_from, date_to = _date_range()
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
+    
+    days = DailyStats.query.filter(
+        DailyStats.date >= date_from,
+        DailyStats.date <= date_to
+    ).order_by(DailyStats.date.desc()).all()
+    
+    # Empleados con actividad por día (a partir del resumen por empleado)
+    active_employees = dict(db.session.query(
+        EmployeeDailyStats.date, func.count(EmployeeDailyStats.employee_id)
+    ).filter(
+        EmployeeDailyStats.date >= date_from,
+        EmployeeDailyStats.date <= date_to
+    ).group_by(EmployeeDailyStats.date).all())
+    
+    result = []
+    for day in days:
+        data = day.to_dict()
+        data['active_employees'] = active_employees.get(day.date, 0)
+        result.append(data)
+    
+    return jsonify({
+        'from': date_from.isoformat(),
+        'to': date_to.isoformat(),
+        'days': result
+    })
+
+
+@bp.route('/api/employees/daily')
+@login_required
+def employee_daily_stats():
+    """API con el resumen diario por empleado"""
+    try:
+        date_from, date_to = _date_range()
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
+    
+    employee_id = request.args.get('employee_id', type=int)
+    
+    # Si no es admin, solo puede ver el suyo
+    if not current_user.is_admin():
+        employee_id = current_user.id
+    
+    query = EmployeeDailyStats.query.filter(
+        EmployeeDailyStats.date >= date_from,
+        EmployeeDailyStats.date <= date_to
+    )
+    if employee_id:
+        query = query.filter(EmployeeDailyStats.employee_id == employee_id)
+    
+    rows = query.order_by(EmployeeDailyStats.date.desc(), EmployeeDailyStats.employee_id).all()
+    
+    return jsonify({
+        'from': date_from.isoformat(),
+        'to': date_to.isoformat(),
+        'days': [row.to_dict() for row in rows]
+    })
+
+
+@bp.route('/api/productivity')
+@login_required
+def productivity():
+    """API con la productividad por empleado en el rango (a partir de employee_daily_stats)"""
+    try:
+        date_from, date_to = _date_range()
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
+    
+    stats = EmployeeDailyStats
+    query = db.session.query(
+        Employee.id,
+        Employee.name,
+        Employee.position,
+        func.coalesce(func.sum(stats.closed_assignments), 0),
+        func.coalesce(func.sum(stats.completed_tasks), 0),
+        func.coalesce(func.sum(stats.total_minutes), 0),
+        func.coalesce(func.sum(stats.break_minutes), 0),
+        func.max(stats.date)
+    ).outerjoin(stats, db.and_(
+        stats.employee_id == Employee.id,
+        stats.date >= date_from,
+        stats.date <= date_to
+    )).filter(Employee.is_active == True)
+    
+    # Si no es admin, solo puede ver el suyo
+    if not current_user.is_admin():
+        query = query.filter(Employee.id == current_user.id)
+    
+    rows = query.group_by(Employee.id, Employee.name, Employee.position).all()
+    
+    employees = [{
+        'employee_id': employee_id,
+        'employee_name': name,
+        'position': position,
+        'closed_assignments': closed,
+        'completed_tasks': completed,
+        'total_minutes': minutes,
+        'avg_duration_minutes': minutes / closed if closed else None,
+        'break_minutes': break_minutes,
+        'last_active_date': last_date.isoformat() if last_date else None
+    } for employee_id, name, position, closed, completed, minutes, break_minutes, last_date in rows]
+    employees.sort(key=lambda e: e['completed_tasks'], reverse=True)
+    
+    return jsonify({
+        'from': date_from.isoformat(),
+        'to': date_to.isoformat(),
+        'employees': employees
+    })
+
+
+def _group_label(dimension, value, names):
+    """Convierte el valor entero de una dimensión en campos de la respuesta"""
+    value = int(value)
+    if dimension == 'employee':
+        return {'employee_id': value, 'employee_name': names['employee'].get(value)}
+    if dimension == 'task':
+        if value < 0:
+            return {'task_id': None, 'task_name': '☕ Descanso'}
+        return {'task_id': value, 'task_name': names['task'].get(value)}
+    if dimension == 'category':
+        return {'category': names['category'][value] if value >= 0 else None}
+    day = date(1970, 1, 1) + timedelta(days=value)
+    if dimension == 'week':
+        return {'week_start': day.isoformat()}
+    return {'day': day.isoformat()}
+
+
+@bp.route('/api/time-allocation')
+@login_required
+def time_allocation():
+    """API con el tiempo dedicado agrupado (por defecto horas por tarea, empleado y semana)"""
+    try:
+        date_from, date_to = _date_range()
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
+    
+    group_by = [d for d in request.args.get('group_by', 'employee,task,week').split(',') if d]
+    if any(d not in report_engine.GROUP_DIMENSIONS for d in group_by):
+        return jsonify({
+            'error': f'group_by inválido. Valores: {", ".join(report_engine.GROUP_DIMENSIONS)}'
+        }), 400
+    
+    try:
+        percentiles = [float(p) for p in request.args.get('percentiles', '50,90').split(',') if p]
+    except ValueError:
+        return jsonify({'error': 'percentiles debe ser una lista de números entre 0 y 100'}), 400
+    if any(not 0 <= p <= 100 for p in percentiles):
+        return jsonify({'error': 'percentiles debe ser una lista de números entre 0 y 100'}), 400
+    
+    employee_ids = request.args.getlist('employee_id', type=int)
+    categories = request.args.getlist('category')
+    include_breaks = request.args.get('include_breaks', 'false').lower() == 'true'
+    
+    # Si no es admin, solo puede ver el suyo
+    if not current_user.is_admin():
+        employee_ids = [current_user.id]
+    
+    intervals = report_engine.load_intervals(date_from, date_to, employee_ids=employee_ids,
+                                             categories=categories,
+                                             include_breaks=include_breaks)
+    result = report_engine.aggregate(intervals, group_by=group_by, percentiles=percentiles)
+    
+    names = {
+        'employee': dict(db.session.query(Employee.id, Employee.name).all())
+        if 'employee' in group_by else {},
+        'task': dict(db.session.query(Task.id, Task.name).all()) if 'task' in group_by else {},
+        'category': intervals.categories
+    }
+    percentile_keys = [f'p{p:g}' for p in percentiles]
+    
+    groups = []
+    for i in range(len(result['count'])):
+        group = {}
+        for dimension in group_by:
+            group.update(_group_label(dimension, result[dimension][i], names))
+        total_minutes = float(result['total_minutes'][i])
+        group.update({
+            'count': int(result['count'][i]),
+            'total_minutes': total_minutes,
+            'total_hours': round(total_minutes / 60, 2),
+            'mean_minutes': round(float(result['mean_minutes'][i]), 2),
+            'percentiles': {key: round(float(result[key][i]), 2) for key in percentile_keys}
+        })
+        groups.append(group)
+    
+    return jsonify({
+        'from': date_from.isoformat(),
+        'to': date_to.isoformat(),
+        'group_by': group_by,
+        'assignments': len(intervals),
+        'groups': groups
+    })
@@ -2,7 +2,12 @@ from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required, current_user
 from app import db
 from app.models import Task, TaskAssignment, Employee
-from app.decorators import admin_required
+from app.decorators import admin_required, versioned_etag
+from app.history import assignment_history
+from app.serializers import serialize_tasks
+from app.availability import available_tasks_for, available_task_ids, active_task_catalog
+from app.allowed_employees import (parse_ids, resolve_employee_ids, resolve_task_ids,
+                                   set_allowed_employees, grant, revoke)
 
 bp = Blueprint('tasks', __name__, url_prefix='/tasks')
 
@@ -16,6 +21,7 @@ def index():
 
 @bp.route('/api')
 @login_required
+@versioned_etag('tasks')
 def get_tasks():
     """API para obtener todas las tareas"""
     active_only = request.args.get('active_only', 'false').lower() == 'true'
@@ -29,14 +35,13 @@ def get_tasks():
     if category:
         query = query.filter_by(category=category)
     
-    tasks = query.order_by(Task.name).all()
-    
     return jsonify({
-        'tasks': [task.to_dict() for task in tasks]
+        'tasks': serialize_tasks(query.order_by(Task.name))
     })
 
 
 @bp.route('/api/categories')
+@versioned_etag('tasks')
 def get_categories():
     """API para obtener todas las categorías de tareas"""
     categories = db.session.query(Task.category).distinct().filter(
@@ -72,7 +77,10 @@ def create_task():
     
     # Determinar si es para todos o empleados específicos
     assigned_to_all = data.get('assigned_to_all', True)
-    employee_ids = data.get('employee_ids', [])
+    try:
+        employee_ids = parse_ids(data.get('employee_ids', []), 'employee_ids')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     # Validar que si no es para todos, haya al menos un empleado
     if not assigned_to_all and not employee_ids:
@@ -91,12 +99,11 @@ def create_task():
     try:
         db.session.add(task)
         
-        # Si no es para todos, añadir empleados específicos
+        # Si no es para todos, añadir empleados específicos (se ignoran ids inexistentes)
         if not assigned_to_all and employee_ids:
-            for emp_id in employee_ids:
-                employee = Employee.query.get(emp_id)
-                if employee:
-                    task.allowed_employees.append(employee)
+            db.session.flush()
+            valid_ids, _ = resolve_employee_ids(employee_ids)
+            set_allowed_employees(task.id, valid_ids)
         
         db.session.commit()
         return jsonify({
@@ -120,6 +127,13 @@ def update_task(task_id):
         if existing:
             return jsonify({'error': 'Ya existe una tarea con ese nombre'}), 400
     
+    employee_ids = None
+    if 'employee_ids' in data:
+        try:
+            employee_ids = parse_ids(data['employee_ids'], 'employee_ids')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
     # Actualizar campos
     if 'name' in data:
         task.name = data['name']
@@ -132,27 +146,61 @@ def update_task(task_id):
     if 'is_active' in data:
         task.is_active = data['is_active']
     
-    # Actualizar asignación de empleados
-    if 'assigned_to_all' in data:
-        task.assigned_to_all = data['assigned_to_all']
+    try:
+        # Actualizar asignación de empleados (solo se aplica la diferencia)
+        if 'assigned_to_all' in data:
+            task.assigned_to_all = data['assigned_to_all']
+            
+            # Si cambia a empleados específicos
+            if not data['assigned_to_all'] and employee_ids is not None:
+                valid_ids, _ = resolve_employee_ids(employee_ids)
+                set_allowed_employees(task.id, valid_ids)
+            elif data['assigned_to_all']:
+                # Si cambia a "todos", limpiar lista de empleados específicos
+                set_allowed_employees(task.id, ())
         
-        # Si cambia a empleados específicos
-        if not data['assigned_to_all'] and 'employee_ids' in data:
-            # Limpiar empleados actuales
-            task.allowed_employees.clear()
-            # Añadir nuevos empleados
-            for emp_id in data['employee_ids']:
-                employee = Employee.query.get(emp_id)
-                if employee:
-                    task.allowed_employees.append(employee)
-        elif data['assigned_to_all']:
-            # Si cambia a "todos", limpiar lista de empleados específicos
-            task.allowed_employees.clear()
+        db.session.commit()
+        return jsonify({
+            'message': 'Tarea actualizada exitosamente',
+            'task': task.to_dict(include_employees=True)
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/<int:task_id>/employees', methods=['PUT'])
+@login_required
+def set_task_employees(task_id):
+    """API (solo admin) para fijar los empleados permitidos de una tarea.
+    
+    Body: {"employee_ids": [...], "assigned_to_all": false (opcional)}.
+    Solo se insertan y borran los empleados que cambian.
+    """
+    if not current_user.is_admin():
+        return jsonify({'error': 'No tienes permisos para esta operación'}), 403
+    
+    task = Task.query.get_or_404(task_id)
+    data = request.get_json() or {}
+    
+    try:
+        employee_ids = parse_ids(data.get('employee_ids'), 'employee_ids')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    valid_ids, unknown = resolve_employee_ids(employee_ids)
+    if unknown:
+        return jsonify({'error': 'Empleados no encontrados', 'employee_ids': unknown}), 400
     
     try:
+        if 'assigned_to_all' in data:
+            task.assigned_to_all = data['assigned_to_all']
+        added, removed = set_allowed_employees(task.id, valid_ids)
         db.session.commit()
         return jsonify({
-            'message': 'Tarea actualizada exitosamente',
+            'message': 'Empleados de la tarea actualizados',
+            'added': added,
+            'removed': removed,
             'task': task.to_dict(include_employees=True)
         })
     except Exception as e:
@@ -160,6 +208,53 @@ def update_task(task_id):
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/api/employees/bulk', methods=['POST'])
+@login_required
+def bulk_task_employees():
+    """API (solo admin) para permitir o quitar varias tareas a varios empleados.
+    
+    Body: {"action": "add" | "remove", "task_ids": [...], "employee_ids": [...]}.
+    Se aplica a todas las parejas (tarea, empleado).
+    """
+    if not current_user.is_admin():
+        return jsonify({'error': 'No tienes permisos para esta operación'}), 403
+    
+    data = request.get_json() or {}
+    action = data.get('action')
+    if action not in ('add', 'remove'):
+        return jsonify({'error': 'action debe ser "add" o "remove"'}), 400
+    
+    try:
+        task_ids = parse_ids(data.get('task_ids'), 'task_ids')
+        employee_ids = parse_ids(data.get('employee_ids'), 'employee_ids')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    valid_tasks, unknown_tasks = resolve_task_ids(task_ids)
+    valid_employees, unknown_employees = resolve_employee_ids(employee_ids)
+    if unknown_tasks or unknown_employees:
+        return jsonify({
+            'error': 'Tareas o empleados no encontrados',
+            'task_ids': unknown_tasks,
+            'employee_ids': unknown_employees
+        }), 400
+    
+    try:
+        if action == 'add':
+            changed = grant(sorted(valid_tasks), sorted(valid_employees))
+        else:
+            changed = revoke(sorted(valid_tasks), sorted(valid_employees))
+        db.session.commit()
+        return jsonify({
+            'message': 'Permisos de tareas actualizados',
+            'action': action,
+            'changed': changed
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/api/<int:task_id>', methods=['DELETE'])
 def delete_task(task_id):
     """API para eliminar (desactivar) una tarea"""
@@ -181,14 +276,15 @@ def task_history(task_id):
     """API para obtener el historial de asignaciones de una tarea"""
     task = Task.query.get_or_404(task_id)
     
-    # Obtener todas las asignaciones de la tarea
-    assignments = task.assignments.order_by(
-        TaskAssignment.start_time.desc()
-    ).all()
+    # Ventana from/to, paginación por cursor y resumen calculado en SQL
+    try:
+        history = assignment_history(TaskAssignment.task_id == task_id, task_id=task_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
         'task': task.to_dict(),
-        'assignments': [assignment.to_dict() for assignment in assignments]
+        **history
     })
 
 
@@ -197,16 +293,36 @@ def get_available_tasks_for_employee(employee_id):
     """API para obtener tareas disponibles para un empleado específico"""
     employee = Employee.query.get_or_404(employee_id)
     
-    # Obtener todas las tareas activas
-    all_tasks = Task.query.filter_by(is_active=True).all()
+    # Índice de disponibilidad (una consulta, en caché por empleado)
+    return jsonify({
+        'employee': employee.to_dict(),
+        'tasks': available_tasks_for(employee_id)
+    })
+
+
+@bp.route('/api/available-for')
+@login_required
+def get_available_tasks_bulk():
+    """API con la disponibilidad de tareas de varios empleados (?employee_ids=1,2,3).
+    
+    Sin employee_ids devuelve la de todos los empleados activos.
+    """
+    employee_ids = request.args.get('employee_ids')
+    if employee_ids:
+        try:
+            employee_ids = sorted({int(i) for i in employee_ids.split(',') if i.strip()})
+        except ValueError:
+            return jsonify({'error': 'employee_ids debe ser una lista de ids separados por comas'}), 400
+    else:
+        employee_ids = [employee_id for (employee_id,) in
+                        db.session.query(Employee.id).filter_by(is_active=True)]
     
-    # Filtrar las que están disponibles para este empleado
-    available_tasks = [
-        task.to_dict() for task in all_tasks 
-        if task.is_available_for_employee(employee_id)
-    ]
+    availability = available_task_ids(employee_ids)
+    catalog = active_task_catalog()
     
+    # Cada tarea se incluye una vez; por empleado solo van los ids
+    referenced = {task_id for task_ids in availability.values() for task_id in task_ids}
     return jsonify({
-        'employee': employee.to_dict(),
-        'tasks': available_tasks
-    })
\ No newline at end of file
+        'tasks': {task_id: catalog[task_id] for task_id in sorted(referenced) if task_id in catalog},
+        'availability': availability
+    })
@@ -0,0 +1,50 @@
+"""
+Serialización de listas sin consultas N+1.
+
+Los métodos `to_dict` de los modelos acceden a relaciones perezosas
+(`assignment.employee.name`, `assignment.task.name`, `attendance.employee.name`).
+Estas funciones cargan esas relaciones en la misma consulta (JOIN) para que
+serializar N filas cueste una sola ida a la base de datos, manteniendo
+exactamente el mismo formato de salida que `to_dict`.
+"""
+from sqlalchemy.orm import joinedload, selectinload
+from app.models import Attendance, Employee, Task, TaskAssignment
+
+
+def with_assignment_relations(query):
+    """Añade a la consulta la carga por JOIN de empleado y tarea"""
+    return query.options(
+        joinedload(TaskAssignment.employee).load_only(Employee.name),
+        joinedload(TaskAssignment.task).load_only(Task.name)
+    )
+
+
+def with_attendance_relations(query):
+    """Añade a la consulta la carga por JOIN del empleado del fichaje"""
+    return query.options(
+        joinedload(Attendance.employee).load_only(Employee.name)
+    )
+
+
+def with_task_relations(query):
+    """Carga los empleados permitidos de todas las tareas en una sola consulta"""
+    return query.options(
+        selectinload(Task.allowed_employees).load_only(Employee.id)
+    )
+
+
+def serialize_assignments(query):
+    """Lista de asignaciones serializadas con el formato de TaskAssignment.to_dict"""
+    return [assignment.to_dict() for assignment in with_assignment_relations(query)]
+
+
+def serialize_attendances(query):
+    """Lista de fichajes serializados con el formato de Attendance.to_dict"""
+    return [attendance.to_dict() for attendance in with_attendance_relations(query)]
+
+
+def serialize_tasks(query, include_employees=False):
+    """Lista de tareas serializadas con el formato de Task.to_dict"""
+    if include_employees:
+        query = with_task_relations(query)
+    return [task.to_dict(include_employees=include_employees) for task in query]
@@ -0,0 +1,27 @@
+from contextlib import contextmanager
+from sqlalchemy.orm import Session
+from app.database import read_engine
+
+
+@contextmanager
+def read_snapshot():
+    """Sesión de solo lectura en la que todas las consultas ven la misma instantánea.
+
+    Lee de la réplica igual que `db.session` (ver `RoutingSession`). En
+    PostgreSQL se abre una transacción REPEATABLE READ READ ONLY en una
+    conexión propia. En SQLite pysqlite no abre transacción para los SELECT,
+    así que se emite BEGIN explícitamente: la instantánea se fija en la primera
+    lectura. La transacción se descarta (rollback) al salir del bloque.
+    """
+    engine = read_engine()
+    options = {}
+    if engine.dialect.name == 'postgresql':
+        options = {'isolation_level': 'REPEATABLE READ', 'postgresql_readonly': True}
+    
+    with engine.connect() as connection:
+        if options:
+            connection = connection.execution_options(**options)
+        elif engine.dialect.name == 'sqlite':
+            connection.exec_driver_sql('BEGIN')
+        with Session(bind=connection) as session:
+            yield session
@@ -10,12 +10,19 @@ document.addEventListener('DOMContentLoaded', function() {
     loadTodayStats();
     loadTodayAttendances();
     
-    // Recargar cada 30 segundos
-    setInterval(() => {
+    const reload = debounce(() => {
         loadCurrentStatus();
         loadTodayStats();
         loadTodayAttendances();
-    }, 30000);
+    }, 500);
+    
+    // Recargar solo cuando alguien ficha entrada o salida
+    const liveSource = subscribeLiveEvents(ATTENDANCE_EVENTS, reload, reload);
+    
+    if (!liveSource) {
+        // Recargar cada 30 segundos
+        setInterval(reload, 30000);
+    }
     
     // Cargar empleados para admin
     if (document.getElementById('admin-employee-select')) {
@@ -224,6 +224,53 @@ const storage = {
     }
 };
 
+// Eventos en vivo publicados por el servidor (Server-Sent Events)
+const ASSIGNMENT_EVENTS = [
+    'assignment_created', 'assignment_stopped', 'assignment_completed',
+    'assignment_updated', 'assignment_deleted'
+];
+const ATTENDANCE_EVENTS = ['attendance_check_in', 'attendance_check_out'];
+
+// Suscribirse a eventos en vivo.
+// onEvent(tipo, datos) se llama por cada cambio; onResync() al reconectar
+// o cuando el servidor pide recargar todo. Devuelve null si el navegador
+// no soporta EventSource (la página debe volver a hacer polling).
+function subscribeLiveEvents(eventTypes, onEvent, onResync) {
+    if (!window.EventSource) {
+        return null;
+    }
+    
+    const source = new EventSource('/events/api/stream');
+    let connectedOnce = false;
+    
+    source.addEventListener('open', () => {
+        // Tras una reconexión pueden haberse perdido eventos
+        if (connectedOnce && onResync) {
+            onResync();
+        }
+        connectedOnce = true;
+    });
+    
+    if (onResync) {
+        source.addEventListener('resync', () => onResync());
+    }
+    
+    eventTypes.forEach(type => {
+        source.addEventListener(type, (e) => onEvent(type, JSON.parse(e.data)));
+    });
+    
+    return source;
+}
+
+// Agrupar llamadas seguidas en una sola ejecución
+function debounce(fn, wait = 300) {
+    let timeout = null;
+    return (...args) => {
+        clearTimeout(timeout);
+        timeout = setTimeout(() => fn(...args), wait);
+    };
+}
+
 // Exportar funciones globales
 window.TaskManager = {
     formatDate,
@@ -238,5 +285,7 @@ window.TaskManager = {
     validateForm,
     clearForm,
     getStatusBadge,
+    subscribeLiveEvents,
+    debounce,
     storage
 };
\ No newline at end of file
@@ -0,0 +1,42 @@
+from flask import Response, current_app, stream_with_context
+
+# Número de filas que se piden al cursor del servidor en cada lote
+STREAM_CHUNK_SIZE = 500
+
+STREAM_FORMATS = ('json', 'ndjson')
+
+
+def iter_query(query, chunk_size=STREAM_CHUNK_SIZE):
+    """Itera una consulta usando un cursor del lado del servidor"""
+    return query.execution_options(stream_results=True).yield_per(chunk_size)
+
+
+def stream_json(rows, key, serialize):
+    """Genera un objeto JSON `{key: [...]}` fila a fila"""
+    dumps = current_app.json.dumps
+    yield '{' + dumps(key) + ': ['
+    first = True
+    for row in rows:
+        if not first:
+            yield ', '
+        first = False
+        yield dumps(serialize(row))
+    yield ']}'
+
+
+def stream_ndjson(rows, serialize):
+    """Genera una línea JSON por fila (NDJSON)"""
+    dumps = current_app.json.dumps
+    for row in rows:
+        yield dumps(serialize(row)) + '\n'
+
+
+def stream_response(rows, key, serialize, fmt='json'):
+    """Construye una respuesta en streaming en formato JSON o NDJSON"""
+    if fmt == 'ndjson':
+        body = stream_ndjson(rows, serialize)
+        mimetype = 'application/x-ndjson'
+    else:
+        body = stream_json(rows, key, serialize)
+        mimetype = 'application/json'
+    return Response(stream_with_context(body), mimetype=mimetype)
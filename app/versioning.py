@@ -0,0 +1,120 @@
+"""
+Versiones de cambio por tabla.
+
+Cada flush que inserta, modifica o borra filas de una tabla vigilada
+incrementa su contador en `change_versions` dentro de la misma transacción,
+de modo que la versión es coherente entre workers y solo avanza si el
+commit se completa. Los endpoints de consulta frecuente usan estas
+versiones como ETag barato (ver `app.decorators.versioned_etag`).
+"""
+from datetime import datetime
+from sqlalchemy import event, select, update, insert
+from app import db
+from app.models import ChangeVersion
+
+# Tablas cuya versión se mantiene
+TRACKED_TABLES = ('employees', 'tasks', 'task_assignments', 'attendance', 'task_allowed_employees')
+
+_versions = ChangeVersion.__table__
+
+
+def bump_versions(connection, tables):
+    """Incrementa la versión de las tablas indicadas en la conexión dada.
+    
+    Devuelve {tabla: nueva versión}.
+    """
+    now = datetime.utcnow()
+    new_versions = {}
+    for table in sorted(set(tables)):
+        version = connection.execute(
+            update(_versions)
+            .where(_versions.c.entity == table)
+            .values(version=_versions.c.version + 1, updated_at=now)
+            .returning(_versions.c.version)
+        ).scalar()
+        if version is None:
+            version = 1
+            connection.execute(insert(_versions).values(entity=table, version=version, updated_at=now))
+        new_versions[table] = version
+    return new_versions
+
+
+def versions_statement(tables):
+    """SELECT de las versiones de las tablas indicadas"""
+    return select(_versions.c.entity, _versions.c.version).where(_versions.c.entity.in_(tables))
+
+
+def versions_from_rows(tables, rows):
+    """{tabla: versión} a partir de las filas de `versions_statement` (0 si no hay fila)"""
+    versions = {table: 0 for table in tables}
+    versions.update({entity: version for entity, version in rows})
+    return versions
+
+
+def versions_key(versions):
+    """Tupla ordenada de {tabla: versión}, para usar como parte de una clave de caché"""
+    return tuple(sorted(versions.items()))
+
+
+def get_versions(tables, session=None):
+    """Devuelve {tabla: versión} con una sola consulta"""
+    session = session or db.session
+    return versions_from_rows(tables, session.execute(versions_statement(tables)).all())
+
+
+def _changed_tables(session):
+    tables = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table in TRACKED_TABLES:
+            tables.add(table)
+    return tables
+
+
+def committed_version_bumps():
+    """Versiones asignadas por el último commit de la sesión actual.
+    
+    Devuelve {tabla: (primera, última)}: la tabla estaba en la versión
+    `primera - 1` justo antes de la transacción.
+    """
+    return db.session.info.get('committed_version_bumps', {})
+
+
+def _bump_pending(session, tables):
+    pending = session.info.setdefault('pending_version_bumps', {})
+    for table, version in bump_versions(session.connection(), tables).items():
+        first, _ = pending.get(table, (version, version))
+        pending[table] = (first, version)
+
+
+def record_changes(tables, session=None):
+    """Registra cambios hechos con sentencias Core, que el flush no detecta.
+    
+    Sube la versión en la transacción actual igual que un flush, de modo que
+    ETags, cachés y el registro en memoria se enteran al hacer commit.
+    """
+    _bump_pending(session or db.session, tables)
+
+
+def _after_flush(session, flush_context):
+    tables = _changed_tables(session)
+    if not tables:
+        return
+    _bump_pending(session, tables)
+
+
+def _after_commit(session):
+    session.info['committed_version_bumps'] = session.info.pop('pending_version_bumps', {})
+
+
+def _after_rollback(session):
+    session.info.pop('pending_version_bumps', None)
+
+
+def init_versioning():
+    """Registra el seguimiento de versiones en la sesión de Flask-SQLAlchemy"""
+    for name, listener in (('after_flush', _after_flush),
+                           ('after_commit', _after_commit),
+                           ('after_rollback', _after_rollback)):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
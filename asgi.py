@@ -0,0 +1,8 @@
+import os
+from app import create_app
+from app.async_api import create_async_app
+
+# Endpoints de sondeo asíncronos; el resto de rutas las sirve la app Flask
+# uvicorn asgi:application --host 0.0.0.0 --port 8000
+flask_app = create_app(os.getenv('FLASK_ENV', 'production'))
+application = create_async_app(flask_app)
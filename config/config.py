@@ -5,6 +5,35 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 load_dotenv(os.path.join(basedir, '.env'))
 
 
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
+def engine_options(database_uri, pgbouncer=False):
+    """SQLALCHEMY_ENGINE_OPTIONS del pool de conexiones según las variables DB_POOL_*"""
+    options = {
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+    if database_uri.startswith('sqlite'):
+        return options
+    
+    options.update({
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    })
+    if pgbouncer:
+        # En modo transacción PgBouncer no conserva sentencias preparadas entre
+        # transacciones: se desactivan en los drivers que las usan (psycopg2 no lo hace)
+        if database_uri.startswith('postgresql+psycopg:'):
+            options['connect_args'] = {'prepare_threshold': None}
+        elif database_uri.startswith('postgresql+asyncpg:'):
+            options['connect_args'] = {'statement_cache_size': 0,
+                                       'prepared_statement_cache_size': 0}
+    return options
+
+
 class Config:
     """Configuración base de la aplicación"""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'clave-secreta-por-defecto-cambiar'
@@ -15,6 +44,89 @@ class Config:
     # Configuración de la aplicación
     APP_NAME = 'Task Manager'
     ITEMS_PER_PAGE = 20
+    MAX_ITEMS_PER_PAGE = 500
+    
+    # Codificador JSON: 'auto' (orjson si está instalado), 'orjson' o 'stdlib'
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER') or 'auto'
+    
+    # Compresión de respuestas (gzip, y brotli si está instalado) a partir de
+    # COMPRESS_MIN_SIZE bytes. Los streams se vacían cada COMPRESS_STREAM_FLUSH_SIZE bytes
+    COMPRESS_ENABLED = _env_bool('COMPRESS_ENABLED', True)
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_MIMETYPES = (
+        'application/json', 'application/x-ndjson', 'text/csv', 'text/html',
+        'text/plain', 'text/css', 'text/javascript', 'application/javascript',
+    )
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 4
+    COMPRESS_STREAM_FLUSH_SIZE = 64 * 1024
+    # Catálogos: el cuerpo comprimido se guarda por ETag y se sirve sin ejecutar la vista
+    # mientras el ETag no cambie (segundos y entradas)
+    COMPRESS_CACHED_ENDPOINTS = ('tasks.get_tasks', 'tasks.get_categories')
+    COMPRESS_CACHE_TTL = 3600
+    COMPRESS_CACHE_SIZE = 256
+    
+    # Registro en memoria de asignaciones activas (segundos)
+    LIVE_STATE_CHECK_INTERVAL = 2  # Comprobar versiones contra la BD
+    LIVE_STATE_RESYNC_INTERVAL = 300  # Recarga completa
+    
+    # Segundos entre comprobaciones de cambios de otros workers en el stream SSE
+    EVENTS_VERSION_CHECK_INTERVAL = 5
+    
+    # Caché de estadísticas (segundos). Las escrituras de este proceso la invalidan
+    DASHBOARD_STATS_TTL = 10
+    ATTENDANCE_STATS_TTL = 10
+    AVAILABILITY_CACHE_TTL = 60  # Tareas disponibles por empleado
+    
+    # Caché del usuario autenticado (segundos y número máximo de usuarios)
+    PRINCIPAL_CACHE_TTL = 60
+    PRINCIPAL_CACHE_SIZE = 4096
+    
+    # Hash de contraseñas. Los hashes con otros parámetros se recalculan en el login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt:32768:8:1'
+    PASSWORD_SALT_LENGTH = 16
+    # Verificación en un pool de procesos (0 = en el propio worker), operaciones en
+    # curso admitidas por worker (una en cola por proceso del pool) y espera máxima
+    # por un hueco (segundos)
+    PASSWORD_VERIFY_WORKERS = int(os.environ.get('PASSWORD_VERIFY_WORKERS', 2))
+    PASSWORD_VERIFY_MAX_PENDING = max(1, 2 * PASSWORD_VERIFY_WORKERS)
+    PASSWORD_VERIFY_QUEUE_TIMEOUT = 5
+    
+    # Particiones mensuales (PostgreSQL): meses creados por adelantado por
+    # `flask ensure-partitions`
+    PARTITION_MONTHS_AHEAD = 3
+    
+    # Archivo frío del historial (flask archive-history)
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR') or \
+        os.path.join(basedir, '..', 'instance', 'archive')
+    ARCHIVE_AFTER_MONTHS = 18
+    # Agregados de lo archivado para los resúmenes de historial (segundos en caché;
+    # la clave cambia cada vez que se archiva)
+    ARCHIVE_SUMMARY_TTL = 600
+    
+    # Límite de tiempo por sentencia en PostgreSQL (ms, 0 = sin límite). Se aplica con
+    # SET LOCAL al empezar cada transacción; DB_STATEMENT_TIMEOUTS lo cambia por endpoint
+    # ('blueprint.vista') o por blueprint
+    DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 15000))
+    DB_STATEMENT_TIMEOUTS = {
+        'reports': 120000,
+        'assignments.export_assignments': 120000,
+        'attendance.export_attendances': 120000,
+        'assignments.get_current_assignments': 3000,
+        'attendance.get_current_attendance': 3000,
+        'main.current_assignments': 3000,
+    }
+    # PgBouncer en modo transacción: sin estado de sesión ni sentencias preparadas
+    DB_PGBOUNCER = _env_bool('DB_PGBOUNCER', False)
+    
+    # Réplica de lectura (opcional) para las peticiones GET. Tras una escritura propia el
+    # usuario lee de la principal durante DB_REPLICA_STICKY_SECONDS
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    SQLALCHEMY_BINDS = {'replica': DATABASE_REPLICA_URL} if DATABASE_REPLICA_URL else {}
+    DB_REPLICA_STICKY_SECONDS = 5
+    
+    # API asíncrona (asgi.py). Por defecto la misma BD con driver asíncrono (asyncpg/aiosqlite)
+    ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL')
 
 
 class DevelopmentConfig(Config):
@@ -27,12 +139,21 @@ class ProductionConfig(Config):
     """Configuración para producción"""
     DEBUG = False
     SQLALCHEMY_ECHO = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(Config.SQLALCHEMY_DATABASE_URI,
+                                               pgbouncer=Config.DB_PGBOUNCER)
+    if Config.DATABASE_REPLICA_URL:
+        SQLALCHEMY_BINDS = {'replica': {
+            'url': Config.DATABASE_REPLICA_URL,
+            **engine_options(Config.DATABASE_REPLICA_URL, pgbouncer=Config.DB_PGBOUNCER)
+        }}
 
 
 class TestingConfig(Config):
     """Configuración para pruebas"""
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = 'postgresql://localhost/taskmanager_test_db'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or \
+        'postgresql://localhost/taskmanager_test_db'
+    PASSWORD_VERIFY_WORKERS = 0  # Sin pool de procesos
 
 
 # Diccionario de configuraciones
@@ -105,6 +105,45 @@ WHERE e.is_active = true
 GROUP BY e.id, e.name, e.position
 ORDER BY completed_tasks DESC;
 
+-- Versiones de las dos vistas anteriores sobre las tablas de resumen daily_stats y
+-- employee_daily_stats (mantenidas incrementalmente por la aplicación y
+-- reconstruibles con 'flask backfill-rollups'): su coste no crece con el
+-- histórico. Solo cuentan asignaciones cerradas y separan los descansos, así
+-- que sus columnas no equivalen a las de las vistas originales, que se
+-- conservan sin cambios
+CREATE OR REPLACE VIEW daily_rollup_view AS
+SELECT 
+    ds.date,
+    ds.closed_assignments,
+    ds.completed_tasks,
+    (SELECT COUNT(*) FROM employee_daily_stats eds WHERE eds.date = ds.date) as active_employees,
+    CASE 
+        WHEN ds.closed_assignments > 0 
+        THEN ds.total_minutes::numeric / ds.closed_assignments 
+    END as avg_duration_minutes,
+    ds.break_count,
+    ds.break_minutes
+FROM daily_stats ds
+ORDER BY ds.date DESC;
+
+CREATE OR REPLACE VIEW employee_rollup_view AS
+SELECT 
+    e.id as employee_id,
+    e.name as employee_name,
+    e.position,
+    COALESCE(SUM(eds.closed_assignments), 0) as closed_assignments,
+    COALESCE(SUM(eds.completed_tasks), 0) as completed_tasks,
+    CASE 
+        WHEN SUM(eds.closed_assignments) > 0 
+        THEN SUM(eds.total_minutes)::numeric / SUM(eds.closed_assignments) 
+    END as avg_completion_time_minutes,
+    MAX(eds.date) as last_assignment_date
+FROM employees e
+LEFT JOIN employee_daily_stats eds ON e.id = eds.employee_id
+WHERE e.is_active = true
+GROUP BY e.id, e.name, e.position
+ORDER BY completed_tasks DESC;
+
 -- Comentarios en las tablas (para documentación)
 COMMENT ON TABLE employees IS 'Tabla de empleados del equipo';
 COMMENT ON TABLE tasks IS 'Catálogo de tareas preestablecidas';
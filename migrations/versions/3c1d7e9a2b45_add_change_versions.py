@@ -0,0 +1,33 @@
+"""Add change_versions table for ETag support
+
+Revision ID: 3c1d7e9a2b45
+Revises: 8bbf33004827
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1d7e9a2b45'
+down_revision = '8bbf33004827'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    change_versions = op.create_table('change_versions',
+    sa.Column('entity', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('entity')
+    )
+    op.bulk_insert(change_versions, [
+        {'entity': entity, 'version': 0}
+        for entity in ('employees', 'tasks', 'task_assignments', 'attendance', 'task_allowed_employees')
+    ])
+
+
+def downgrade():
+    op.drop_table('change_versions')
@@ -0,0 +1,66 @@
+"""Enforce a single active assignment and open attendance per employee
+
+Revision ID: a4e8c2f61d07
+Revises: 3c1d7e9a2b45
+Create Date: 2026-10-18 10:41:03.927514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4e8c2f61d07'
+down_revision = '3c1d7e9a2b45'
+branch_labels = None
+depends_on = None
+
+ACTIVE_WHERE = "status IN ('en_progreso', 'descanso')"
+OPEN_WHERE = 'check_out IS NULL'
+
+
+def _table_exists(table):
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def upgrade():
+    # Cerrar duplicados previos: se conserva la asignación activa más reciente
+    op.execute(f"""
+        UPDATE task_assignments
+        SET status = 'pausada', end_time = COALESCE(end_time, CURRENT_TIMESTAMP)
+        WHERE {ACTIVE_WHERE}
+          AND id NOT IN (
+              SELECT MAX(id) FROM task_assignments
+              WHERE {ACTIVE_WHERE}
+              GROUP BY employee_id
+          )
+    """)
+    op.create_index('uq_assignment_active_per_employee', 'task_assignments', ['employee_id'],
+                    unique=True,
+                    postgresql_where=sa.text(ACTIVE_WHERE),
+                    sqlite_where=sa.text(ACTIVE_WHERE))
+    
+    # Ninguna revisión crea `attendance` (la crea db.create_all(), que ya incluye
+    # el índice): en una BD nueva no existe aún
+    if not _table_exists('attendance'):
+        return
+    op.execute(f"""
+        UPDATE attendance
+        SET check_out = CURRENT_TIMESTAMP
+        WHERE {OPEN_WHERE}
+          AND id NOT IN (
+              SELECT MAX(id) FROM attendance
+              WHERE {OPEN_WHERE}
+              GROUP BY employee_id
+          )
+    """)
+    op.create_index('uq_attendance_open_per_employee', 'attendance', ['employee_id'],
+                    unique=True,
+                    postgresql_where=sa.text(OPEN_WHERE),
+                    sqlite_where=sa.text(OPEN_WHERE))
+
+
+def downgrade():
+    if _table_exists('attendance'):
+        op.drop_index('uq_attendance_open_per_employee', table_name='attendance')
+    op.drop_index('uq_assignment_active_per_employee', table_name='task_assignments')
@@ -0,0 +1,56 @@
+"""Add daily_stats and employee_daily_stats rollup tables
+
+Revision ID: d9f3b7a15c28
+Revises: a4e8c2f61d07
+Create Date: 2026-10-18 12:05:37.664120
+
+Después de aplicar esta migración hay que rellenar los resúmenes con
+el histórico existente:
+
+    flask backfill-rollups
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9f3b7a15c28'
+down_revision = 'a4e8c2f61d07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_stats',
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('closed_assignments', sa.Integer(), nullable=False),
+    sa.Column('completed_tasks', sa.Integer(), nullable=False),
+    sa.Column('total_minutes', sa.Integer(), nullable=False),
+    sa.Column('break_count', sa.Integer(), nullable=False),
+    sa.Column('break_minutes', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('date')
+    )
+    op.create_table('employee_daily_stats',
+    sa.Column('employee_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('closed_assignments', sa.Integer(), nullable=False),
+    sa.Column('completed_tasks', sa.Integer(), nullable=False),
+    sa.Column('total_minutes', sa.Integer(), nullable=False),
+    sa.Column('break_count', sa.Integer(), nullable=False),
+    sa.Column('break_minutes', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['employee_id'], ['employees.id'], ),
+    sa.PrimaryKeyConstraint('employee_id', 'date')
+    )
+    with op.batch_alter_table('employee_daily_stats', schema=None) as batch_op:
+        batch_op.create_index('idx_employee_daily_stats_date', ['date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('employee_daily_stats', schema=None) as batch_op:
+        batch_op.drop_index('idx_employee_daily_stats_date')
+
+    op.drop_table('employee_daily_stats')
+    op.drop_table('daily_stats')
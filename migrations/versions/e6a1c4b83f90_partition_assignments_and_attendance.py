@@ -0,0 +1,251 @@
+"""Monthly range partitioning of task_assignments and attendance (PostgreSQL)
+
+Revision ID: e6a1c4b83f90
+Revises: d9f3b7a15c28
+Create Date: 2026-10-18 12:20:44.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a1c4b83f90'
+down_revision = 'd9f3b7a15c28'
+branch_labels = None
+depends_on = None
+
+# Meses que se crean por adelantado al migrar (después los mantiene la app)
+MONTHS_AHEAD = 3
+
+ACTIVE_WHERE = "status IN ('en_progreso', 'descanso')"
+OPEN_WHERE = 'check_out IS NULL'
+
+# tabla -> (columna de partición, claves foráneas, índices)
+TABLES = {
+    'task_assignments': (
+        'start_time',
+        [('employee_id', 'employees'), ('task_id', 'tasks')],
+        [
+            ('idx_employee_status', 'employee_id, status', None),
+            ('idx_task_dates', 'task_id, start_time', None),
+            ('idx_assignment_employee_start', 'employee_id, start_time', None),
+            ('idx_assignment_active_employee', 'employee_id', ACTIVE_WHERE),
+        ],
+    ),
+    'attendance': (
+        'check_in',
+        [('employee_id', 'employees')],
+        [
+            ('idx_attendance_employee_check_in', 'employee_id, check_in', None),
+            ('idx_attendance_open_employee', 'employee_id', OPEN_WHERE),
+        ],
+    ),
+}
+
+# Índices que existían antes de particionar (se restauran en el downgrade)
+ORIGINAL_INDEXES = ('idx_employee_status', 'idx_task_dates')
+
+# Crea las particiones mensuales de [from_date, to_date] que falten. Si la partición
+# por defecto ya tiene filas de ese mes, se mueven antes de adjuntar la nueva.
+CREATE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_monthly_partitions(
+    parent text, part_column text, from_date date, to_date date
+) RETURNS integer AS $$
+DECLARE
+    month_start date := date_trunc('month', from_date)::date;
+    month_end date;
+    part_name text;
+    created integer := 0;
+BEGIN
+    WHILE month_start <= to_date LOOP
+        month_end := (month_start + interval '1 month')::date;
+        part_name := format('%s_y%sm%s', parent, to_char(month_start, 'YYYY'),
+                            to_char(month_start, 'MM'));
+        IF to_regclass(part_name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', part_name, parent);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                parent || '_default', part_column, month_start, part_column, month_end,
+                part_name);
+            EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                           parent, part_name, month_start, month_end);
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Los índices únicos de una tabla particionada deben incluir la columna de partición,
+# así que "una sola fila activa por empleado" pasa a garantizarse con un trigger que
+# serializa por empleado y lanza unique_violation (la app sigue viendo IntegrityError).
+GUARD_FUNCTIONS = {
+    'task_assignments': ('uq_assignment_active_per_employee', ACTIVE_WHERE,
+                         'status, employee_id'),
+    'attendance': ('uq_attendance_open_per_employee', OPEN_WHERE,
+                   'check_out, employee_id'),
+}
+
+
+def _guard_function_sql(table, constraint, where):
+    new_where = where.replace('status', 'NEW.status').replace('check_out', 'NEW.check_out')
+    return f"""
+CREATE OR REPLACE FUNCTION {table}_single_open_guard() RETURNS trigger AS $$
+BEGIN
+    IF {new_where} THEN
+        PERFORM pg_advisory_xact_lock(hashtext('{table}'), NEW.employee_id);
+        IF EXISTS (
+            SELECT 1 FROM {table}
+            WHERE employee_id = NEW.employee_id AND {where} AND id <> NEW.id
+        ) THEN
+            RAISE EXCEPTION 'duplicate key value violates unique constraint "{constraint}"'
+                USING ERRCODE = 'unique_violation', CONSTRAINT = '{constraint}';
+        END IF;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+# Vistas que dependen (directa o indirectamente) de una tabla, con su definición y
+# profundidad: las vistas de db/database_init.sql (current_assignments_view,
+# employee_productivity_view...) siguen a la tabla al renombrarla e impiden borrarla
+DEPENDENT_VIEWS_SQL = """
+WITH RECURSIVE dependents(oid, depth) AS (
+    SELECT r.ev_class, 1
+    FROM pg_depend d
+    JOIN pg_rewrite r ON r.oid = d.objid
+    WHERE d.classid = 'pg_rewrite'::regclass
+      AND d.refobjid = CAST(:table AS regclass) AND r.ev_class <> d.refobjid
+    UNION
+    SELECT r.ev_class, dependents.depth + 1
+    FROM dependents
+    JOIN pg_depend d ON d.refobjid = dependents.oid AND d.classid = 'pg_rewrite'::regclass
+    JOIN pg_rewrite r ON r.oid = d.objid
+    WHERE r.ev_class <> d.refobjid
+)
+SELECT c.oid::regclass::text, pg_get_viewdef(c.oid), MAX(dependents.depth)
+FROM dependents
+JOIN pg_class c ON c.oid = dependents.oid
+WHERE c.relkind = 'v'
+GROUP BY c.oid
+ORDER BY MAX(dependents.depth), 1
+"""
+
+
+def _table_exists(table):
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def _sequence_for(table):
+    return op.get_bind().execute(
+        sa.text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': table}
+    ).scalar()
+
+
+def _drop_dependent_views(table):
+    """Borra las vistas que dependen de `table` y devuelve [(nombre, definición)]"""
+    views = [(name, definition) for name, definition, _ in
+             op.get_bind().execute(sa.text(DEPENDENT_VIEWS_SQL), {'table': table})]
+    for name, _ in reversed(views):
+        op.execute(f'DROP VIEW {name}')
+    return views
+
+
+def _create_views(views):
+    """Vuelve a crear las vistas (las definiciones nombran la tabla, no su oid)"""
+    for name, definition in views:
+        op.execute(f'CREATE VIEW {name} AS {definition}')
+
+
+def _add_keys_and_indexes(table, foreign_keys, indexes, primary_key):
+    op.execute(f'ALTER TABLE {table} ADD PRIMARY KEY ({primary_key})')
+    for column, target in foreign_keys:
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey '
+                   f'FOREIGN KEY ({column}) REFERENCES {target} (id)')
+    for name, columns, where in indexes:
+        where_sql = f' WHERE {where}' if where else ''
+        op.execute(f'CREATE INDEX {name} ON {table} ({columns}){where_sql}')
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        # El particionado declarativo solo existe en PostgreSQL
+        return
+
+    op.execute(CREATE_PARTITIONS_FUNCTION)
+
+    for table, (part_column, foreign_keys, indexes) in TABLES.items():
+        if not _table_exists(table):
+            continue
+
+        views = _drop_dependent_views(table)
+        old = f'{table}_unpartitioned'
+        op.execute(f'ALTER TABLE {table} RENAME TO {old}')
+        sequence = _sequence_for(old)
+        if sequence:
+            op.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+
+        op.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) '
+                   f'PARTITION BY RANGE ({part_column})')
+        op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+        # Una partición por mes desde la fila más antigua hasta MONTHS_AHEAD meses vista
+        op.execute(f"""
+            SELECT create_monthly_partitions(
+                '{table}', '{part_column}',
+                COALESCE((SELECT MIN({part_column}) FROM {old})::date, CURRENT_DATE),
+                (CURRENT_DATE + interval '{MONTHS_AHEAD} months')::date
+            )
+        """)
+
+        op.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+        op.execute(f'DROP TABLE {old}')
+
+        _add_keys_and_indexes(table, foreign_keys, indexes, f'id, {part_column}')
+        if sequence:
+            op.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+        _create_views(views)
+
+        constraint, where, columns = GUARD_FUNCTIONS[table]
+        op.execute(_guard_function_sql(table, constraint, where))
+        op.execute(f'CREATE TRIGGER {table}_single_open_guard '
+                   f'BEFORE INSERT OR UPDATE OF {columns} ON {table} '
+                   f'FOR EACH ROW EXECUTE FUNCTION {table}_single_open_guard()')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table, (part_column, foreign_keys, indexes) in TABLES.items():
+        if not _table_exists(table):
+            continue
+
+        views = _drop_dependent_views(table)
+        partitioned = f'{table}_partitioned'
+        op.execute(f'ALTER TABLE {table} RENAME TO {partitioned}')
+        sequence = _sequence_for(partitioned)
+        if sequence:
+            op.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+
+        op.execute(f'CREATE TABLE {table} (LIKE {partitioned} INCLUDING DEFAULTS)')
+        op.execute(f'INSERT INTO {table} SELECT * FROM {partitioned}')
+        op.execute(f'DROP TABLE {partitioned}')
+        op.execute(f'DROP FUNCTION IF EXISTS {table}_single_open_guard()')
+
+        # Sin particiones vuelven los índices originales y los únicos parciales
+        constraint, where, _ = GUARD_FUNCTIONS[table]
+        original = [index for index in indexes if index[0] in ORIGINAL_INDEXES]
+        _add_keys_and_indexes(table, foreign_keys, original, 'id')
+        op.execute(f'CREATE UNIQUE INDEX {constraint} ON {table} (employee_id) WHERE {where}')
+        if sequence:
+            op.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+        _create_views(views)
+
+    op.execute('DROP FUNCTION IF EXISTS create_monthly_partitions(text, text, date, date)')
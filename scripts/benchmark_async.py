@@ -0,0 +1,251 @@
+"""
+Benchmark de la API asíncrona (app/async_api.py) frente a la app WSGI
+
+Simula N tableros abiertos que sondean `/assignments/api/current` cada
+`--interval` segundos y compara, con el mismo presupuesto de memoria, la app
+WSGI en gunicorn (workers síncronos) con la app ASGI en uvicorn. Primero se
+mide la memoria (RSS) de un worker de cada tipo y se arrancan tantos workers
+como caben en `--memory-mb`; después se lanzan los tableros contra cada
+servidor y se mide peticiones por segundo, latencia y errores.
+
+Usa una base de datos SQLite temporal salvo que se indique `--database-url`
+(PostgreSQL con asyncpg instalado). Requiere gunicorn, uvicorn y las
+dependencias de la API asíncrona.
+
+Uso:
+    python scripts/benchmark_async.py [--dashboards 300] [--memory-mb 400] [--duration 20]
+"""
+import argparse
+import asyncio
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PASSWORD = 'contraseña-de-prueba'
+POLL_PATH = '/assignments/api/current'
+
+
+def seed(database_url, employees=200):
+    """Empleados, tareas y una asignación activa por empleado"""
+    os.environ['DATABASE_URL'] = database_url
+    from app import create_app, db
+    from app.models import Employee, Task, TaskAssignment
+
+    app = create_app('production')
+    with app.app_context():
+        db.create_all()
+        if Employee.query.filter_by(email='admin@empresa.com').first():
+            return
+        admin = Employee(name='Admin', email='admin@empresa.com', role='admin')
+        admin.set_password(PASSWORD)
+        db.session.add(admin)
+        tasks = [Task(name=f'Tarea benchmark {i}', category='Benchmark') for i in range(20)]
+        db.session.add_all(tasks)
+        db.session.flush()
+        now = datetime.utcnow()
+        for i in range(employees):
+            employee = Employee(name=f'Empleado {i}', email=f'bench{i}@empresa.com')
+            db.session.add(employee)
+            db.session.flush()
+            db.session.add(TaskAssignment(employee_id=employee.id, task_id=tasks[i % 20].id,
+                                          status='en_progreso',
+                                          start_time=now - timedelta(minutes=i)))
+        db.session.commit()
+
+
+# --- Servidores ---
+
+def _children(pid):
+    """PIDs de los procesos hijos (directos) de `pid`"""
+    result = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                    result.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return result
+
+
+def rss_mb(pid):
+    """Memoria residente (MB) del proceso y sus hijos"""
+    total = 0
+    for process in [pid] + _children(pid):
+        try:
+            with open(f'/proc/{process}/status') as f:
+                total += int(re.search(r'VmRSS:\s+(\d+)', f.read()).group(1))
+        except (OSError, AttributeError):
+            continue
+    return total / 1024
+
+
+def worker_rss_mb(pid):
+    """(MB del proceso maestro, MB del worker más grande); sin hijos, el maestro es el worker"""
+    children = [rss_mb(child) for child in _children(pid)]
+    if not children:
+        return 0.0, rss_mb(pid)
+    return rss_mb(pid) - sum(children), max(children)
+
+
+def start_server(kind, workers, port, env):
+    if kind == 'wsgi':
+        command = ['gunicorn', '--workers', str(workers), '--bind', f'127.0.0.1:{port}',
+                   '--log-level', 'warning', "app:create_app('production')"]
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:application', '--workers', str(workers),
+                   '--port', str(port), '--log-level', 'warning']
+    process = subprocess.Popen(command, cwd=ROOT, env=env)
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/auth/login', timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'El servidor {kind} no arrancó')
+
+
+def login(port):
+    """Cookie de sesión del administrador"""
+    class NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    data = urllib.parse.urlencode({'email': 'admin@empresa.com', 'password': PASSWORD}).encode()
+    try:
+        urllib.request.build_opener(NoRedirect).open(f'http://127.0.0.1:{port}/auth/login', data)
+    except urllib.error.HTTPError as e:
+        return e.headers['Set-Cookie'].split(';', 1)[0]
+    raise RuntimeError('Login fallido')
+
+
+# --- Carga ---
+
+async def _request(port, cookie, connection, etag):
+    """GET con keep-alive e If-None-Match, como el navegador con `Cache-Control: no-cache`.
+    
+    Devuelve (estado, conexión o None si el servidor la cerró, ETag).
+    """
+    if connection is None:
+        connection = await asyncio.open_connection('127.0.0.1', port)
+    reader, writer = connection
+    headers = f'Cookie: {cookie}\r\n' + (f'If-None-Match: {etag}\r\n' if etag else '')
+    writer.write(f'GET {POLL_PATH} HTTP/1.1\r\nHost: localhost\r\n{headers}\r\n'.encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length, close = 0, False
+    while True:
+        line = (await reader.readline()).strip().lower()
+        if not line:
+            break
+        name, _, value = line.partition(b':')
+        if name == b'content-length':
+            length = int(value)
+        elif name == b'connection' and value.strip() == b'close':
+            close = True
+        elif name == b'etag':
+            etag = value.strip().decode()
+    await reader.readexactly(length)
+    if close:
+        writer.close()
+        connection = None
+    return status, connection, etag
+
+
+async def _dashboard(port, cookie, interval, deadline, latencies, errors):
+    connection, etag = None, None
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            status, connection, etag = await _request(port, cookie, connection, etag)
+            if status not in (200, 304):
+                errors.append(status)
+            latencies.append(time.monotonic() - started)
+        except (OSError, asyncio.IncompleteReadError, IndexError, ValueError):
+            errors.append('conexión')
+            connection = None
+        await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+async def run_load(port, cookie, dashboards, interval, duration):
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*[
+        _dashboard(port, cookie, interval, deadline, latencies, errors)
+        for _ in range(dashboards)
+    ])
+    return latencies, errors
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dashboards', type=int, default=300)
+    parser.add_argument('--interval', type=float, default=1.0, help='Segundos entre sondeos')
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--memory-mb', type=int, default=400)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        seed(database_url)
+        env = dict(os.environ, DATABASE_URL=database_url, PASSWORD_VERIFY_WORKERS='0',
+                   SECRET_KEY='benchmark', FLASK_ENV='production')
+
+        print("=" * 60)
+        print(f"BENCHMARK API ASÍNCRONA ({args.dashboards} tableros cada {args.interval:g} s, "
+              f"{args.memory_mb} MB)")
+        print("=" * 60)
+
+        for kind, port in (('wsgi', 8701), ('asgi', 8702)):
+            # Memoria de un worker tras calentar; los que caben junto al maestro
+            server = start_server(kind, 1, port, env)
+            try:
+                cookie = login(port)
+                asyncio.run(run_load(port, cookie, 10, 0.05, 2))
+                master, single = worker_rss_mb(server.pid)
+            finally:
+                server.terminate()
+                server.wait()
+            workers = max(1, int((args.memory_mb - master) // single))
+
+            server = start_server(kind, workers, port, env)
+            try:
+                cookie = login(port)
+                latencies, errors = asyncio.run(
+                    run_load(port, cookie, args.dashboards, args.interval, args.duration))
+                memory = rss_mb(server.pid)
+            finally:
+                server.terminate()
+                server.wait()
+
+            offered = args.dashboards / args.interval
+            print(f"\n{kind.upper()}: {workers} workers ({single:.0f} MB/worker, {memory:.0f} MB en total)")
+            print(f"   Peticiones/s:  {len(latencies) / args.duration:8.1f}  (ofrecidas {offered:.0f})")
+            print(f"   Latencia:      p50 {percentile(latencies, 50) * 1000:6.0f} ms  "
+                  f"p95 {percentile(latencies, 95) * 1000:6.0f} ms  "
+                  f"p99 {percentile(latencies, 99) * 1000:6.0f} ms")
+            print(f"   Errores:       {len(errors)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark de serialización JSON (app/json_provider.py)
+
+Mide, sobre una base de datos SQLite temporal con `--rows` asignaciones y
+fichajes:
+
+1. `to_dict` de las asignaciones: la versión anterior (una función auxiliar
+   creada en cada llamada) frente a la actual (`iso_utc` compartida).
+2. Codificación de la lista ya serializada con el proveedor por defecto de
+   Flask, el estándar con fechas UTC y orjson (si está instalado).
+3. Endpoints de listas completos (consulta + serialización + codificación)
+   con cada proveedor.
+
+Uso:
+    python scripts/benchmark_json.py [--rows 5000] [--repeat 10]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def best_ms(fn, repeat):
+    """Mejor tiempo (ms) de `repeat` ejecuciones, tras una de calentamiento"""
+    fn()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return min(times)
+
+
+def legacy_assignment_dict(self):
+    """TaskAssignment.to_dict anterior, con la función auxiliar definida en cada llamada"""
+    def to_iso_utc(dt):
+        if dt is None:
+            return None
+        if dt.tzinfo is None:
+            return dt.isoformat() + 'Z'
+        return dt.isoformat()
+
+    is_break = self.status == 'descanso' or self.task_id is None
+    return {
+        'id': self.id,
+        'employee_id': self.employee_id,
+        'employee_name': self.employee.name if self.employee else None,
+        'task_id': self.task_id,
+        'task_name': '☕ Descanso' if is_break else (self.task.name if self.task else None),
+        'is_break': is_break,
+        'start_time': to_iso_utc(self.start_time),
+        'end_time': to_iso_utc(self.end_time),
+        'pause_time': to_iso_utc(self.pause_time),
+        'total_paused_duration': self.total_paused_duration or 0,
+        'status': self.status,
+        'notes': self.notes,
+        'created_at': to_iso_utc(self.created_at),
+        'updated_at': to_iso_utc(self.updated_at)
+    }
+
+
+def build_app(db_path, rows):
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    from app import create_app, db
+    from app.models import Attendance, Employee, Task, TaskAssignment
+
+    app = create_app('production')
+    with app.app_context():
+        db.create_all()
+        employees = [Employee(name=f'Empleado {i}', email=f'empleado{i}@empresa.com', role='admin')
+                     for i in range(50)]
+        tasks = [Task(name=f'Tarea {i}', category='General') for i in range(20)]
+        db.session.add_all(employees + tasks)
+        db.session.flush()
+        now = datetime.utcnow().replace(hour=12)
+        for i in range(rows):
+            start = now - timedelta(hours=i)
+            db.session.add(TaskAssignment(employee_id=employees[i % 50].id, task_id=tasks[i % 20].id,
+                                          start_time=start, end_time=start + timedelta(minutes=45),
+                                          status='completada', notes='Notas de la asignación'))
+            db.session.add(Attendance(employee_id=employees[i % 50].id, location='office',
+                                      check_in=now - timedelta(seconds=i),
+                                      check_out=now + timedelta(hours=8)))
+        db.session.commit()
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    from flask.json.provider import DefaultJSONProvider
+    from app.json_provider import OrjsonProvider, UTCJSONProvider, orjson
+
+    print("=" * 60)
+    print(f"BENCHMARK JSON ({args.rows} filas, mejor de {args.repeat})")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'bench.db'), args.rows)
+        from app.models import TaskAssignment
+        from app.serializers import with_assignment_relations
+
+        providers = {'flask': DefaultJSONProvider(app), 'stdlib': UTCJSONProvider(app)}
+        if orjson is not None:
+            providers['orjson'] = OrjsonProvider(app)
+
+        with app.app_context():
+            assignments = with_assignment_relations(TaskAssignment.query).all()
+            print("\n1. to_dict de asignaciones")
+            legacy = best_ms(lambda: [legacy_assignment_dict(a) for a in assignments], args.repeat)
+            current = best_ms(lambda: [a.to_dict() for a in assignments], args.repeat)
+            print(f"   anterior:  {legacy:8.1f} ms")
+            print(f"   actual:    {current:8.1f} ms")
+
+            data = {'assignments': [a.to_dict() for a in assignments]}
+            print("\n2. Codificación de la lista serializada")
+            for name, provider in providers.items():
+                elapsed = best_ms(lambda: provider.response(data), args.repeat)
+                print(f"   {name:8s}  {elapsed:8.1f} ms")
+
+        day = datetime.utcnow().date().isoformat()
+        endpoints = ['/assignments/api', '/assignments/api?stream=json', f'/attendance/api?date={day}']
+        print("\n3. Endpoints (ms por petición)")
+        print(f"   {'':38s}" + ''.join(f'{name:>10s}' for name in providers))
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = '1'
+            session['_fresh'] = True
+        for url in endpoints:
+            results = []
+            for provider in providers.values():
+                app.json = provider
+                results.append(best_ms(lambda: client.get(url).get_data(), args.repeat))
+            print(f"   {url:38s}" + ''.join(f'{elapsed:10.1f}' for elapsed in results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark de login (app/passwords.py)
+
+Simula un inicio de turno: varios clientes hacen login a la vez contra
+`/auth/login` mientras otro cliente sondea `/tasks/api/categories`. Mide
+logins por segundo y la latencia de ambos, con la verificación en el propio
+worker (--workers 0) o en el pool de procesos (--workers N).
+Usa una base de datos SQLite temporal.
+
+Uso:
+    python scripts/benchmark_login.py [--logins 200] [--concurrency 32] [--workers 2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = 'contraseña-de-prueba'
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def build_app(db_path, workers, employees):
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    from app import create_app, db
+    from app.models import Employee, Task
+    from app.passwords import hash_password
+
+    app = create_app('production')
+    app.config['PASSWORD_VERIFY_WORKERS'] = workers
+    with app.app_context():
+        db.create_all()
+        # Un solo hash compartido: crear los usuarios no forma parte de la medida
+        password_hash = hash_password(PASSWORD)
+        db.session.add_all([
+            Employee(name=f'Empleado {i}', email=f'empleado{i}@empresa.com',
+                     password_hash=password_hash)
+            for i in range(employees)
+        ])
+        db.session.add(Task(name='Tarea', category='General'))
+        db.session.commit()
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=2,
+                        help='Procesos de verificación (0 = en el propio worker)')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"BENCHMARK LOGIN ({args.logins} logins, {args.concurrency} concurrentes, "
+          f"workers={args.workers})")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'bench.db'), args.workers, args.logins)
+
+        # Calentar el pool (arranque de procesos) fuera de la medida
+        with app.app_context():
+            from app.passwords import verify_password, hash_password
+            verify_password(hash_password(PASSWORD), PASSWORD)
+
+        login_times, poll_times, statuses = [], [], []
+        done = threading.Event()
+
+        def login(i):
+            client = app.test_client()
+            started = time.perf_counter()
+            response = client.post('/auth/login', data={
+                'email': f'empleado{i}@empresa.com', 'password': PASSWORD})
+            login_times.append(time.perf_counter() - started)
+            statuses.append(response.status_code)
+
+        def poll():
+            client = app.test_client()
+            while not done.is_set():
+                started = time.perf_counter()
+                client.get('/tasks/api/categories')
+                poll_times.append(time.perf_counter() - started)
+                time.sleep(0.05)
+
+        poller = threading.Thread(target=poll)
+        poller.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(login, range(args.logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        poller.join()
+
+    ok = statuses.count(302)
+    print(f"\nLogins correctos:   {ok}/{args.logins}  (503: {statuses.count(503)})")
+    print(f"Tiempo total:       {elapsed:.2f} s  ({ok / elapsed:.1f} logins/s)")
+    print(f"Latencia login:     p50 {percentile(login_times, 50) * 1000:.0f} ms  "
+          f"p95 {percentile(login_times, 95) * 1000:.0f} ms")
+    print(f"Latencia sondeo:    p50 {percentile(poll_times, 50) * 1000:.0f} ms  "
+          f"p95 {percentile(poll_times, 95) * 1000:.0f} ms  ({len(poll_times)} peticiones)")
+
+
+if __name__ == '__main__':
+    main()
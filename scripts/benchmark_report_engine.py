@@ -0,0 +1,170 @@
+"""
+Benchmark del motor de informes (app/report_engine.py)
+
+1. Agregación: genera `--rows` asignaciones sintéticas en memoria (por defecto
+   10 millones, un año de datos) y mide `aggregate` con distintas agrupaciones.
+2. Carga: mide `load_intervals` (consulta, lectura por lotes y conversión a
+   arrays) y el informe completo (carga + agregación) contra una base de datos.
+   Por defecto una SQLite temporal con `--db-rows` asignaciones del último año;
+   con `--database-url` una BD existente (p. ej. una copia de la de producción
+   en PostgreSQL), que solo se lee.
+
+`--rows 0` o `--db-rows 0` (sin `--database-url`) omiten cada parte.
+
+Uso:
+    python scripts/benchmark_report_engine.py [--rows 10000000] [--db-rows 1000000]
+                                               [--database-url URL] [--days 365]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.report_engine import AssignmentIntervals, aggregate
+
+YEAR_START = 1704067200  # 2024-01-01 00:00:00 UTC
+INSERT_BATCH = 50000
+
+
+def build_intervals(rows, employees=300, tasks=200, categories=12, seed=42):
+    """Asignaciones aleatorias repartidas a lo largo de un año"""
+    rng = np.random.default_rng(seed)
+    task_id = rng.integers(1, tasks + 1, rows, dtype=np.int32)
+    task_category = rng.integers(0, categories, tasks + 1, dtype=np.int32)
+    return AssignmentIntervals(
+        employee_id=rng.integers(1, employees + 1, rows, dtype=np.int32),
+        task_id=task_id,
+        category=task_category[task_id],
+        start=YEAR_START + rng.integers(0, 365 * 86400, rows, dtype=np.int64),
+        minutes=np.floor(rng.gamma(2.0, 45.0, rows)),
+        categories=[f'Categoría {i}' for i in range(categories)]
+    )
+
+
+def best_seconds(fn, repeat):
+    """(mejor tiempo en s de `repeat` ejecuciones, resultado de la última)"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return min(times), result
+
+
+def benchmark_aggregate(rows):
+    print(f"\n1. Agregación en memoria ({rows:,} asignaciones)")
+    started = time.perf_counter()
+    intervals = build_intervals(rows)
+    print(f"   Datos generados en {time.perf_counter() - started:.2f} s")
+    
+    for group_by in (('employee', 'task', 'week'), ('category', 'day'), ('employee',), ()):
+        started = time.perf_counter()
+        result = aggregate(intervals, group_by=group_by, percentiles=(50, 90))
+        elapsed = time.perf_counter() - started
+        label = ', '.join(group_by) or '(total)'
+        print(f"   {label:<22} {len(result['count']):>9,} grupos  {elapsed:6.2f} s")
+
+
+def seed_database(db, rows, days, employees=300, tasks=200, categories=12, seed=42):
+    """Empleados, tareas y `rows` asignaciones cerradas de los últimos `days` días"""
+    from sqlalchemy import insert
+    from app.models import Employee, Task, TaskAssignment
+    
+    db.create_all()
+    db.session.add_all([Employee(name=f'Empleado {i}', email=f'empleado{i}@empresa.com')
+                        for i in range(employees)])
+    db.session.add_all([Task(name=f'Tarea {i}', category=f'Categoría {i % categories}')
+                        for i in range(tasks)])
+    db.session.commit()
+    
+    rng = np.random.default_rng(seed)
+    first_day = datetime.combine(date.today() - timedelta(days=days - 1), datetime.min.time())
+    table = TaskAssignment.__table__
+    for batch_start in range(0, rows, INSERT_BATCH):
+        size = min(INSERT_BATCH, rows - batch_start)
+        offsets = rng.integers(0, days * 86400, size)
+        durations = np.floor(rng.gamma(2.0, 45.0, size)) + 1
+        is_break = rng.random(size) < 0.1
+        employee_ids = rng.integers(1, employees + 1, size)
+        task_ids = rng.integers(1, tasks + 1, size)
+        batch = []
+        for i in range(size):
+            start = first_day + timedelta(seconds=int(offsets[i]))
+            batch.append({
+                'employee_id': int(employee_ids[i]),
+                'task_id': None if is_break[i] else int(task_ids[i]),
+                'start_time': start,
+                'end_time': start + timedelta(minutes=int(durations[i])),
+                'status': 'completada',
+                'total_paused_duration': 0
+            })
+        # Core en bloque: sin hooks de sesión (resúmenes, versiones), solo se mide la lectura
+        db.session.execute(insert(table), batch)
+        db.session.commit()
+
+
+def benchmark_load(database_url, db_rows, days, repeat):
+    os.environ['DATABASE_URL'] = database_url
+    from app import create_app, db
+    from app.report_engine import load_intervals
+    
+    app = create_app('production')
+    with app.app_context():
+        if db_rows:
+            started = time.perf_counter()
+            seed_database(db, db_rows, days)
+            print(f"   BD generada en {time.perf_counter() - started:.1f} s")
+        
+        date_to = date.today()
+        date_from = date_to - timedelta(days=days - 1)
+        cases = (
+            ('tareas', {}),
+            ('tareas y descansos', {'include_breaks': True}),
+            ('una categoría', {'categories': ['Categoría 0']}),
+            ('un empleado', {'employee_ids': [1]}),
+        )
+        for label, filters in cases:
+            load, intervals = best_seconds(
+                lambda: load_intervals(date_from, date_to, **filters), repeat)
+            total, _ = best_seconds(
+                lambda: aggregate(load_intervals(date_from, date_to, **filters),
+                                  group_by=('employee', 'task', 'week')), repeat)
+            rate = len(intervals) / load if load else 0
+            print(f"   {label:<20} {len(intervals):>10,} filas  carga {load:6.2f} s "
+                  f"({rate:>10,.0f} filas/s)  informe {total:6.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--db-rows', type=int, default=1_000_000)
+    parser.add_argument('--database-url', help='BD existente (solo lectura); por defecto SQLite temporal')
+    parser.add_argument('--days', type=int, default=365, help='Días del rango del informe')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("BENCHMARK MOTOR DE INFORMES")
+    print("=" * 60)
+    
+    if args.rows:
+        benchmark_aggregate(args.rows)
+    
+    if args.database_url:
+        print(f"\n2. Carga desde la BD ({args.days} días, mejor de {args.repeat})")
+        benchmark_load(args.database_url, 0, args.days, args.repeat)
+    elif args.db_rows:
+        print(f"\n2. Carga desde SQLite temporal ({args.db_rows:,} asignaciones, "
+              f"{args.days} días, mejor de {args.repeat})")
+        with tempfile.TemporaryDirectory() as tmp:
+            benchmark_load(f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                           args.db_rows, args.days, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
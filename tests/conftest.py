@@ -0,0 +1,58 @@
+"""
+Fixtures comunes: aplicación con la configuración `testing` sobre una BD
+vacía en cada prueba y un cliente autenticado como administrador.
+
+Por defecto se usa SQLite en un fichero temporal (no en memoria: las
+lecturas abren sus propias conexiones); `TEST_DATABASE_URL` permite usar
+PostgreSQL.
+"""
+import os
+import tempfile
+import pytest
+
+os.environ.setdefault('TEST_DATABASE_URL',
+                      'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db'))
+
+from app import create_app, db
+from app.cache import query_cache
+from app.live_state import live_state
+from app.models import Employee, Task
+
+ADMIN_PASSWORD = 'secreto123'
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app('testing')
+    app.config['ARCHIVE_DIR'] = str(tmp_path / 'archive')
+    
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    query_cache.clear()
+    
+    yield app
+    
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente autenticado como admin (id 1), con la empleada Ana (id 2) y tres tareas"""
+    with app.app_context():
+        admin = Employee(name='Admin', email='admin@empresa.com', role='admin')
+        admin.set_password(ADMIN_PASSWORD)
+        db.session.add_all([admin, Employee(name='Ana', email='ana@empresa.com')])
+        db.session.add_all([Task(name=f'Tarea {i}', category='Desarrollo', estimated_duration=60)
+                            for i in range(1, 4)])
+        db.session.commit()
+        # El registro en memoria es del proceso: cargarlo desde esta BD
+        live_state.load()
+    
+    client = app.test_client()
+    response = client.post('/auth/login', data={'email': 'admin@empresa.com',
+                                                'password': ADMIN_PASSWORD})
+    assert response.status_code == 302
+    return client
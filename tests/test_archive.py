@@ -0,0 +1,102 @@
+import os
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app import archive
+from app.archive import archive_history, read_index
+from app.models import TaskAssignment
+
+# Días atrás de cada asignación cerrada de Ana: las cuatro primeras superan el corte
+# por defecto (ARCHIVE_AFTER_MONTHS)
+DAYS_AGO = (900, 800, 800, 650, 10, 3)
+
+
+@pytest.fixture
+def history(app, client):
+    now = datetime.utcnow().replace(microsecond=0)
+    with app.app_context():
+        for i, days in enumerate(DAYS_AGO):
+            start = now - timedelta(days=days)
+            db.session.add(TaskAssignment(employee_id=2, task_id=i % 3 + 1, status='completada',
+                                          start_time=start,
+                                          end_time=start + timedelta(minutes=30 + i),
+                                          total_paused_duration=1))
+        db.session.add(TaskAssignment(employee_id=2, task_id=None, status='pausada',
+                                      start_time=now - timedelta(days=800, hours=1),
+                                      end_time=now - timedelta(days=800, minutes=45)))
+        db.session.commit()
+    return client.get('/employees/api/2/history').get_json()
+
+
+def _without_flag(rows):
+    return [{key: value for key, value in row.items() if key != 'archived'} for row in rows]
+
+
+def _db_count(app):
+    with app.app_context():
+        return TaskAssignment.query.count()
+
+
+def test_history_reads_through_the_archive(app, client, history):
+    with app.app_context():
+        archived = archive_history()
+    assert archived['task_assignments'] == 5
+    assert _db_count(app) == 2
+    
+    after = client.get('/employees/api/2/history').get_json()
+    assert _without_flag(after['assignments']) == _without_flag(history['assignments'])
+    assert after['summary'] == history['summary']
+    assert sum(1 for row in after['assignments'] if row.get('archived')) == 5
+
+
+def test_history_cursor_pages_span_database_and_archive(app, client, history):
+    with app.app_context():
+        archive_history()
+    
+    ids = []
+    cursor = None
+    while True:
+        params = {'limit': 2}
+        if cursor:
+            params['cursor'] = cursor
+        page = client.get('/employees/api/2/history', query_string=params).get_json()
+        ids += [row['id'] for row in page['assignments']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    
+    assert ids == [row['id'] for row in history['assignments']]
+
+
+def test_failed_delete_keeps_rows_and_publishes_nothing(app, client, history, monkeypatch):
+    def fail(tables):
+        raise RuntimeError('fallo simulado')
+    monkeypatch.setattr(archive, 'record_changes', fail)
+    
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            archive_history()
+        assert read_index('task_assignments')['shards'] == {}
+        assert os.listdir(os.path.join(app.config['ARCHIVE_DIR'], 'task_assignments')) == []
+    assert _db_count(app) == 7
+
+
+def test_interrupted_publish_is_recovered_on_next_run(app, client, history, monkeypatch):
+    publish = archive._publish_shard
+    
+    def interrupted(table, month, entry, index):
+        raise RuntimeError('proceso interrumpido')
+    monkeypatch.setattr(archive, '_publish_shard', interrupted)
+    
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            archive_history()
+    # El primer mes se borró de la BD pero su fichero quedó sin publicar
+    assert _db_count(app) < 7
+    
+    monkeypatch.setattr(archive, '_publish_shard', publish)
+    with app.app_context():
+        archive_history()
+    
+    after = client.get('/employees/api/2/history').get_json()
+    assert _without_flag(after['assignments']) == _without_flag(history['assignments'])
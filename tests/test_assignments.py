@@ -0,0 +1,86 @@
+from datetime import datetime
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import TaskAssignment, ACTIVE_ASSIGNMENT_STATUSES
+
+
+def _start(client, employee_id=2, **data):
+    data.setdefault('task_id', 1)
+    response = client.post('/assignments/api', json={'employee_id': employee_id, **data})
+    assert response.status_code == 201
+    return response.get_json()['assignment']
+
+
+def test_switch_closes_current_and_opens_next(client):
+    current = _start(client)
+    response = client.post('/assignments/api/switch', json={
+        'employee_id': 2, 'task_id': 2, 'expected_assignment_id': current['id']})
+    
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['closed_assignment']['id'] == current['id']
+    assert data['closed_assignment']['status'] == 'pausada'
+    assert data['assignment']['task_id'] == 2
+    assert data['assignment']['status'] == 'en_progreso'
+
+
+def test_switch_with_stale_expected_assignment_returns_409(client):
+    first = _start(client)
+    second = client.post('/assignments/api/switch', json={
+        'employee_id': 2, 'task_id': 2}).get_json()['assignment']
+    
+    # El cliente aún cree activa la primera asignación
+    response = client.post('/assignments/api/switch', json={
+        'employee_id': 2, 'task_id': 3, 'expected_assignment_id': first['id']})
+    
+    assert response.status_code == 409
+    assert response.get_json()['active_assignment']['id'] == second['id']
+    current = client.get('/assignments/api/employee/2/current').get_json()
+    assert current['assignment']['id'] == second['id']
+
+
+def test_switch_expecting_an_assignment_when_none_is_active_returns_409(client):
+    response = client.post('/assignments/api/switch', json={
+        'employee_id': 2, 'task_id': 1, 'expected_assignment_id': 12345})
+    
+    assert response.status_code == 409
+    assert response.get_json()['active_assignment'] is None
+
+
+def test_second_active_assignment_is_rejected(client):
+    active = _start(client)
+    
+    response = client.post('/assignments/api', json={'employee_id': 2, 'is_break': True})
+    
+    assert response.status_code == 400
+    assert response.get_json()['active_assignment']['id'] == active['id']
+
+
+def test_unique_index_allows_one_active_row_per_employee(app, client):
+    _start(client)
+    
+    with app.app_context():
+        # Las asignaciones cerradas no cuentan
+        db.session.add(TaskAssignment(employee_id=2, task_id=2, status='completada',
+                                      start_time=datetime(2026, 1, 5, 9),
+                                      end_time=datetime(2026, 1, 5, 10)))
+        db.session.commit()
+        
+        db.session.add(TaskAssignment(employee_id=2, task_id=3, status='descanso'))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+        
+        active = TaskAssignment.query.filter(
+            TaskAssignment.employee_id == 2,
+            TaskAssignment.status.in_(ACTIVE_ASSIGNMENT_STATUSES)).count()
+        assert active == 1
+
+
+def test_second_open_attendance_is_rejected(client):
+    assert client.post('/attendance/api/check-in', json={'employee_id': 2}).status_code == 201
+    assert client.post('/attendance/api/check-in', json={'employee_id': 2}).status_code == 400
+    
+    assert client.post('/attendance/api/check-out', json={'employee_id': 2}).status_code == 200
+    assert client.post('/attendance/api/check-in', json={'employee_id': 2}).status_code == 201
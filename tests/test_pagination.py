@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models import TaskAssignment
+
+
+def _add_closed_assignments(app, count):
+    start = datetime(2026, 1, 5, 9, 0)
+    with app.app_context():
+        # Varias filas por instante: el cursor desempata por id
+        db.session.add_all([
+            TaskAssignment(employee_id=2, task_id=1, status='completada',
+                           start_time=start - timedelta(minutes=i // 3),
+                           end_time=start + timedelta(hours=1))
+            for i in range(count)
+        ])
+        db.session.commit()
+
+
+def test_cursor_pages_cover_every_row_once(app, client):
+    _add_closed_assignments(app, 25)
+    full = client.get('/assignments/api').get_json()['assignments']
+    
+    ids = []
+    cursor = None
+    while True:
+        params = {'limit': 7}
+        if cursor:
+            params['cursor'] = cursor
+        page = client.get('/assignments/api', query_string=params).get_json()
+        assert len(page['assignments']) <= 7
+        ids += [a['id'] for a in page['assignments']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    
+    assert len(ids) == 25
+    assert ids == [a['id'] for a in full]
+
+
+def test_last_page_has_no_cursor(app, client):
+    _add_closed_assignments(app, 4)
+    page = client.get('/assignments/api', query_string={'limit': 4}).get_json()
+    assert len(page['assignments']) == 4
+    assert page['next_cursor'] is None
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get('/assignments/api', query_string={'cursor': 'no-es-un-cursor'})
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
@@ -0,0 +1,111 @@
+from datetime import date, datetime
+import pytest
+from app import db
+from app.models import TaskAssignment, DailyStats, EmployeeDailyStats
+from app.rollups import COUNTERS, backfill_rollups
+
+DAY = date(2026, 1, 5)
+
+
+def at(hour, minute=0):
+    return datetime(2026, 1, 5, hour, minute)
+
+
+def daily():
+    row = db.session.get(DailyStats, DAY)
+    return {name: getattr(row, name) for name in COUNTERS} if row else None
+
+
+def rollup_rows():
+    return (
+        sorted((row.date, *(getattr(row, name) for name in COUNTERS))
+               for row in DailyStats.query),
+        sorted((row.employee_id, row.date, *(getattr(row, name) for name in COUNTERS))
+               for row in EmployeeDailyStats.query),
+    )
+
+
+@pytest.fixture
+def session(app, client):
+    with app.app_context():
+        yield db.session
+
+
+def test_deltas_follow_each_write(session):
+    task = TaskAssignment(employee_id=2, task_id=1, status='pausada', start_time=at(9),
+                          end_time=at(10), total_paused_duration=5)
+    pause = TaskAssignment(employee_id=2, task_id=None, status='pausada', start_time=at(10),
+                           end_time=at(10, 15))
+    active = TaskAssignment(employee_id=2, task_id=2, status='en_progreso', start_time=at(10, 15))
+    session.add_all([task, pause, active])
+    session.commit()
+    # La asignación activa aún no aporta
+    assert daily() == {'closed_assignments': 1, 'completed_tasks': 0, 'total_minutes': 55,
+                       'break_count': 1, 'break_minutes': 15}
+    
+    task.status = 'completada'
+    task.end_time = at(10, 30)
+    session.commit()
+    assert daily()['completed_tasks'] == 1
+    assert daily()['total_minutes'] == 85
+    
+    active.status = 'completada'
+    active.end_time = at(11)
+    session.commit()
+    assert daily()['closed_assignments'] == 2
+    assert daily()['total_minutes'] == 85 + 45
+    
+    session.delete(task)
+    session.commit()
+    assert daily() == {'closed_assignments': 1, 'completed_tasks': 1, 'total_minutes': 45,
+                       'break_count': 1, 'break_minutes': 15}
+    
+    employee_row = session.get(EmployeeDailyStats, (2, DAY))
+    assert (employee_row.closed_assignments, employee_row.total_minutes) == (1, 45)
+
+
+def test_moving_an_assignment_to_another_day(session):
+    assignment = TaskAssignment(employee_id=2, task_id=1, status='completada', start_time=at(9),
+                                end_time=at(10))
+    session.add(assignment)
+    session.commit()
+    
+    assignment.start_time = datetime(2026, 1, 6, 9)
+    assignment.end_time = datetime(2026, 1, 6, 10)
+    session.commit()
+    
+    assert daily()['closed_assignments'] == 0
+    assert session.get(DailyStats, date(2026, 1, 6)).closed_assignments == 1
+
+
+def test_rolled_back_writes_leave_no_delta(session):
+    session.add(TaskAssignment(employee_id=2, task_id=1, status='completada', start_time=at(9),
+                               end_time=at(10)))
+    session.flush()
+    session.rollback()
+    
+    assert daily() is None
+
+
+def test_incremental_rollups_match_backfill(app, client):
+    # Escrituras por la API: inicio, cambio a descanso, cambios de tarea, paradas y borrado
+    first = client.post('/assignments/api', json={'employee_id': 2, 'task_id': 1}).get_json()
+    client.post('/assignments/api/switch', json={'employee_id': 2, 'is_break': True,
+                                                  'close_as': 'completada'})
+    client.post('/assignments/api/switch', json={'employee_id': 2, 'task_id': 2})
+    client.post('/assignments/api/switch', json={'employee_id': 1, 'task_id': 3})
+    for assignment in client.get('/assignments/api/current').get_json()['assignments']:
+        assert client.put(f"/assignments/api/{assignment['id']}/stop", json={}).status_code == 200
+    with app.app_context():
+        db.session.add(TaskAssignment(employee_id=1, task_id=2, status='completada',
+                                      start_time=at(9), end_time=at(12), total_paused_duration=20))
+        db.session.commit()
+    assert client.delete(f"/assignments/api/{first['assignment']['id']}").status_code == 200
+    
+    with app.app_context():
+        incremental = rollup_rows()
+        backfill_rollups()
+        db.session.commit()
+        
+        assert incremental[0]
+        assert rollup_rows() == incremental